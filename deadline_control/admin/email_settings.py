@@ -22,6 +22,7 @@ class EmailSettingsAdmin(admin.ModelAdmin):
     )
     list_filter = ("is_active", "email_use_tls", "email_use_ssl")
     search_fields = ("organization__short_name_ru", "organization__full_name_ru", "email_host", "email_host_user")
+    readonly_fields = ("last_delivery_at", "last_delivery_success", "last_delivery_error")
 
     fieldsets = (
         ('Организация', {
@@ -58,6 +59,13 @@ class EmailSettingsAdmin(admin.ModelAdmin):
             'description': '<strong>Укажите email адреса получателей уведомлений</strong><br>'
                           'Каждый email с новой строки. Эти адреса будут получать уведомления о медосмотрах и других событиях.'
         }),
+        ('📊 Последняя рассылка', {
+            'fields': (
+                'last_delivery_at',
+                'last_delivery_success',
+                'last_delivery_error',
+            ),
+        }),
         ('⚙️ Дополнительные настройки', {
             'fields': (
                 'is_active',
@@ -5,3 +5,9 @@ class DeadlineControlConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deadline_control'
     verbose_name = '⏰ Контроль сроков'
+
+    def ready(self):
+        """
+        Импортируем signals при инициализации приложения.
+        """
+        import deadline_control.signals  # noqa: F401
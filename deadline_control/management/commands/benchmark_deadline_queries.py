@@ -0,0 +1,309 @@
+# deadline_control/management/commands/benchmark_deadline_queries.py
+
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from directory.models import Employee, Organization, Position
+from deadline_control.models import (
+    Equipment,
+    EmployeeMedicalExamination,
+    HarmfulFactor,
+    KeyDeadlineCategory,
+    KeyDeadlineItem,
+)
+from deadline_control.utils.deadline_aggregation import (
+    count_deadlines_by_organization,
+    get_base_querysets,
+    summarize_deadlines,
+)
+
+# Тестовые организации помечаются префиксом, чтобы их можно было удалить (--cleanup)
+BENCHMARK_ORG_PREFIX = 'Бенчмарк сроков'
+BENCHMARK_FACTOR_PREFIX = 'BENCH-'
+EXAMS_PER_EMPLOYEE = 5
+BATCH_SIZE = 5000
+
+# Индексы сроков (миграция deadline_control 0014), которые снимаются для замера «до»
+BENCHMARK_INDEXES = (
+    (EmployeeMedicalExamination, 'medexam_active_emp_next_idx'),
+    (EmployeeMedicalExamination, 'medexam_active_next_date_idx'),
+    (EmployeeMedicalExamination, 'medexam_open_next_date_idx'),
+    (Equipment, 'equipment_org_next_maint_idx'),
+    (Equipment, 'equipment_next_maint_idx'),
+    (KeyDeadlineItem, 'keydeadline_cat_next_idx'),
+    (KeyDeadlineItem, 'keydeadline_next_date_idx'),
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замер времени запросов дашбордов сроков (p50/p95) до и после индексов по датам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Создать указанное число тестовых медосмотров (например, 1000000) перед замером',
+        )
+        parser.add_argument(
+            '--organizations',
+            type=int,
+            default=20,
+            help='Число тестовых организаций при заполнении (по умолчанию 20)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз выполнять каждый запрос (по умолчанию 20)',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Дополнительно замерить запросы без индексов (индексы снимаются в откатываемой транзакции)',
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Удалить тестовые данные бенчмарка и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self._cleanup()
+            return
+
+        if options['seed']:
+            self._seed(options['seed'], options['organizations'])
+
+        queries = self._get_queries()
+        repeat = options['repeat']
+
+        results = {}
+        if options['compare']:
+            self.stdout.write(self.style.WARNING('Замер без индексов (до)...'))
+            results['до'] = self._run_without_indexes(queries, repeat)
+
+        self.stdout.write(self.style.SUCCESS('Замер с индексами (после)...'))
+        results['после'] = self._run_queries(queries, repeat)
+
+        self._print_report(queries, results)
+
+    # ------------------------------------------------------------------
+    # Запросы
+    # ------------------------------------------------------------------
+
+    def _get_queries(self):
+        """Запросы дашбордов, контекстного процессора и смены статусов медосмотров"""
+        today = timezone.now().date()
+        org_ids = list(Organization.objects.values_list('id', flat=True))
+        if not org_ids:
+            raise CommandError('Нет организаций для замера. Используйте --seed')
+
+        # Первая организация с медосмотрами - для дашборда одной организации
+        busiest_org_id = Employee.objects.filter(
+            medical_examinations__isnull=False
+        ).values_list('organization_id', flat=True).order_by('organization_id').first() or org_ids[0]
+
+        def org_querysets(org_id):
+            querysets = get_base_querysets()
+            return {
+                'equipment': querysets['equipment'].filter(organization_id=org_id),
+                'deadlines': querysets['deadlines'].filter(category__organization_id=org_id),
+                'medical': querysets['medical'].filter(employee__organization_id=org_id),
+            }
+
+        def status_update_counts():
+            # Те же фильтры, что в update_medical_examination_statuses (без UPDATE)
+            issue_date = today + timedelta(days=30)
+            exams = EmployeeMedicalExamination.objects.filter(employee__organization_id=busiest_org_id)
+            return (
+                exams.filter(next_date__lte=issue_date, next_date__gt=today, status='completed').count(),
+                exams.filter(next_date__lt=today, status__in=['completed', 'to_issue']).count(),
+            )
+
+        return [
+            ('Счётчики сроков (все организации)',
+             lambda: count_deadlines_by_organization(org_ids, today, today + timedelta(days=7))),
+            ('Дашборд: все организации',
+             lambda: summarize_deadlines(get_base_querysets())),
+            ('Дашборд: одна организация',
+             lambda: summarize_deadlines(org_querysets(busiest_org_id))),
+            ('Смена статусов медосмотров',
+             status_update_counts),
+        ]
+
+    def _run_queries(self, queries, repeat):
+        timings = {}
+        for name, query in queries:
+            query()  # прогрев
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = samples
+        return timings
+
+    def _run_without_indexes(self, queries, repeat):
+        """Снимает индексы сроков, выполняет замер и откатывает изменения схемы"""
+        timings = {}
+        try:
+            with transaction.atomic():
+                # SQL удаления индексов выполняется напрямую: schema_editor SQLite
+                # нельзя открыть внутри транзакции
+                schema_editor = connection.SchemaEditorClass(connection)
+                with connection.cursor() as cursor:
+                    for model, index_name in BENCHMARK_INDEXES:
+                        index = next(index for index in model._meta.indexes if index.name == index_name)
+                        cursor.execute(str(index.remove_sql(model, schema_editor)))
+                timings = self._run_queries(queries, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return timings
+
+    def _print_report(self, queries, results):
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 78))
+        self.stdout.write(f'{"Запрос":<40}{"Замер":<10}{"p50, мс":>14}{"p95, мс":>14}')
+        self.stdout.write('-' * 78)
+        for name, _ in queries:
+            for label, timings in results.items():
+                samples = sorted(timings[name])
+                p50 = statistics.median(samples)
+                p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+                self.stdout.write(f'{name:<40}{label:<10}{p50:>14.2f}{p95:>14.2f}')
+        self.stdout.write(self.style.SUCCESS('=' * 78))
+
+    # ------------------------------------------------------------------
+    # Тестовые данные
+    # ------------------------------------------------------------------
+
+    def _seed(self, exams_count, organizations_count):
+        """
+        Заполняет БД тестовыми данными: организации, должности, сотрудники
+        (по EXAMS_PER_EMPLOYEE медосмотров), оборудование и мероприятия.
+        Записи создаются bulk_create без сигналов.
+        """
+        today = timezone.now().date()
+        rnd = random.Random(42)
+        self.stdout.write(f'Создание {exams_count} тестовых медосмотров...')
+
+        factors = [
+            HarmfulFactor.objects.get_or_create(
+                short_name=f'{BENCHMARK_FACTOR_PREFIX}{i}',
+                defaults={'full_name': f'Тестовый фактор {i}', 'periodicity': 12 * i},
+            )[0]
+            for i in range(1, EXAMS_PER_EMPLOYEE + 1)
+        ]
+
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S')
+        organizations = [
+            Organization.objects.create(
+                full_name_ru=f'{BENCHMARK_ORG_PREFIX} {suffix}-{i}',
+                short_name_ru=f'{BENCHMARK_ORG_PREFIX} {suffix}-{i}',
+                full_name_by=f'{BENCHMARK_ORG_PREFIX} {suffix}-{i}',
+                short_name_by=f'{BENCHMARK_ORG_PREFIX} {suffix}-{i}',
+            )
+            for i in range(organizations_count)
+        ]
+        positions = [
+            Position.objects.create(position_name='Тестовая должность', organization=organization)
+            for organization in organizations
+        ]
+
+        def random_date():
+            return today + timedelta(days=rnd.randint(-365, 365))
+
+        # Сотрудники
+        employees_count = max(1, exams_count // EXAMS_PER_EMPLOYEE)
+        for start in range(0, employees_count, BATCH_SIZE):
+            Employee.objects.bulk_create([
+                Employee(
+                    full_name_nominative=f'Тестовый Сотрудник {i}',
+                    organization=organizations[i % organizations_count],
+                    position=positions[i % organizations_count],
+                    date_of_birth=date(1990, 1, 1),
+                    status='working',
+                )
+                for i in range(start, min(start + BATCH_SIZE, employees_count))
+            ], batch_size=BATCH_SIZE)
+        self.stdout.write(f'  сотрудников: {employees_count}')
+
+        # Медосмотры
+        created = 0
+        employee_ids = Employee.objects.filter(
+            organization__in=organizations
+        ).values_list('id', flat=True).iterator(chunk_size=BATCH_SIZE)
+        batch = []
+        for employee_id in employee_ids:
+            for factor in factors:
+                next_date = random_date() if rnd.random() > 0.1 else None
+                batch.append(EmployeeMedicalExamination(
+                    employee_id=employee_id,
+                    harmful_factor=factor,
+                    date_completed=next_date - timedelta(days=365) if next_date else None,
+                    next_date=next_date,
+                    status=rnd.choice(['completed', 'completed', 'to_issue', 'expired']),
+                    is_disabled=rnd.random() < 0.05,
+                ))
+            if len(batch) >= BATCH_SIZE:
+                EmployeeMedicalExamination.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+                created += len(batch)
+                batch = []
+        if batch:
+            EmployeeMedicalExamination.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+            created += len(batch)
+        self.stdout.write(f'  медосмотров: {created}')
+
+        # Оборудование и мероприятия (по одному на 20 медосмотров)
+        side_count = max(1, exams_count // 20)
+        Equipment.objects.bulk_create([
+            Equipment(
+                equipment_name=f'Тестовое оборудование {i}',
+                inventory_number=f'BENCH-{suffix}-{i}',
+                organization=organizations[i % organizations_count],
+                next_maintenance_date=random_date(),
+            )
+            for i in range(side_count)
+        ], batch_size=BATCH_SIZE)
+
+        categories = [
+            KeyDeadlineCategory.objects.create(name='Тестовая категория', organization=organization)
+            for organization in organizations
+        ]
+        items = []
+        for i in range(side_count):
+            next_date = random_date()
+            items.append(KeyDeadlineItem(
+                category=categories[i % organizations_count],
+                name=f'Тестовое мероприятие {i}',
+                periodicity_months=12,
+                current_date=next_date - timedelta(days=365),
+                next_date=next_date,
+            ))
+        KeyDeadlineItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+        self.stdout.write(f'  оборудования и мероприятий: по {side_count}')
+
+    def _cleanup(self):
+        organizations = Organization.objects.filter(full_name_ru__startswith=BENCHMARK_ORG_PREFIX)
+        # Медосмотры защищают вредные факторы (PROTECT) - удаляем их раньше факторов
+        EmployeeMedicalExamination.objects.filter(employee__organization__in=organizations).delete()
+        Employee.objects.filter(organization__in=organizations).delete()
+        Position.objects.filter(organization__in=organizations).delete()
+        deleted, _ = organizations.delete()
+        HarmfulFactor.objects.filter(
+            short_name__startswith=BENCHMARK_FACTOR_PREFIX, employee_examinations__isnull=True
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f'Тестовые данные удалены (объектов: {deleted})'))
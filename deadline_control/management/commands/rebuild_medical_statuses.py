@@ -0,0 +1,36 @@
+# deadline_control/management/commands/rebuild_medical_statuses.py
+
+from django.core.management.base import BaseCommand
+from directory.models import Employee
+from deadline_control.utils.medical_status import refresh_medical_status_records
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает таблицу статусов медосмотров сотрудников (EmployeeMedicalStatus)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=int,
+            help='ID организации (по умолчанию - все организации)',
+        )
+
+    def handle(self, *args, **options):
+        organization_id = options.get('organization')
+
+        employees = Employee.objects.all()
+        if organization_id:
+            employees = employees.filter(organization_id=organization_id)
+        employee_ids = list(employees.values_list('id', flat=True))
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчёт статусов медосмотров: {len(employee_ids)} сотрудников...'))
+
+        saved, deleted = refresh_medical_status_records(employee_ids)
+
+        # Итоги
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(f'Обработано сотрудников: {len(employee_ids)}')
+        self.stdout.write(f'Сохранено статусов: {saved}')
+        self.stdout.write(f'Удалено статусов: {deleted}')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -1,12 +1,15 @@
 # deadline_control/management/commands/send_medical_notifications.py
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from directory.models import Employee, Organization
-from deadline_control.models import EmailSettings
+from directory.models import Organization
+from deadline_control.models import EmailSettings, EmployeeMedicalStatus
+from deadline_control.utils.email_delivery import EmailDelivery, deliver_emails, save_delivery_results
 from datetime import datetime
 
 User = get_user_model()
@@ -26,6 +29,11 @@ class Command(BaseCommand):
             type=int,
             help='ID организации для фильтрации (по умолчанию - все)',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Число потоков отправки (по умолчанию - настройка EMAIL_DELIVERY_WORKERS)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Начинаем формирование отчета о медосмотрах...'))
@@ -36,16 +44,36 @@ class Command(BaseCommand):
         else:
             organizations = Organization.objects.all()
 
-        total_sent = 0
-        total_failed = 0
-
-        # Обрабатываем каждую организацию отдельно
+        today = timezone.now().date()
+        deliveries = []
+        admin_emails = None
+
+        # Настройки email всех организаций - одним запросом
+        settings_by_org = {
+            email_settings.organization_id: email_settings
+            for email_settings in EmailSettings.objects.filter(organization__in=organizations)
+        }
+
+        # Статусы сотрудников с медосмотрами (таблица EmployeeMedicalStatus) - одним запросом
+        records_by_org = defaultdict(list)
+        for record in EmployeeMedicalStatus.objects.with_actual_status(today).filter(
+            employee__organization__in=organizations,
+            employee__medical_examinations__isnull=False,
+            actual_status__in=['no_date', 'expired', 'upcoming'],
+        ).distinct().select_related(
+            'employee',
+            'employee__organization',
+            'employee__position'
+        ):
+            records_by_org[record.employee.organization_id].append(record)
+
+        # Формируем письма для каждой организации (запросы к БД - только здесь)
         for organization in organizations:
             self.stdout.write(f'\n--- Обработка организации: {organization.short_name_ru} ---')
 
             # Получаем настройки email для организации
             try:
-                email_settings = EmailSettings.get_settings(organization)
+                email_settings = settings_by_org.get(organization.id) or EmailSettings.get_settings(organization)
             except Exception as e:
                 self.stdout.write(self.style.WARNING(
                     f'Не удалось получить настройки email для {organization.short_name_ru}: {e}'
@@ -74,11 +102,13 @@ class Command(BaseCommand):
 
                 # Если в настройках не указаны получатели - берём администраторов
                 if not recipient_list:
-                    recipient_list = list(
-                        User.objects.filter(is_staff=True, email__isnull=False)
-                        .exclude(email='')
-                        .values_list('email', flat=True)
-                    )
+                    if admin_emails is None:
+                        admin_emails = list(
+                            User.objects.filter(is_staff=True, email__isnull=False)
+                            .exclude(email='')
+                            .values_list('email', flat=True)
+                        )
+                    recipient_list = admin_emails
 
             if not recipient_list:
                 self.stdout.write(self.style.WARNING(
@@ -86,46 +116,22 @@ class Command(BaseCommand):
                 ))
                 continue
 
-            # Получаем сотрудников организации с медосмотрами
-            employees_qs = Employee.objects.filter(
-                organization=organization,
-                medical_examinations__isnull=False
-            ).distinct()
-
-            employees_qs = employees_qs.select_related(
-                'organization',
-                'position'
-            ).prefetch_related(
-                'medical_examinations__harmful_factor'
-            )
-
             # Разделяем на категории
-            no_date = []
-            overdue = []
-            upcoming = []
-
-            for employee in employees_qs:
-                medical_status = employee.get_medical_status()
-
-                if not medical_status:
-                    continue
-
-                status = medical_status['status']
-                if status == 'no_date':
-                    no_date.append({
-                        'employee': employee,
-                        'status': medical_status
-                    })
-                elif status == 'expired':
-                    overdue.append({
-                        'employee': employee,
-                        'status': medical_status
-                    })
-                elif status == 'upcoming':
-                    upcoming.append({
-                        'employee': employee,
-                        'status': medical_status
-                    })
+            categories = {
+                'no_date': [],
+                'expired': [],
+                'upcoming': [],
+            }
+
+            for record in records_by_org.get(organization.id, []):
+                categories[record.actual_status].append({
+                    'employee': record.employee,
+                    'status': record.as_status_dict(today)
+                })
+
+            no_date = categories['no_date']
+            overdue = categories['expired']
+            upcoming = categories['upcoming']
 
             # Если нет данных для отправки - пропускаем
             if not (no_date or overdue or upcoming):
@@ -138,38 +144,45 @@ class Command(BaseCommand):
             subject = f'📋 План прохождения медицинских осмотров - {organization.short_name_ru} - {datetime.now().strftime("%d.%m.%Y")}'
             message = self._format_email_message(organization, no_date, overdue, upcoming)
 
-            # Получаем подключение с настройками организации
-            connection = email_settings.get_connection()
             from_email = email_settings.default_from_email or email_settings.email_host_user
-
-            # Отправляем письмо
-            try:
-                send_mail(
+            deliveries.append(EmailDelivery(
+                email_settings=email_settings,
+                message=EmailMessage(
                     subject=subject,
-                    message=message,
+                    body=message,
                     from_email=from_email,
-                    recipient_list=recipient_list,
-                    connection=connection,
-                    fail_silently=False,
-                )
+                    to=recipient_list,
+                ),
+                label=organization.short_name_ru,
+            ))
+            self.stdout.write(
+                f'   Без даты: {len(no_date)}, Просроченные: {len(overdue)}, Предстоящие: {len(upcoming)}'
+            )
+
+        # Отправляем письма: одно соединение на SMTP-конфигурацию, конфигурации - параллельно
+        report = deliver_emails(deliveries, max_workers=options['workers'])
+        save_delivery_results(report)
+
+        for delivery in report.deliveries:
+            if delivery.success:
                 self.stdout.write(
                     self.style.SUCCESS(
-                        f'✅ Уведомление отправлено для {organization.short_name_ru}!\n'
-                        f'   Получатели: {", ".join(recipient_list)}\n'
-                        f'   Без даты: {len(no_date)}, Просроченные: {len(overdue)}, Предстоящие: {len(upcoming)}'
+                        f'✅ Уведомление отправлено для {delivery.label}!\n'
+                        f'   Получатели: {", ".join(delivery.recipients)}'
                     )
                 )
-                total_sent += 1
-            except Exception as e:
+            else:
                 self.stdout.write(
-                    self.style.ERROR(f'❌ Ошибка при отправке email для {organization.short_name_ru}: {str(e)}')
+                    self.style.ERROR(f'❌ Ошибка при отправке email для {delivery.label}: {delivery.error}')
                 )
-                total_failed += 1
 
         # Итоговая статистика
         self.stdout.write('\n' + '=' * 60)
         self.stdout.write(
-            self.style.SUCCESS(f'Завершено! Отправлено: {total_sent}, Ошибок: {total_failed}')
+            self.style.SUCCESS(
+                f'Завершено! Отправлено: {len(report.sent)}, Ошибок: {len(report.failed)} '
+                f'(SMTP-соединений: {report.connections}, {report.duration:.1f} с)'
+            )
         )
 
     def _format_email_message(self, organization, no_date, overdue, upcoming):
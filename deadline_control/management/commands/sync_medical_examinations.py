@@ -2,8 +2,7 @@
 
 from django.core.management.base import BaseCommand
 from directory.models import Employee
-from directory.signals import get_harmful_factors_for_position
-from deadline_control.models import EmployeeMedicalExamination
+from deadline_control.utils.medical_sync import sync_medical_examinations
 
 
 class Command(BaseCommand):
@@ -15,6 +14,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Показать что будет создано, но не создавать записи',
         )
+        parser.add_argument(
+            '--organization',
+            type=int,
+            help='ID организации (по умолчанию - все организации)',
+        )
+        parser.add_argument(
+            '--disable-obsolete',
+            action='store_true',
+            help='Отметить «Не требуется» медосмотры по факторам, которых нет у текущей должности',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -24,62 +33,45 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS('Создание недостающих записей медосмотров...'))
 
-        total_employees = 0
-        total_created = 0
-        employees_without_position = 0
-
         # Получаем всех активных сотрудников
         employees = Employee.objects.exclude(
             status__in=['candidate', 'fired']
-        ).select_related('position').prefetch_related(
-            'medical_examinations',
-            'position__medical_factors__harmful_factor'
+        ).only('id', 'full_name_nominative', 'position_id', 'organization_id')
+        if options['organization']:
+            employees = employees.filter(organization_id=options['organization'])
+
+        # Требуемые записи вычисляются и создаются пакетно
+        result = sync_medical_examinations(
+            employees,
+            disable_obsolete=options['disable_obsolete'],
+            dry_run=dry_run,
         )
 
-        for employee in employees:
-            total_employees += 1
-
-            if not employee.position:
-                employees_without_position += 1
-                continue
-
-            # Получаем вредные факторы для должности с учетом иерархии
-            harmful_factors = get_harmful_factors_for_position(employee.position)
-
-            if not harmful_factors.exists():
-                continue
-
-            # Получаем существующие медосмотры
-            existing_factor_ids = set(
-                employee.medical_examinations.values_list('harmful_factor_id', flat=True)
-            )
+        for employee, factor in result['created']:
+            if dry_run:
+                self.stdout.write(f'  [PLAN] Будет создан: {employee.full_name_nominative} -> {factor.short_name}')
+            else:
+                self.stdout.write(f'  [OK] Создан медосмотр: {employee.full_name_nominative} -> {factor.short_name}')
 
-            # Создаем недостающие записи
-            for factor in harmful_factors:
-                if factor.id not in existing_factor_ids:
-                    if not dry_run:
-                        EmployeeMedicalExamination.objects.create(
-                            employee=employee,
-                            harmful_factor=factor,
-                        )
-                        self.stdout.write(
-                            f'  [OK] Создан медосмотр: {employee.full_name_nominative} -> {factor.short_name}'
-                        )
-                    else:
-                        self.stdout.write(
-                            f'  [PLAN] Будет создан: {employee.full_name_nominative} -> {factor.short_name}'
-                        )
-                    total_created += 1
+        for employee, factor in result['disabled']:
+            if dry_run:
+                self.stdout.write(f'  [PLAN] Будет отключен: {employee.full_name_nominative} -> {factor.short_name}')
+            else:
+                self.stdout.write(f'  [OK] Отключен медосмотр: {employee.full_name_nominative} -> {factor.short_name}')
 
         # Итоги
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=' * 60))
-        self.stdout.write(f'Обработано сотрудников: {total_employees}')
-        self.stdout.write(f'Без должности: {employees_without_position}')
+        self.stdout.write(f'Обработано сотрудников: {result["employees"]}')
+        self.stdout.write(f'Без должности: {result["without_position"]}')
 
         if dry_run:
-            self.stdout.write(f'Будет создано записей: {total_created}')
+            self.stdout.write(f'Будет создано записей: {len(result["created"])}')
+            if options['disable_obsolete']:
+                self.stdout.write(f'Будет отключено записей: {len(result["disabled"])}')
         else:
-            self.stdout.write(f'Создано записей: {total_created}')
+            self.stdout.write(f'Создано записей: {len(result["created"])}')
+            if options['disable_obsolete']:
+                self.stdout.write(f'Отключено записей: {len(result["disabled"])}')
 
         self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-17 17:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deadline_control', '0012_add_email_settings'),
+        ('directory', '0044_remove_commission_role_from_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeMedicalStatus',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='medical_status_record', serialize=False, to='directory.employee', verbose_name='Сотрудник')),
+                ('status', models.CharField(choices=[('no_date', 'Нужно внести дату'), ('expired', 'Просрочен'), ('upcoming', 'Скоро'), ('normal', 'В норме')], help_text='Статус на дату пересчёта', max_length=20, verbose_name='Статус')),
+                ('date_completed', models.DateField(blank=True, help_text='Самая ранняя дата прохождения по факторам должности', null=True, verbose_name='Дата прохождения')),
+                ('next_date', models.DateField(blank=True, null=True, verbose_name='Дата следующего медосмотра')),
+                ('min_periodicity', models.PositiveIntegerField(blank=True, null=True, verbose_name='Минимальная периодичность (месяцы)')),
+                ('factors', models.JSONField(blank=True, default=list, help_text="Список {'name', 'short_name', 'periodicity'}", verbose_name='Вредные факторы')),
+                ('exams_without_date_count', models.PositiveIntegerField(default=0, verbose_name='Медосмотров без даты')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Статус медосмотров сотрудника',
+                'verbose_name_plural': 'Статусы медосмотров сотрудников',
+                'indexes': [models.Index(fields=['status'], name='medstatus_status_idx'), models.Index(fields=['next_date'], name='medstatus_next_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.14 on 2026-10-17 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deadline_control', '0013_add_employee_medical_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employeemedicalexamination',
+            index=models.Index(condition=models.Q(('is_disabled', False)), fields=['employee', 'next_date'], name='medexam_active_emp_next_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeemedicalexamination',
+            index=models.Index(condition=models.Q(('is_disabled', False)), fields=['next_date'], name='medexam_active_next_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeemedicalexamination',
+            index=models.Index(condition=models.Q(('status__in', ['completed', 'to_issue'])), fields=['next_date'], name='medexam_open_next_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['organization', 'next_maintenance_date'], name='equipment_org_next_maint_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['next_maintenance_date'], name='equipment_next_maint_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='keydeadlineitem',
+            index=models.Index(fields=['category', 'next_date'], name='keydeadline_cat_next_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='keydeadlineitem',
+            index=models.Index(fields=['next_date'], name='keydeadline_next_date_idx'),
+        ),
+    ]
@@ -0,0 +1,161 @@
+# Data migration: первичное заполнение EmployeeMedicalStatus
+
+import calendar
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+# За сколько дней до срока медосмотр считается приближающимся
+# (значение на момент миграции; расчёт не зависит от кода приложения)
+UPCOMING_DAYS = 30
+
+
+def _add_months(source_date, months):
+    month = source_date.month - 1 + months
+    year = source_date.year + month // 12
+    month = month % 12 + 1
+    day = min(source_date.day, calendar.monthrange(year, month)[1])
+    return source_date.replace(year=year, month=month, day=day)
+
+
+def _factor_info(factor):
+    return {
+        'name': factor.full_name,
+        'short_name': factor.short_name,
+        'periodicity': factor.periodicity,
+    }
+
+
+def _compute_status(harmful_factors, examinations, today):
+    """
+    Статус медосмотров сотрудника: поля записи EmployeeMedicalStatus
+    или None, если должность не требует медосмотров.
+    """
+    if not harmful_factors:
+        return None
+
+    harmful_factor_ids = {factor.id for factor in harmful_factors}
+    examinations = [exam for exam in examinations if exam.harmful_factor_id in harmful_factor_ids]
+
+    if not examinations:
+        return {
+            'status': 'no_date',
+            'date_completed': None,
+            'next_date': None,
+            'min_periodicity': min(factor.periodicity for factor in harmful_factors),
+            'factors': [_factor_info(factor) for factor in harmful_factors],
+            'exams_without_date_count': 0,
+        }
+
+    factors = []
+    min_periodicity = None
+    earliest_date = None
+    exams_without_date_count = 0
+    for exam in examinations:
+        factor = exam.harmful_factor
+        factors.append(_factor_info(factor))
+        if min_periodicity is None or factor.periodicity < min_periodicity:
+            min_periodicity = factor.periodicity
+        if exam.date_completed:
+            if earliest_date is None or exam.date_completed < earliest_date:
+                earliest_date = exam.date_completed
+        else:
+            exams_without_date_count += 1
+
+    if earliest_date is None:
+        status, next_date = 'no_date', None
+    else:
+        next_date = _add_months(earliest_date, min_periodicity)
+        days_until = (next_date - today).days
+        if days_until < 0:
+            status = 'expired'
+        elif days_until <= UPCOMING_DAYS:
+            status = 'upcoming'
+        else:
+            status = 'normal'
+
+    return {
+        'status': status,
+        'date_completed': earliest_date,
+        'next_date': next_date,
+        'min_periodicity': min_periodicity,
+        'factors': factors,
+        'exams_without_date_count': exams_without_date_count,
+    }
+
+
+def backfill_medical_statuses(apps, schema_editor):
+    """
+    Заполняет таблицу статусов медосмотров для существующих сотрудников
+    (то же, что команда rebuild_medical_statuses), чтобы списки медосмотров
+    не были пустыми сразу после развёртывания.
+
+    Используются только исторические модели; расчёт статуса повторяет
+    deadline_control.utils.medical_status на момент миграции.
+    """
+    Employee = apps.get_model('directory', 'Employee')
+    Position = apps.get_model('directory', 'Position')
+    PositionMedicalFactor = apps.get_model('deadline_control', 'PositionMedicalFactor')
+    MedicalExaminationNorm = apps.get_model('deadline_control', 'MedicalExaminationNorm')
+    EmployeeMedicalExamination = apps.get_model('deadline_control', 'EmployeeMedicalExamination')
+    EmployeeMedicalStatus = apps.get_model('deadline_control', 'EmployeeMedicalStatus')
+
+    # Вредные факторы должностей: переопределения, иначе эталонные нормы по названию
+    overrides = defaultdict(list)
+    for position_factor in PositionMedicalFactor.objects.filter(is_disabled=False).select_related('harmful_factor'):
+        overrides[position_factor.position_id].append(position_factor.harmful_factor)
+
+    norms = defaultdict(list)
+    for norm in MedicalExaminationNorm.objects.select_related('harmful_factor'):
+        norms[norm.position_name].append(norm.harmful_factor)
+
+    factors_by_position = {
+        position_id: overrides.get(position_id) or norms.get(position_name, [])
+        for position_id, position_name in Position.objects.values_list('id', 'position_name')
+    }
+
+    today = timezone.now().date()
+    now = timezone.now()
+    employees = list(Employee.objects.filter(position__isnull=False).values_list('id', 'position_id'))
+
+    for start in range(0, len(employees), BATCH_SIZE):
+        chunk = [
+            (employee_id, position_id) for employee_id, position_id in employees[start:start + BATCH_SIZE]
+            if factors_by_position.get(position_id)
+        ]
+        if not chunk:
+            continue
+
+        examinations = defaultdict(list)
+        for exam in EmployeeMedicalExamination.objects.filter(
+            employee_id__in=[employee_id for employee_id, _ in chunk],
+            is_disabled=False
+        ).select_related('harmful_factor'):
+            examinations[exam.employee_id].append(exam)
+
+        records = []
+        for employee_id, position_id in chunk:
+            status = _compute_status(factors_by_position[position_id], examinations.get(employee_id, []), today)
+            if status:
+                records.append(EmployeeMedicalStatus(employee_id=employee_id, updated_at=now, **status))
+
+        EmployeeMedicalStatus.objects.bulk_create(records, ignore_conflicts=True)
+
+
+def clear_medical_statuses(apps, schema_editor):
+    """Обратная миграция - очищает таблицу статусов"""
+    apps.get_model('deadline_control', 'EmployeeMedicalStatus').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deadline_control', '0014_add_deadline_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_medical_statuses, clear_medical_statuses),
+    ]
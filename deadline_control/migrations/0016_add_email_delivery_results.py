@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deadline_control', '0015_backfill_employee_medical_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailsettings',
+            name='last_delivery_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя рассылка'),
+        ),
+        migrations.AddField(
+            model_name='emailsettings',
+            name='last_delivery_error',
+            field=models.TextField(blank=True, default='', verbose_name='Ошибка последней рассылки'),
+        ),
+        migrations.AddField(
+            model_name='emailsettings',
+            name='last_delivery_success',
+            field=models.BooleanField(blank=True, null=True, verbose_name='Последняя рассылка успешна'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deadline_control', '0016_add_email_delivery_results'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='employeemedicalstatus',
+            name='medstatus_status_idx',
+        ),
+    ]
@@ -6,6 +6,7 @@ from .key_deadline import KeyDeadlineCategory, KeyDeadlineItem
 from .medical_examination import HarmfulFactor, MedicalExaminationType, MedicalSettings
 from .medical_norm import MedicalExaminationNorm, PositionMedicalFactor, EmployeeMedicalExamination
 from .medical_referral import MedicalReferral
+from .medical_status import EmployeeMedicalStatus
 from .email_settings import EmailSettings
 
 __all__ = [
@@ -19,5 +20,6 @@ __all__ = [
     'PositionMedicalFactor',
     'EmployeeMedicalExamination',
     'MedicalReferral',
+    'EmployeeMedicalStatus',
     'EmailSettings',
 ]
@@ -93,6 +93,25 @@ class EmailSettings(models.Model):
         default=''
     )
 
+    # Результат последней рассылки (заполняется командой send_medical_notifications)
+    last_delivery_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Последняя рассылка"
+    )
+
+    last_delivery_success = models.BooleanField(
+        null=True,
+        blank=True,
+        verbose_name="Последняя рассылка успешна"
+    )
+
+    last_delivery_error = models.TextField(
+        verbose_name="Ошибка последней рассылки",
+        blank=True,
+        default=''
+    )
+
     # Метаданные
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -151,10 +170,11 @@ class EmailSettings(models.Model):
         ]
         return emails
 
-    def get_connection(self):
+    def get_connection(self, **kwargs):
         """
         Возвращает Django email connection с настройками этой организации.
         Используется для отправки email с кастомными SMTP параметрами.
+        Дополнительные параметры (например, timeout) передаются в бэкенд.
         """
         from django.core.mail import get_connection
 
@@ -170,6 +190,7 @@ class EmailSettings(models.Model):
             use_tls=self.email_use_tls,
             use_ssl=self.email_use_ssl,
             fail_silently=False,
+            **kwargs,
         )
 
     @classmethod
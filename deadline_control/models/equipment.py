@@ -124,3 +124,8 @@ class Equipment(models.Model):
         verbose_name_plural = "ТО оборудования"
         app_label = 'deadline_control'
         ordering = ['equipment_name']
+        indexes = [
+            # Счётчики и списки сроков ТО по организациям
+            models.Index(fields=['organization', 'next_maintenance_date'], name='equipment_org_next_maint_idx'),
+            models.Index(fields=['next_maintenance_date'], name='equipment_next_maint_idx'),
+        ]
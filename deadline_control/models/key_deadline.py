@@ -136,3 +136,8 @@ class KeyDeadlineItem(models.Model):
         verbose_name_plural = "Мероприятия"
         app_label = 'deadline_control'
         ordering = ['next_date', 'name']
+        indexes = [
+            # Счётчики и списки сроков мероприятий по категориям организаций
+            models.Index(fields=['category', 'next_date'], name='keydeadline_cat_next_idx'),
+            models.Index(fields=['next_date'], name='keydeadline_next_date_idx'),
+        ]
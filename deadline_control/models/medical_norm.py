@@ -206,6 +206,25 @@ class EmployeeMedicalExamination(models.Model):
         verbose_name = "Медосмотр сотрудника"
         verbose_name_plural = "Медосмотры сотрудников"
         ordering = ['-date_completed', 'employee']
+        indexes = [
+            # Счётчики и списки сроков по организациям (дашборды, уведомления)
+            models.Index(
+                fields=['employee', 'next_date'],
+                condition=models.Q(is_disabled=False),
+                name='medexam_active_emp_next_idx',
+            ),
+            models.Index(
+                fields=['next_date'],
+                condition=models.Q(is_disabled=False),
+                name='medexam_active_next_date_idx',
+            ),
+            # Смена статусов по срокам (update_medical_examination_statuses)
+            models.Index(
+                fields=['next_date'],
+                condition=models.Q(status__in=['completed', 'to_issue']),
+                name='medexam_open_next_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.employee} - {self.harmful_factor} ({self.date_completed})"
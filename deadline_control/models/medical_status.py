@@ -0,0 +1,145 @@
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from deadline_control.utils.medical_status import UPCOMING_DAYS
+
+
+class EmployeeMedicalStatusQuerySet(models.QuerySet):
+    def with_actual_status(self, today=None):
+        """
+        Аннотирует actual_status — статус на текущую дату.
+
+        Сохранённый status фиксируется на момент пересчёта, а для записей
+        с датой статус (expired / upcoming / normal) зависит от сегодняшнего дня,
+        поэтому для фильтрации и сортировки в списках используется actual_status.
+        """
+        today = today or timezone.now().date()
+        return self.annotate(
+            actual_status=Case(
+                When(next_date__isnull=True, then=Value('no_date')),
+                When(next_date__lt=today, then=Value('expired')),
+                When(next_date__lte=today + timedelta(days=UPCOMING_DAYS), then=Value('upcoming')),
+                default=Value('normal'),
+                output_field=CharField(),
+            )
+        )
+
+    def with_status(self, status, today=None):
+        """Фильтр по актуальному статусу"""
+        return self.with_actual_status(today).filter(actual_status=status)
+
+    def active_employees(self):
+        """Без кандидатов и уволенных"""
+        return self.exclude(employee__status__in=['candidate', 'fired'])
+
+
+class EmployeeMedicalStatus(models.Model):
+    """
+    🏥 Статус медосмотров сотрудника (денормализованная запись).
+
+    Одна строка на сотрудника, должность которого требует медосмотров.
+    Пересчитывается сигналами при изменении медосмотров, вредных факторов
+    должности, эталонных норм и должности сотрудника, а также ежедневно
+    командой rebuild_medical_statuses.
+
+    Расчёт: deadline_control.utils.medical_status.
+    """
+    STATUS_CHOICES = [
+        ('no_date', 'Нужно внести дату'),
+        ('expired', 'Просрочен'),
+        ('upcoming', 'Скоро'),
+        ('normal', 'В норме'),
+    ]
+
+    employee = models.OneToOneField(
+        'directory.Employee',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="medical_status_record",
+        verbose_name="Сотрудник"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        verbose_name="Статус",
+        help_text="Статус на дату пересчёта"
+    )
+
+    date_completed = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Дата прохождения",
+        help_text="Самая ранняя дата прохождения по факторам должности"
+    )
+
+    next_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Дата следующего медосмотра"
+    )
+
+    min_periodicity = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Минимальная периодичность (месяцы)"
+    )
+
+    factors = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Вредные факторы",
+        help_text="Список {'name', 'short_name', 'periodicity'}"
+    )
+
+    exams_without_date_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Медосмотров без даты"
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата пересчёта"
+    )
+
+    objects = EmployeeMedicalStatusQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Статус медосмотров сотрудника"
+        verbose_name_plural = "Статусы медосмотров сотрудников"
+        indexes = [
+            # Списки фильтруют и сортируют по actual_status, который вычисляется из next_date
+            models.Index(fields=['next_date'], name='medstatus_next_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id}: {self.get_status_display()}"
+
+    def as_status_dict(self, today=None):
+        """
+        Статус в формате Employee.get_medical_status() с days_until/status на сегодня.
+        """
+        today = today or timezone.now().date()
+        days_until = (self.next_date - today).days if self.next_date else None
+        if days_until is None:
+            status = 'no_date'
+        elif days_until < 0:
+            status = 'expired'
+        elif days_until <= UPCOMING_DAYS:
+            status = 'upcoming'
+        else:
+            status = 'normal'
+
+        return {
+            'has_date': self.next_date is not None,
+            'date_completed': self.date_completed,
+            'next_date': self.next_date,
+            'min_periodicity': self.min_periodicity,
+            'days_until': days_until,
+            'status': status,
+            'factors': self.factors,
+            'exams_without_date_count': self.exams_without_date_count,
+        }
@@ -0,0 +1,153 @@
+# deadline_control/signals.py
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import receiver
+
+from directory.models import Employee
+from deadline_control.models import (
+    Equipment,
+    KeyDeadlineCategory,
+    KeyDeadlineItem,
+    EmployeeMedicalExamination,
+    HarmfulFactor,
+    MedicalExaminationNorm,
+    PositionMedicalFactor,
+)
+from deadline_control.utils.deadline_counters import invalidate_deadline_counters
+from deadline_control.utils.medical_status import schedule_medical_status_refresh
+from deadline_control.utils.medical_sync import sync_medical_examinations
+from deadline_control.utils.position_factors import invalidate_position_factors
+
+
+def _get_stored_values(model, pk, *fields):
+    """Возвращает значения полей объекта в том виде, в каком они сохранены в БД"""
+    if not pk:
+        return None
+    return model.objects.filter(pk=pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=Equipment)
+@receiver(pre_save, sender=KeyDeadlineCategory)
+def cache_old_organization(sender, instance, **kwargs):
+    """
+    Запоминает прежнюю организацию объекта, чтобы при переносе
+    сбросить счётчики сроков и у старой организации.
+    """
+    stored = _get_stored_values(sender, instance.pk, 'organization_id') or {}
+    instance._old_organization_id = stored.get('organization_id')
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+@receiver(post_save, sender=KeyDeadlineCategory)
+@receiver(post_delete, sender=KeyDeadlineCategory)
+def invalidate_counters_for_organization_object(sender, instance, **kwargs):
+    """Сбрасывает счётчики при изменении оборудования или категории мероприятий"""
+    invalidate_deadline_counters(
+        instance.organization_id,
+        getattr(instance, '_old_organization_id', None),
+    )
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_counters_for_employee(sender, instance, **kwargs):
+    """
+    Сбрасывает счётчики медосмотров при переводе сотрудника в другую организацию
+    или его удалении (прежняя организация запоминается в directory/signals.py).
+    """
+    old_org_id = getattr(instance, '_old_organization_id', None)
+    if kwargs.get('signal') is post_delete or old_org_id != instance.organization_id:
+        invalidate_deadline_counters(instance.organization_id, old_org_id)
+
+
+@receiver(post_save, sender=KeyDeadlineItem)
+@receiver(post_delete, sender=KeyDeadlineItem)
+def invalidate_counters_for_deadline_item(sender, instance, **kwargs):
+    """Сбрасывает счётчики при изменении мероприятия"""
+    org_id = KeyDeadlineCategory.objects.filter(
+        pk=instance.category_id
+    ).values_list('organization_id', flat=True).first()
+    invalidate_deadline_counters(org_id)
+
+
+@receiver(post_save, sender=EmployeeMedicalExamination)
+@receiver(post_delete, sender=EmployeeMedicalExamination)
+def invalidate_counters_for_medical_examination(sender, instance, **kwargs):
+    """Сбрасывает счётчики при изменении медосмотра сотрудника"""
+    org_id = Employee.objects.filter(
+        pk=instance.employee_id
+    ).values_list('organization_id', flat=True).first()
+    invalidate_deadline_counters(org_id)
+
+
+# =============================================
+# Записи и статус медосмотров (EmployeeMedicalStatus)
+# =============================================
+
+@receiver(post_save, sender=Employee)
+def refresh_medical_status_for_employee(sender, instance, created, **kwargs):
+    """Пересчитывает статус медосмотров нового сотрудника или при смене должности"""
+    if created or getattr(instance, '_old_position_id', None) != instance.position_id:
+        schedule_medical_status_refresh([instance.pk])
+
+
+@receiver(post_save, sender=EmployeeMedicalExamination)
+@receiver(post_delete, sender=EmployeeMedicalExamination)
+def refresh_medical_status_for_examination(sender, instance, **kwargs):
+    """Пересчитывает статус медосмотров сотрудника при изменении его медосмотра"""
+    schedule_medical_status_refresh([instance.employee_id])
+
+
+@receiver(post_save, sender=HarmfulFactor)
+@receiver(post_delete, sender=HarmfulFactor)
+@receiver(post_save, sender=PositionMedicalFactor)
+@receiver(post_delete, sender=PositionMedicalFactor)
+@receiver(post_save, sender=MedicalExaminationNorm)
+@receiver(post_delete, sender=MedicalExaminationNorm)
+def invalidate_position_factors_cache(sender, instance, **kwargs):
+    """
+    Сбрасывает кеш вредных факторов должностей.
+    Подключён раньше синхронизации медосмотров, чтобы она видела новые факторы.
+    """
+    invalidate_position_factors()
+
+
+def _sync_position_employees(employees):
+    """Синхронизация медосмотров и пересчёт статусов сотрудников затронутых должностей"""
+    employees = list(employees.only('id', 'position_id', 'organization_id'))
+    sync_medical_examinations(employees)
+    schedule_medical_status_refresh(employee.id for employee in employees)
+
+
+@receiver(pre_save, sender=PositionMedicalFactor)
+def cache_old_position_factor(sender, instance, **kwargs):
+    stored = _get_stored_values(sender, instance.pk, 'position_id') or {}
+    instance._old_position_id = stored.get('position_id')
+
+
+@receiver(post_save, sender=PositionMedicalFactor)
+@receiver(post_delete, sender=PositionMedicalFactor)
+def refresh_medical_status_for_position_factor(sender, instance, **kwargs):
+    """
+    При изменении вредных факторов должности создаёт недостающие записи медосмотров
+    всем её сотрудникам (одним проходом) и пересчитывает их статусы.
+    """
+    position_ids = {instance.position_id, getattr(instance, '_old_position_id', None)} - {None}
+    _sync_position_employees(Employee.objects.filter(position_id__in=position_ids))
+
+
+@receiver(pre_save, sender=MedicalExaminationNorm)
+def cache_old_norm_position_name(sender, instance, **kwargs):
+    stored = _get_stored_values(sender, instance.pk, 'position_name') or {}
+    instance._old_position_name = stored.get('position_name')
+
+
+@receiver(post_save, sender=MedicalExaminationNorm)
+@receiver(post_delete, sender=MedicalExaminationNorm)
+def refresh_medical_status_for_norm(sender, instance, **kwargs):
+    """
+    При изменении эталонной нормы создаёт недостающие записи медосмотров сотрудникам
+    на должностях с этим названием (одним проходом) и пересчитывает их статусы.
+    """
+    position_names = {instance.position_name, getattr(instance, '_old_position_name', None)} - {None}
+    _sync_position_employees(Employee.objects.filter(position__position_name__in=position_names))
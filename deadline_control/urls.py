@@ -41,6 +41,8 @@ medical_patterns = [
     # API для направлений
     path('referral/api/employee/<int:employee_id>/', medical_referral.EmployeeReferralDataView.as_view(), name='referral_employee_data'),
     path('referral/generate/', medical_referral.GenerateReferralView.as_view(), name='referral_generate'),
+    # Пакетная выдача направлений по организации
+    path('referral/batch/', medical_referral.BatchReferralView.as_view(), name='referral_batch'),
     # Форма для направления нового сотрудника
     path('referral/new-employee/', medical_referral.NewEmployeeReferralView.as_view(), name='referral_new_employee'),
 ]
@@ -0,0 +1 @@
+# deadline_control/utils/__init__.py
@@ -0,0 +1,149 @@
+# deadline_control/utils/deadline_aggregation.py
+"""
+Агрегация сроков (оборудование, ключевые мероприятия, медосмотры) на стороне БД.
+
+Вместо перебора queryset'ов в Python каждый вид сроков обсчитывается одним
+запросом с условной агрегацией (Count + filter), а списки просроченных и
+приближающихся элементов выбираются ограниченными (top-N) запросами,
+отсортированными по дате.
+
+Используется в:
+    - deadline_control.views.dashboard.DashboardView
+    - directory.views.home.HomePageView (через deadline_counters)
+    - deadline_control.context_processors.notifications (через deadline_counters)
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+@dataclass(frozen=True)
+class DeadlineSource:
+    """Описание вида сроков: поле организации, поле даты и связи для списков"""
+    kind: str
+    org_field: str
+    date_field: str
+    select_related: tuple
+
+
+EQUIPMENT_SOURCE = DeadlineSource(
+    kind='equipment',
+    org_field='organization_id',
+    date_field='next_maintenance_date',
+    select_related=('organization',),
+)
+DEADLINES_SOURCE = DeadlineSource(
+    kind='deadlines',
+    org_field='category__organization_id',
+    date_field='next_date',
+    select_related=('category',),
+)
+MEDICAL_SOURCE = DeadlineSource(
+    kind='medical',
+    org_field='employee__organization_id',
+    date_field='next_date',
+    select_related=('employee__organization', 'harmful_factor'),
+)
+
+SOURCES = (EQUIPMENT_SOURCE, DEADLINES_SOURCE, MEDICAL_SOURCE)
+
+
+def get_base_querysets():
+    """
+    Базовые queryset'ы по видам сроков (без ограничения по правам доступа).
+    """
+    from deadline_control.models import Equipment, KeyDeadlineItem, EmployeeMedicalExamination
+
+    return {
+        EQUIPMENT_SOURCE.kind: Equipment.objects.all(),
+        DEADLINES_SOURCE.kind: KeyDeadlineItem.objects.filter(category__is_active=True),
+        MEDICAL_SOURCE.kind: EmployeeMedicalExamination.objects.filter(is_disabled=False),
+    }
+
+
+def _status_aggregates(date_field, today, warning_date):
+    """Выражения для подсчёта всего / просрочено / скоро одним запросом"""
+    return {
+        'total': Count('pk'),
+        'overdue': Count('pk', filter=Q(**{f'{date_field}__lt': today})),
+        'upcoming': Count('pk', filter=Q(**{
+            f'{date_field}__gte': today,
+            f'{date_field}__lte': warning_date,
+        })),
+    }
+
+
+def count_deadlines_by_organization(org_ids, today, warning_date):
+    """
+    Считает сроки по организациям: один GROUP BY запрос на каждый вид сроков.
+
+    Returns:
+        dict: {org_id: {'equipment': {'total', 'overdue', 'upcoming'}, 'deadlines': {...}, 'medical': {...}}}
+    """
+    result = {
+        org_id: {source.kind: {'total': 0, 'overdue': 0, 'upcoming': 0} for source in SOURCES}
+        for org_id in org_ids
+    }
+    if not result:
+        return result
+
+    querysets = get_base_querysets()
+    for source in SOURCES:
+        rows = querysets[source.kind].filter(
+            **{f'{source.org_field}__in': list(result)}
+        ).order_by().values(source.org_field).annotate(
+            **_status_aggregates(source.date_field, today, warning_date)
+        )
+        for row in rows:
+            result[row[source.org_field]][source.kind] = {
+                'total': row['total'],
+                'overdue': row['overdue'],
+                'upcoming': row['upcoming'],
+            }
+
+    return result
+
+
+def summarize_deadlines(querysets, warning_days=14, top_n=50):
+    """
+    Сводка по уже отфильтрованным (по правам/организации) queryset'ам.
+
+    Args:
+        querysets: {'equipment': qs, 'deadlines': qs, 'medical': qs}
+        warning_days: за сколько дней срок считается приближающимся
+        top_n: сколько элементов возвращать в списках просроченных/приближающихся
+
+    Returns:
+        dict: {kind: {'total', 'overdue', 'upcoming', 'overdue_items', 'upcoming_items'}}
+    """
+    today = timezone.now().date()
+    warning_date = today + timedelta(days=warning_days)
+
+    summary = {}
+    for source in SOURCES:
+        queryset = querysets[source.kind].order_by()
+        counts = queryset.aggregate(**_status_aggregates(source.date_field, today, warning_date))
+
+        items_qs = queryset.select_related(*source.select_related).order_by(source.date_field, 'pk')
+        overdue_items = list(
+            items_qs.filter(**{f'{source.date_field}__lt': today})[:top_n]
+        ) if counts['overdue'] else []
+        upcoming_items = list(
+            items_qs.filter(**{
+                f'{source.date_field}__gte': today,
+                f'{source.date_field}__lte': warning_date,
+            })[:top_n]
+        ) if counts['upcoming'] else []
+
+        summary[source.kind] = {
+            'total': counts['total'],
+            'overdue': counts['overdue'],
+            'upcoming': counts['upcoming'],
+            'overdue_items': overdue_items,
+            'upcoming_items': upcoming_items,
+        }
+
+    return summary
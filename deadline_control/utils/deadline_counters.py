@@ -0,0 +1,126 @@
+# deadline_control/utils/deadline_counters.py
+"""
+Предрасчитанные счётчики просроченных и приближающихся сроков по организациям.
+
+Счётчики хранятся в Django cache отдельной записью на каждую организацию:
+    {'equipment': {'total': T, 'overdue': N, 'upcoming': M}, 'deadlines': {...}, 'medical': {...}}
+
+Поддержание актуальности:
+    - ключ содержит текущую дату → ежедневный rollover происходит автоматически
+    - ключ содержит версию организации → сигналы (deadline_control/signals.py)
+      увеличивают версию при сохранении/удалении оборудования, мероприятий
+      и медосмотров, после чего счётчики пересчитываются при первом обращении
+    - пересчёт недостающих организаций выполняется одним агрегирующим запросом
+      на каждый вид сроков, независимо от количества организаций
+      (deadline_control/utils/deadline_aggregation.py)
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from deadline_control.utils.deadline_aggregation import count_deadlines_by_organization
+
+DEADLINE_COUNTERS_PREFIX = 'deadline_counters'
+DEADLINE_COUNTERS_TIMEOUT = 60 * 60 * 24
+DEADLINE_KINDS = ('equipment', 'deadlines', 'medical')
+
+
+def _get_version_key(org_id):
+    return f'{DEADLINE_COUNTERS_PREFIX}:version:{org_id}'
+
+
+def _get_counters_key(org_id, version, today, warning_days):
+    return f'{DEADLINE_COUNTERS_PREFIX}:{org_id}:{version}:{today.isoformat()}:{warning_days}'
+
+
+def _empty_counters():
+    return {kind: {'total': 0, 'overdue': 0, 'upcoming': 0} for kind in DEADLINE_KINDS}
+
+
+def _bump_versions(org_ids):
+    for org_id in org_ids:
+        version_key = _get_version_key(org_id)
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 2, None)
+
+
+def invalidate_deadline_counters(*org_ids):
+    """
+    Сбрасывает счётчики указанных организаций (увеличивает их версию).
+
+    Версия увеличивается сразу и повторно после фиксации транзакции:
+    счётчики, закешированные другими запросами до фиксации по старым
+    данным, становятся недействительными.
+    """
+    org_ids = {org_id for org_id in org_ids if org_id}
+    if not org_ids:
+        return
+    _bump_versions(org_ids)
+    transaction.on_commit(lambda: _bump_versions(org_ids))
+
+
+def compute_deadline_counters(org_ids, today, warning_date):
+    """
+    Считает сроки для набора организаций (см. count_deadlines_by_organization).
+
+    Returns:
+        dict: {org_id: {'equipment': {...}, 'deadlines': {...}, 'medical': {...}}}
+    """
+    return count_deadlines_by_organization(org_ids, today, warning_date)
+
+
+def get_deadline_counters(org_ids, warning_days=7):
+    """
+    Возвращает счётчики сроков для организаций, пересчитывая только отсутствующие в кеше.
+
+    Args:
+        org_ids: итерируемый набор ID организаций
+        warning_days: за сколько дней срок считается приближающимся
+
+    Returns:
+        dict: {org_id: {'equipment': {...}, 'deadlines': {...}, 'medical': {...}}}
+    """
+    org_ids = list(org_ids)
+    if not org_ids:
+        return {}
+
+    today = timezone.now().date()
+
+    versions = cache.get_many([_get_version_key(org_id) for org_id in org_ids])
+    keys = {
+        org_id: _get_counters_key(
+            org_id, versions.get(_get_version_key(org_id), 1), today, warning_days
+        )
+        for org_id in org_ids
+    }
+
+    cached = cache.get_many(list(keys.values()))
+    counters = {org_id: cached[key] for org_id, key in keys.items() if key in cached}
+
+    missing = [org_id for org_id in org_ids if org_id not in counters]
+    if missing:
+        computed = compute_deadline_counters(missing, today, today + timedelta(days=warning_days))
+        cache.set_many(
+            {keys[org_id]: value for org_id, value in computed.items()},
+            DEADLINE_COUNTERS_TIMEOUT
+        )
+        counters.update(computed)
+
+    return counters
+
+
+def sum_deadline_counters(counters):
+    """
+    Суммирует счётчики нескольких организаций по видам сроков.
+    """
+    totals = _empty_counters()
+    for org_counters in counters.values():
+        for kind in DEADLINE_KINDS:
+            for key in ('total', 'overdue', 'upcoming'):
+                totals[kind][key] += org_counters[kind][key]
+    return totals
@@ -0,0 +1,171 @@
+# deadline_control/utils/email_delivery.py
+"""
+📧 Пакетная отправка email-уведомлений
+
+Письма группируются по SMTP-конфигурации (EmailSettings с одинаковыми
+сервером, портом, логином и т.д.): на каждую группу открывается одно
+соединение, через которое отправляются все её письма.
+
+Группы обрабатываются параллельно в ограниченном пуле потоков, поэтому
+медленный или недоступный SMTP-сервер одной организации не задерживает
+остальные. Потоки только отправляют готовые письма и не обращаются к БД;
+результаты сохраняются в EmailSettings после отправки (save_delivery_results).
+
+Настройки:
+    EMAIL_DELIVERY_WORKERS — число потоков (по умолчанию 8)
+    EMAIL_DELIVERY_TIMEOUT — таймаут SMTP-соединения в секундах (по умолчанию 30)
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EmailDelivery:
+    """Письмо для отправки через SMTP-настройки организации"""
+    email_settings: Any
+    message: Any  # django.core.mail.EmailMessage
+    label: str = ''
+
+    # Заполняются при отправке
+    success: bool = False
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    @property
+    def recipients(self) -> List[str]:
+        return self.message.recipients()
+
+
+@dataclass
+class DeliveryReport:
+    """Итоги отправки пакета писем"""
+    deliveries: List[EmailDelivery] = field(default_factory=list)
+    connections: int = 0
+    duration: float = 0.0
+
+    @property
+    def sent(self) -> List[EmailDelivery]:
+        return [delivery for delivery in self.deliveries if delivery.success]
+
+    @property
+    def failed(self) -> List[EmailDelivery]:
+        return [delivery for delivery in self.deliveries if not delivery.success]
+
+
+def get_delivery_workers() -> int:
+    return max(1, getattr(settings, 'EMAIL_DELIVERY_WORKERS', 8))
+
+
+def get_smtp_config_key(email_settings):
+    """Ключ SMTP-конфигурации: письма с одинаковым ключом идут через одно соединение"""
+    return (
+        email_settings.email_backend,
+        email_settings.email_host,
+        email_settings.email_port,
+        email_settings.email_host_user,
+        email_settings.email_host_password,
+        email_settings.email_use_tls,
+        email_settings.email_use_ssl,
+    )
+
+
+def _deliver_group(deliveries: List[EmailDelivery]):
+    """Отправляет письма одной SMTP-конфигурации через одно соединение"""
+    started = time.monotonic()
+    timeout = getattr(settings, 'EMAIL_DELIVERY_TIMEOUT', 30)
+
+    try:
+        connection = deliveries[0].email_settings.get_connection(timeout=timeout)
+        if connection is None:
+            raise ValueError('SMTP сервер не настроен или уведомления отключены')
+        connection.open()
+    except Exception as e:
+        logger.error(f"Не удалось подключиться к SMTP ({deliveries[0].label}): {e}")
+        for delivery in deliveries:
+            delivery.error = f'Ошибка подключения: {e}'
+            delivery.duration = time.monotonic() - started
+        return
+
+    try:
+        for delivery in deliveries:
+            message_started = time.monotonic()
+            try:
+                # По одному письму за вызов: ошибка одного не отменяет остальные
+                delivery.message.connection = connection
+                delivery.success = connection.send_messages([delivery.message]) == 1
+                if not delivery.success:
+                    delivery.error = 'Письмо не отправлено'
+            except Exception as e:
+                delivery.error = str(e)
+                logger.error(f"Ошибка при отправке email ({delivery.label}): {e}")
+            delivery.duration = time.monotonic() - message_started
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def deliver_emails(deliveries: List[EmailDelivery], max_workers: Optional[int] = None) -> DeliveryReport:
+    """
+    Отправляет письма, группируя их по SMTP-конфигурации.
+
+    Args:
+        deliveries: письма для отправки (результат записывается в каждый элемент)
+        max_workers: число потоков (по умолчанию EMAIL_DELIVERY_WORKERS)
+
+    Returns:
+        DeliveryReport
+    """
+    started = time.monotonic()
+
+    groups = {}
+    for delivery in deliveries:
+        groups.setdefault(get_smtp_config_key(delivery.email_settings), []).append(delivery)
+
+    workers = min(max_workers or get_delivery_workers(), len(groups)) or 1
+    if workers == 1:
+        for group in groups.values():
+            _deliver_group(group)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='email-delivery') as executor:
+            list(executor.map(_deliver_group, groups.values()))
+
+    report = DeliveryReport(
+        deliveries=list(deliveries),
+        connections=len(groups),
+        duration=time.monotonic() - started,
+    )
+    logger.info(
+        f"Отправка email завершена: {len(report.sent)} отправлено, {len(report.failed)} ошибок, "
+        f"{report.connections} SMTP-соединений, {report.duration:.1f} с"
+    )
+    return report
+
+
+def save_delivery_results(report: DeliveryReport):
+    """
+    Сохраняет результат отправки в настройках email каждой организации
+    (last_delivery_at / last_delivery_success / last_delivery_error).
+
+    Вызывается после deliver_emails в основном потоке; update() не меняет updated_at настроек.
+    """
+    from deadline_control.models import EmailSettings
+
+    now = timezone.now()
+    for delivery in report.deliveries:
+        if delivery.email_settings.pk is None:
+            continue
+        EmailSettings.objects.filter(pk=delivery.email_settings.pk).update(
+            last_delivery_at=now,
+            last_delivery_success=delivery.success,
+            last_delivery_error=delivery.error or '',
+        )
@@ -0,0 +1,286 @@
+# deadline_control/utils/medical_referrals.py
+"""
+📋 Формирование направлений на медосмотр
+
+Общие функции для выдачи одного направления и пакетной выдачи
+(например, перед ежегодной кампанией медосмотров):
+    - сотрудники, у которых срок медосмотра наступает в ближайшие N дней,
+      выбираются одним запросом (EXISTS по активным медосмотрам)
+    - вредные факторы должностей берутся из кеша (position_factors)
+    - записи MedicalReferral и их факторы создаются пакетно
+    - документы рендерятся параллельно в ограниченном пуле потоков из
+      кешированного шаблона организации (MedicalSettings.referral_template);
+      потоки только заполняют шаблон и не обращаются к БД
+    - результат: один объединённый DOCX (docxcompose) или ZIP с папками
+      по подразделениям
+
+Настройки:
+    MEDICAL_REFERRAL_WORKERS — число потоков рендера (по умолчанию 4)
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from deadline_control.utils.position_factors import get_factors_for_positions
+
+logger = logging.getLogger(__name__)
+
+try:
+    from directory.document_generators.template_cache import load_docx_template, jinja_env as template_jinja_env
+    DOCXTPL_AVAILABLE = True
+except ImportError:
+    DOCXTPL_AVAILABLE = False
+
+# Папка в архиве для сотрудников без подразделения
+NO_SUBDIVISION_FOLDER = 'Без подразделения'
+
+
+def get_referral_workers() -> int:
+    return max(1, getattr(settings, 'MEDICAL_REFERRAL_WORKERS', 4))
+
+
+def get_referral_template_path(organization):
+    """
+    Путь к шаблону направления: шаблон из настроек организации или эталонный.
+
+    Raises:
+        FileNotFoundError: шаблон не найден
+    """
+    from deadline_control.models import MedicalSettings
+
+    medical_settings = MedicalSettings.get_settings(organization)
+
+    if medical_settings and medical_settings.referral_template:
+        # Используем шаблон из настроек
+        template_path = medical_settings.referral_template.path
+    else:
+        # Используем эталонный шаблон (исправленная версия)
+        template_path = os.path.join(
+            settings.MEDIA_ROOT,
+            'document_templates',
+            'etalon',
+            'napravlenie_blank_fixed.docx'
+        )
+        # Если исправленный шаблон не найден, пробуем оригинальный
+        if not os.path.exists(template_path):
+            template_path = os.path.join(
+                settings.MEDIA_ROOT,
+                'document_templates',
+                'etalon',
+                'napravlenie_blank.docx'
+            )
+
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Шаблон направления не найден: {template_path}")
+
+    return template_path
+
+
+def build_referral_context(referral, harmful_factors):
+    """
+    Контекст шаблона направления.
+
+    Args:
+        referral: MedicalReferral (с загруженными employee, organization, position)
+        harmful_factors: вредные факторы направления
+    """
+    employee = referral.employee
+    organization = employee.organization
+
+    # Разбиваем ФИО на части
+    name_parts = employee.full_name_nominative.split()
+    last_name = name_parts[0] if len(name_parts) > 0 else ''
+    first_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else ''
+
+    # Формируем список вредных факторов (только полное наименование)
+    factors_list = [factor.full_name for factor in harmful_factors]
+    harmful_factors_text = '\n'.join(factors_list) if factors_list else 'Не определены'
+
+    return {
+        'organization_name': organization.full_name_ru,
+        'organization_name_by': getattr(organization, 'full_name_by', organization.full_name_ru),
+        'requisites_ru': getattr(organization, 'requisites_ru', ''),
+        'requisites_by': getattr(organization, 'requisites_by', ''),
+        'last_name': last_name,
+        'first_name': first_name,
+        'full_name': employee.full_name_nominative,
+        'date_of_birth': referral.employee_birth_date.strftime('%d.%m.%Y'),
+        'address': referral.employee_address,
+        'position_name': employee.position.position_name,
+        'harmful_factors': harmful_factors_text,
+        'issue_date': referral.issue_date.strftime('%d.%m.%Y'),
+    }
+
+
+def render_referral(template_path, context) -> bytes:
+    """Заполняет шаблон направления и возвращает содержимое DOCX"""
+    doc = load_docx_template(template_path)
+    doc.render(context, jinja_env=template_jinja_env)
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def get_referral_filename(referral):
+    return f"referral_{referral.id}_{referral.employee.full_name_nominative.replace(' ', '_')}.docx"
+
+
+def select_due_employees(employees, days, today=None):
+    """
+    Сотрудники, у которых срок хотя бы одного активного медосмотра
+    наступает не позднее чем через days дней (включая просроченные).
+
+    Args:
+        employees: QuerySet Employee (уже ограниченный правами доступа)
+        days: горизонт в днях
+    """
+    from deadline_control.models import EmployeeMedicalExamination
+
+    today = today or timezone.now().date()
+    due_exams = EmployeeMedicalExamination.objects.filter(
+        employee=OuterRef('pk'),
+        is_disabled=False,
+        next_date__lte=today + timedelta(days=days),
+    )
+    return employees.exclude(
+        status__in=['candidate', 'fired']
+    ).filter(
+        Exists(due_exams)
+    ).select_related(
+        'organization', 'position', 'subdivision', 'department'
+    ).order_by('subdivision__name', 'department__name', 'full_name_nominative')
+
+
+def create_batch_referrals(employees, issued_by=None, max_workers=None):
+    """
+    Пакетно выдаёт направления сотрудникам и формирует их документы.
+
+    Сотрудники без должности или вредных факторов пропускаются.
+    Документы рендерятся до открытия транзакции: при ошибке рендера ни одно
+    направление не создаётся. Если транзакция откатывается после записи
+    файлов, записанные файлы удаляются.
+
+    Raises:
+        FileNotFoundError: не найден шаблон направления
+
+    Returns:
+        dict: {
+            'items': [(referral, content), ...] в порядке сотрудников,
+            'skipped': [(employee, причина), ...],
+        }
+    """
+    from deadline_control.models import MedicalReferral
+
+    if not DOCXTPL_AVAILABLE:
+        raise RuntimeError('Библиотека docxtpl не установлена')
+
+    employees = list(employees)
+    factors_by_position = get_factors_for_positions(employee.position_id for employee in employees)
+
+    referrals = []
+    factors_by_referral = []
+    skipped = []
+    for employee in employees:
+        factors = factors_by_position.get(employee.position_id, [])
+        if not employee.position_id:
+            skipped.append((employee, 'не указана должность'))
+        elif not factors:
+            skipped.append((employee, 'не определены вредные факторы'))
+        else:
+            referrals.append(MedicalReferral(
+                employee=employee,
+                employee_birth_date=employee.date_of_birth,
+                employee_address=employee.place_of_residence or '',
+                issue_date=timezone.now().date(),
+                issued_by=issued_by,
+            ))
+            factors_by_referral.append(factors)
+
+    if not referrals:
+        return {'items': [], 'skipped': skipped}
+
+    # Шаблон определяется один раз на организацию
+    template_paths = {}
+    for referral in referrals:
+        organization = referral.employee.organization
+        if organization.id not in template_paths:
+            template_paths[organization.id] = get_referral_template_path(organization)
+
+    # Рендер - до транзакции: контексту не нужны id направлений
+    jobs = [
+        (template_paths[referral.employee.organization_id], build_referral_context(referral, factors))
+        for referral, factors in zip(referrals, factors_by_referral)
+    ]
+    workers = min(max_workers or get_referral_workers(), len(jobs))
+    if workers == 1:
+        contents = [render_referral(*job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='medical-referral') as executor:
+            contents = list(executor.map(lambda job: render_referral(*job), jobs))
+
+    saved_files = []
+    try:
+        with transaction.atomic():
+            MedicalReferral.objects.bulk_create(referrals)
+            Through = MedicalReferral.harmful_factors.through
+            Through.objects.bulk_create([
+                Through(medicalreferral_id=referral.id, harmfulfactor_id=factor.id)
+                for referral, factors in zip(referrals, factors_by_referral)
+                for factor in factors
+            ])
+
+            # Имена файлов содержат id направления, поэтому файлы пишутся после вставки
+            for referral, content in zip(referrals, contents):
+                referral.document.save(get_referral_filename(referral), ContentFile(content), save=False)
+                saved_files.append(referral.document.name)
+            MedicalReferral.objects.bulk_update(referrals, ['document'], batch_size=1000)
+    except Exception:
+        # Транзакция откатилась - удаляем уже записанные файлы
+        storage = MedicalReferral._meta.get_field('document').storage
+        for name in saved_files:
+            try:
+                storage.delete(name)
+            except OSError as e:
+                logger.warning(f"Не удалось удалить файл направления {name}: {e}")
+        raise
+
+    logger.info(f"Выдано направлений на медосмотр: {len(referrals)}, пропущено сотрудников: {len(skipped)}")
+    return {'items': list(zip(referrals, contents)), 'skipped': skipped}
+
+
+def merge_referral_documents(contents) -> bytes:
+    """Объединяет документы направлений в один DOCX (каждое с новой страницы)"""
+    from docx import Document
+    from docxcompose.composer import Composer
+
+    contents = list(contents)
+    master = Document(io.BytesIO(contents[0]))
+    composer = Composer(master)
+    for content in contents[1:]:
+        master.add_page_break()
+        composer.append(Document(io.BytesIO(content)))
+
+    output = io.BytesIO()
+    composer.save(output)
+    return output.getvalue()
+
+
+def get_subdivision_folder(employee):
+    """Папка в архиве: подразделение / отдел сотрудника"""
+    parts = [unit.name for unit in (employee.subdivision, employee.department) if unit]
+    folder = '/'.join(part.replace('/', '_').strip() for part in parts)
+    return folder or NO_SUBDIVISION_FOLDER
+
+
+def iter_referral_archive_files(items):
+    """Файлы архива (filename, content), сгруппированные по подразделениям"""
+    for referral, content in items:
+        yield f"{get_subdivision_folder(referral.employee)}/{get_referral_filename(referral)}", content
@@ -0,0 +1,245 @@
+# deadline_control/utils/medical_status.py
+"""
+🏥 Пакетный расчёт статуса медосмотров сотрудников
+
+Для набора сотрудников вредные факторы, эталонные нормы и записи медосмотров
+загружаются фиксированным числом запросов (не зависящим от числа сотрудников),
+а статус каждого сотрудника считается в памяти.
+
+Вредные факторы должностей определяются с учётом иерархии переопределений
+и эталонных норм (см. deadline_control/utils/position_factors.py).
+
+Используется в:
+    - Employee.get_medical_status() (для одного сотрудника)
+    - пересчёте денормализованной таблицы EmployeeMedicalStatus
+      (сигналы deadline_control/signals.py и команда rebuild_medical_statuses)
+"""
+
+from collections import defaultdict
+
+from django.utils import timezone
+
+from deadline_control.utils.position_factors import get_factors_for_positions
+
+# За сколько дней до срока медосмотр считается приближающимся
+UPCOMING_DAYS = 30
+
+
+def _factor_info(factor):
+    return {
+        'name': factor.full_name,
+        'short_name': factor.short_name,
+        'periodicity': factor.periodicity,
+    }
+
+
+def compute_medical_status(harmful_factors, examinations, today):
+    """
+    Рассчитывает статус медосмотров по уже загруженным данным (без запросов к БД).
+
+    Args:
+        harmful_factors: вредные факторы должности сотрудника
+        examinations: активные записи медосмотров сотрудника (с harmful_factor)
+        today: текущая дата
+
+    Returns:
+        dict или None: см. Employee.get_medical_status()
+    """
+    # Если вообще нет факторов - медосмотры не требуются
+    if not harmful_factors:
+        return None
+
+    # Только медосмотры по факторам должности
+    harmful_factor_ids = {factor.id for factor in harmful_factors}
+    examinations = [exam for exam in examinations if exam.harmful_factor_id in harmful_factor_ids]
+
+    # Если записей медосмотров нет - используем факторы напрямую
+    if not examinations:
+        return {
+            'has_date': False,
+            'date_completed': None,
+            'next_date': None,
+            'min_periodicity': min(factor.periodicity for factor in harmful_factors),
+            'days_until': None,
+            'status': 'no_date',
+            'factors': [_factor_info(factor) for factor in harmful_factors],
+        }
+
+    # Если записи есть - анализируем их
+    factors = []
+    min_periodicity = None
+    earliest_date = None
+    exams_without_date_count = 0
+
+    for exam in examinations:
+        factor = exam.harmful_factor
+        factors.append(_factor_info(factor))
+
+        # Находим минимальную периодичность
+        if min_periodicity is None or factor.periodicity < min_periodicity:
+            min_periodicity = factor.periodicity
+
+        # Проверяем, есть ли дата
+        if exam.date_completed:
+            if earliest_date is None or exam.date_completed < earliest_date:
+                earliest_date = exam.date_completed
+        else:
+            exams_without_date_count += 1
+
+    # Если нет ни одной даты - статус "нужно внести дату"
+    if earliest_date is None:
+        return {
+            'has_date': False,
+            'date_completed': None,
+            'next_date': None,
+            'min_periodicity': min_periodicity,
+            'days_until': None,
+            'status': 'no_date',
+            'factors': factors,
+            'exams_without_date_count': exams_without_date_count,
+        }
+
+    # Рассчитываем следующую дату на основе минимальной периодичности
+    from deadline_control.models import EmployeeMedicalExamination
+
+    next_date = EmployeeMedicalExamination._add_months(earliest_date, min_periodicity)
+    days_until = (next_date - today).days
+
+    # Определяем статус
+    if days_until < 0:
+        status = 'expired'
+    elif days_until <= UPCOMING_DAYS:
+        status = 'upcoming'
+    else:
+        status = 'normal'
+
+    return {
+        'has_date': True,
+        'date_completed': earliest_date,
+        'next_date': next_date,
+        'min_periodicity': min_periodicity,
+        'days_until': days_until,
+        'status': status,
+        'factors': factors,
+        'exams_without_date_count': exams_without_date_count,
+    }
+
+
+def get_medical_statuses(employees, today=None):
+    """
+    Рассчитывает статус медосмотров для набора сотрудников.
+
+    Args:
+        employees: итерируемый набор Employee (queryset или список)
+        today: дата расчёта (по умолчанию - сегодня)
+
+    Returns:
+        dict: {employee_id: dict или None}
+    """
+    from deadline_control.models import EmployeeMedicalExamination
+
+    employees = list(employees)
+    if not employees:
+        return {}
+
+    today = today or timezone.now().date()
+    factors_by_position = get_factors_for_positions(employee.position_id for employee in employees)
+
+    # Активные медосмотры только тех сотрудников, у чьих должностей есть факторы
+    employee_ids = [
+        employee.id for employee in employees
+        if factors_by_position.get(employee.position_id)
+    ]
+    examinations_by_employee = defaultdict(list)
+    if employee_ids:
+        for exam in EmployeeMedicalExamination.objects.filter(
+            employee_id__in=employee_ids,
+            is_disabled=False  # Игнорируем отключенные медосмотры
+        ).select_related('harmful_factor'):
+            examinations_by_employee[exam.employee_id].append(exam)
+
+    return {
+        employee.id: compute_medical_status(
+            factors_by_position.get(employee.position_id, []),
+            examinations_by_employee.get(employee.id, []),
+            today,
+        )
+        for employee in employees
+    }
+
+
+# =============================================
+# ДЕНОРМАЛИЗОВАННАЯ ТАБЛИЦА EmployeeMedicalStatus
+# =============================================
+
+REFRESH_CHUNK_SIZE = 1000
+
+_STATUS_RECORD_FIELDS = (
+    'status', 'date_completed', 'next_date', 'min_periodicity',
+    'factors', 'exams_without_date_count', 'updated_at',
+)
+
+
+def refresh_medical_status_records(employee_ids, today=None):
+    """
+    Пересчитывает записи EmployeeMedicalStatus для указанных сотрудников.
+
+    Сотрудники, которым медосмотры не требуются (или удалённые), теряют запись.
+    Запросы выполняются пачками по REFRESH_CHUNK_SIZE сотрудников.
+
+    Returns:
+        tuple: (обновлено/создано, удалено)
+    """
+    from directory.models import Employee
+    from deadline_control.models import EmployeeMedicalStatus
+
+    employee_ids = sorted({employee_id for employee_id in employee_ids if employee_id})
+    today = today or timezone.now().date()
+    now = timezone.now()
+
+    saved = deleted = 0
+    for start in range(0, len(employee_ids), REFRESH_CHUNK_SIZE):
+        chunk = employee_ids[start:start + REFRESH_CHUNK_SIZE]
+        employees = Employee.objects.filter(id__in=chunk).only('id', 'position_id')
+        statuses = get_medical_statuses(employees, today)
+
+        records = [
+            EmployeeMedicalStatus(
+                employee_id=employee_id,
+                status=status['status'],
+                date_completed=status['date_completed'],
+                next_date=status['next_date'],
+                min_periodicity=status['min_periodicity'],
+                factors=status['factors'],
+                exams_without_date_count=status.get('exams_without_date_count', 0),
+                updated_at=now,
+            )
+            for employee_id, status in statuses.items()
+            if status
+        ]
+        if records:
+            EmployeeMedicalStatus.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['employee'],
+                update_fields=_STATUS_RECORD_FIELDS,
+            )
+            saved += len(records)
+
+        stale_ids = set(chunk) - {record.employee_id for record in records}
+        if stale_ids:
+            deleted += EmployeeMedicalStatus.objects.filter(employee_id__in=stale_ids).delete()[0]
+
+    return saved, deleted
+
+
+def schedule_medical_status_refresh(employee_ids):
+    """
+    Пересчёт записей после фиксации текущей транзакции (сразу - вне транзакции).
+    Вызывается из сигналов deadline_control/signals.py.
+    """
+    from django.db import transaction
+
+    employee_ids = {employee_id for employee_id in employee_ids if employee_id}
+    if employee_ids:
+        transaction.on_commit(lambda: refresh_medical_status_records(employee_ids))
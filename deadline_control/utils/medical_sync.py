@@ -0,0 +1,112 @@
+# deadline_control/utils/medical_sync.py
+"""
+🔄 Пакетная синхронизация записей медосмотров сотрудников
+
+Для набора сотрудников требуемые пары (сотрудник, вредный фактор) вычисляются
+по факторам их должностей (иерархия PositionMedicalFactor → MedicalExaminationNorm,
+см. deadline_control.utils.position_factors), сравниваются
+с существующими записями EmployeeMedicalExamination и применяются пакетно:
+    - недостающие записи создаются через bulk_create
+    - (по запросу) записи по факторам, которых больше нет у должности,
+      отмечаются «Не требуется» одним update
+
+Отключённые вручную записи не включаются обратно и не создаются повторно.
+
+Используется в:
+    - сигналах directory/signals.py (новый сотрудник, смена должности)
+    - сигналах deadline_control/signals.py (изменение факторов должности и эталонных норм)
+    - команде sync_medical_examinations
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+
+from deadline_control.utils.deadline_counters import invalidate_deadline_counters
+from deadline_control.utils.medical_status import schedule_medical_status_refresh
+from deadline_control.utils.position_factors import get_factors_for_positions
+
+SYNC_CHUNK_SIZE = 1000
+
+
+def sync_medical_examinations(employees, disable_obsolete=False, dry_run=False):
+    """
+    Создаёт недостающие записи медосмотров для сотрудников.
+
+    Args:
+        employees: итерируемый набор Employee (queryset или список)
+        disable_obsolete: отмечать «Не требуется» записи по факторам,
+                          которых нет у текущей должности сотрудника
+        dry_run: только рассчитать изменения, не записывая их в БД
+
+    Returns:
+        dict: {
+            'employees': число сотрудников,
+            'without_position': число сотрудников без должности,
+            'created': [(employee, harmful_factor), ...],
+            'disabled': [(employee, harmful_factor), ...],
+        }
+    """
+    from deadline_control.models import EmployeeMedicalExamination
+
+    employees = list(employees)
+    result = {
+        'employees': len(employees),
+        'without_position': sum(1 for employee in employees if not employee.position_id),
+        'created': [],
+        'disabled': [],
+    }
+
+    employees = [employee for employee in employees if employee.position_id]
+    factors_by_position = get_factors_for_positions(employee.position_id for employee in employees)
+
+    to_create = []
+    to_disable_ids = []
+
+    for start in range(0, len(employees), SYNC_CHUNK_SIZE):
+        chunk = employees[start:start + SYNC_CHUNK_SIZE]
+
+        # Существующие записи сотрудников пачки: {employee_id: {factor_id: exam}}
+        existing = defaultdict(dict)
+        exams = EmployeeMedicalExamination.objects.filter(
+            employee_id__in=[employee.id for employee in chunk]
+        )
+        if disable_obsolete:
+            exams = exams.select_related('harmful_factor')
+        for exam in exams:
+            existing[exam.employee_id][exam.harmful_factor_id] = exam
+
+        for employee in chunk:
+            required = factors_by_position.get(employee.position_id, [])
+            employee_exams = existing.get(employee.id, {})
+
+            for factor in required:
+                if factor.id not in employee_exams:
+                    to_create.append(EmployeeMedicalExamination(employee=employee, harmful_factor=factor))
+                    result['created'].append((employee, factor))
+
+            if disable_obsolete:
+                required_ids = {factor.id for factor in required}
+                for factor_id, exam in employee_exams.items():
+                    if factor_id not in required_ids and not exam.is_disabled:
+                        to_disable_ids.append(exam.id)
+                        result['disabled'].append((employee, exam.harmful_factor))
+
+    if dry_run or not (to_create or to_disable_ids):
+        return result
+
+    with transaction.atomic():
+        EmployeeMedicalExamination.objects.bulk_create(to_create, batch_size=SYNC_CHUNK_SIZE)
+        for start in range(0, len(to_disable_ids), SYNC_CHUNK_SIZE):
+            EmployeeMedicalExamination.objects.filter(
+                id__in=to_disable_ids[start:start + SYNC_CHUNK_SIZE]
+            ).update(is_disabled=True)
+
+        # bulk-операции не вызывают сигналы - обновляем статусы и счётчики сами
+        changed = [employee for employee, _ in result['created'] + result['disabled']]
+        schedule_medical_status_refresh(employee.id for employee in changed)
+        transaction.on_commit(lambda: invalidate_deadline_counters(
+            *{employee.organization_id for employee in changed}
+        ))
+
+    return result
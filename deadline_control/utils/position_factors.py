@@ -0,0 +1,192 @@
+# deadline_control/utils/position_factors.py
+"""
+🧬 Кешируемое определение вредных факторов должности
+
+Иерархия вредных факторов:
+    1. PositionMedicalFactor — переопределения для конкретной должности (без отключённых)
+    2. MedicalExaminationNorm — эталонные нормы по названию должности (если переопределений нет)
+
+Результаты хранятся в Django cache двумя видами записей:
+    - по ID должности: активные переопределения должности
+    - по названию должности: эталонные нормы
+Запись по названию общая для всех должностей с этим названием, поэтому
+переименование должности не требует сброса кеша.
+
+Поддержание актуальности:
+    - ключи содержат общую версию; сигналы (deadline_control/signals.py)
+      увеличивают её при сохранении/удалении переопределений, эталонных норм
+      и вредных факторов, импорт норм — после пакетной записи
+    - недостающие записи загружаются пакетно: не более одного запроса
+      на переопределения и одного на эталонные нормы, независимо от числа должностей
+
+Используется в:
+    - пакетном расчёте статусов и синхронизации медосмотров
+    - выдаче направлений на медосмотр
+"""
+
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+POSITION_FACTORS_PREFIX = 'position_factors'
+POSITION_FACTORS_TIMEOUT = 60 * 60 * 24
+POSITION_FACTORS_VERSION_KEY = f'{POSITION_FACTORS_PREFIX}:version'
+
+
+def _get_position_key(version, position_id):
+    return f'{POSITION_FACTORS_PREFIX}:{version}:position:{position_id}'
+
+
+def _get_name_key(version, position_name):
+    # Название может содержать пробелы и кириллицу - в ключ идёт хеш
+    digest = hashlib.md5(position_name.encode('utf-8')).hexdigest()
+    return f'{POSITION_FACTORS_PREFIX}:{version}:name:{digest}'
+
+
+def _bump_version():
+    try:
+        cache.incr(POSITION_FACTORS_VERSION_KEY)
+    except ValueError:
+        cache.set(POSITION_FACTORS_VERSION_KEY, 2, None)
+
+
+def invalidate_position_factors():
+    """
+    Сбрасывает кеш вредных факторов всех должностей (увеличивает версию).
+
+    Версия увеличивается сразу (чтобы код в той же транзакции видел изменения)
+    и повторно после фиксации транзакции: записи, закешированные другими
+    процессами до фиксации по старым данным, становятся недействительными.
+    """
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def _resolve_norms(version, position_names):
+    """Эталонные нормы по названиям должностей: {position_name: [HarmfulFactor, ...]}"""
+    from deadline_control.models import MedicalExaminationNorm
+
+    if not position_names:
+        return {}
+
+    name_keys = {name: _get_name_key(version, name) for name in position_names}
+    cached = cache.get_many(list(name_keys.values()))
+    norms = {name: cached[key] for name, key in name_keys.items() if key in cached}
+
+    missing_names = [name for name in position_names if name not in norms]
+    if missing_names:
+        loaded = defaultdict(list)
+        for norm in MedicalExaminationNorm.objects.filter(
+            position_name__in=missing_names
+        ).select_related('harmful_factor'):
+            loaded[norm.position_name].append(norm.harmful_factor)
+
+        loaded = {name: loaded.get(name, []) for name in missing_names}
+        cache.set_many(
+            {name_keys[name]: factors for name, factors in loaded.items()},
+            POSITION_FACTORS_TIMEOUT
+        )
+        norms.update(loaded)
+
+    return norms
+
+
+def resolve_position_factors(position_names):
+    """
+    Вредные факторы для набора должностей с учётом иерархии.
+
+    Args:
+        position_names: dict {position_id: position_name}
+
+    Returns:
+        dict: {position_id: [HarmfulFactor, ...]}
+    """
+    from deadline_control.models import PositionMedicalFactor
+
+    if not position_names:
+        return {}
+
+    version = cache.get(POSITION_FACTORS_VERSION_KEY, 1)
+
+    # 1. Переопределения для конкретных должностей
+    position_keys = {
+        position_id: _get_position_key(version, position_id) for position_id in position_names
+    }
+    cached = cache.get_many(list(position_keys.values()))
+    overrides = {
+        position_id: cached[key] for position_id, key in position_keys.items() if key in cached
+    }
+
+    missing_ids = [position_id for position_id in position_names if position_id not in overrides]
+    if missing_ids:
+        loaded = defaultdict(list)
+        for position_factor in PositionMedicalFactor.objects.filter(
+            position_id__in=missing_ids,
+            is_disabled=False
+        ).select_related('harmful_factor'):
+            loaded[position_factor.position_id].append(position_factor.harmful_factor)
+
+        # Пустой список тоже кешируется: «переопределений нет»
+        loaded = {position_id: loaded.get(position_id, []) for position_id in missing_ids}
+        cache.set_many(
+            {position_keys[position_id]: factors for position_id, factors in loaded.items()},
+            POSITION_FACTORS_TIMEOUT
+        )
+        overrides.update(loaded)
+
+    # 2. Для должностей без переопределений - эталонные нормы по названию
+    norms = _resolve_norms(version, {
+        name for position_id, name in position_names.items()
+        if name and not overrides[position_id]
+    })
+
+    return {
+        position_id: overrides[position_id] or norms.get(name, [])
+        for position_id, name in position_names.items()
+    }
+
+
+def get_factors_for_positions(position_ids):
+    """
+    Вредные факторы для набора должностей по их ID (названия загружаются одним запросом).
+
+    Returns:
+        dict: {position_id: [HarmfulFactor, ...]}
+    """
+    from directory.models import Position
+
+    position_ids = {position_id for position_id in position_ids if position_id}
+    if not position_ids:
+        return {}
+
+    return resolve_position_factors(dict(
+        Position.objects.filter(id__in=position_ids).values_list('id', 'position_name')
+    ))
+
+
+def get_factors_for_position(position):
+    """
+    Вредные факторы одной должности.
+
+    Returns:
+        list: [HarmfulFactor, ...] (пустой, если должность не указана)
+    """
+    if not position:
+        return []
+    return resolve_position_factors({position.id: position.position_name})[position.id]
+
+
+def get_factors_for_position_name(position_name):
+    """
+    Эталонные вредные факторы по названию должности (без переопределений),
+    например для направления кандидата до создания сотрудника.
+
+    Returns:
+        list: [HarmfulFactor, ...]
+    """
+    if not position_name:
+        return []
+    version = cache.get(POSITION_FACTORS_VERSION_KEY, 1)
+    return _resolve_norms(version, {position_name})[position_name]
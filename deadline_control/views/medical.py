@@ -2,6 +2,7 @@
 import json
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView
+from django.db.models import Count
 from django.utils import timezone
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -12,6 +13,7 @@ from django.contrib.auth.decorators import login_required
 from datetime import timedelta
 
 from deadline_control.models.medical_norm import EmployeeMedicalExamination
+from deadline_control.models import EmployeeMedicalStatus
 from directory.models import Employee
 from directory.utils.permissions import AccessControlHelper
 
@@ -26,83 +28,63 @@ class MedicalExaminationListView(LoginRequiredMixin, ListView):
     model = EmployeeMedicalExamination
     template_name = 'deadline_control/medical/list.html'
     context_object_name = 'employees_with_medical'
+    paginate_by = 50
 
     def get_queryset(self):
         """
-        Получаем сотрудников, должность которых требует прохождения медосмотров.
+        Получаем статусы медосмотров сотрудников, должность которых требует медосмотров.
 
-        Учитывает два источника вредных факторов:
-        1. PositionMedicalFactor (переопределения для конкретной должности)
-        2. MedicalExaminationNorm (эталонные нормы по названию профессии)
+        Статусы берутся из денормализованной таблицы EmployeeMedicalStatus
+        (запись есть только у сотрудников, которым медосмотры требуются),
+        актуальный статус на сегодня вычисляется в SQL.
         """
-        from directory.models import Employee
-        from deadline_control.models import MedicalExaminationNorm
-        from django.db.models import Q
-
-        # Находим все уникальные названия профессий из эталонных норм
-        position_names_with_norms = MedicalExaminationNorm.objects.values_list(
-            'position_name', flat=True
-        ).distinct()
-
-        # Находим сотрудников, чья должность требует медосмотров:
-        # - Либо у должности есть PositionMedicalFactor
-        # - Либо название должности есть в MedicalExaminationNorm
-        qs = Employee.objects.exclude(
-            status__in=['candidate', 'fired']
-        ).filter(
-            Q(position__medical_factors__isnull=False) |  # Есть переопределения
-            Q(position__position_name__in=position_names_with_norms)  # Есть в эталонах
-        ).distinct()
-
         # КРИТИЧНО: Фильтрация по правам доступа через AccessControlHelper
         # Учитывает organizations, subdivisions и departments из профиля пользователя
-        qs = AccessControlHelper.filter_queryset(qs, self.request.user, self.request)
-
-        # Prefetch для оптимизации запросов
-        qs = qs.select_related(
-            'organization',
-            'position'
-        ).prefetch_related(
-            'medical_examinations__harmful_factor',
-            'position__medical_factors__harmful_factor'  # Префетч для get_medical_status
+        accessible_employees = AccessControlHelper.filter_queryset(
+            Employee.objects.all(), self.request.user, self.request
         )
 
-        return qs
+        return EmployeeMedicalStatus.objects.active_employees().with_actual_status().filter(
+            employee__in=accessible_employees
+        ).select_related(
+            'employee',
+            'employee__organization',
+            'employee__position'
+        ).order_by('next_date', 'employee__full_name_nominative')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Разделяем сотрудников на категории на основе get_medical_status()
-        no_date = []
-        overdue = []
-        upcoming = []
-        normal = []
+        # Разделяем сотрудников на категории на основе статуса медосмотров
+        categories = {
+            'no_date': [],
+            'expired': [],
+            'upcoming': [],
+            'normal': [],
+        }
 
-        for employee in context['employees_with_medical']:
-            medical_status = employee.get_medical_status()
-
-            if not medical_status:
-                # Нет медосмотров - пропускаем
-                continue
+        today = timezone.now().date()
+        for record in context['employees_with_medical']:
+            employee = record.employee
 
             # Добавляем статус к объекту сотрудника для использования в шаблоне
-            employee.medical_status_info = medical_status
-
-            # Распределяем по категориям
-            status = medical_status['status']
-            if status == 'no_date':
-                no_date.append(employee)
-            elif status == 'expired':
-                overdue.append(employee)
-            elif status == 'upcoming':
-                upcoming.append(employee)
-            else:
-                normal.append(employee)
-
-        context['no_date'] = no_date
-        context['overdue'] = overdue
-        context['upcoming'] = upcoming
-        context['normal'] = normal
+            employee.medical_status_info = record.as_status_dict(today)
+            categories[record.actual_status].append(employee)
+
+        context['no_date'] = categories['no_date']
+        context['overdue'] = categories['expired']
+        context['upcoming'] = categories['upcoming']
+        context['normal'] = categories['normal']
+
+        # Итоги по статусам считаются по всему списку, а не по текущей странице
+        context['status_counts'] = dict(
+            self.object_list.order_by().values_list('actual_status').annotate(total=Count('pk'))
+        )
+
+        # Организации для пакетной выдачи направлений
+        context['referral_organizations'] = AccessControlHelper.get_accessible_organizations(
+            self.request.user, self.request
+        ).order_by('short_name_ru')
 
         return context
 
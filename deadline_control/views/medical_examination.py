@@ -410,7 +410,8 @@ class MedicalNormImportView(LoginRequiredMixin, PermissionRequiredMixin, FormVie
 
 class MedicalNormExportView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
     """
-    Экспорт норм медицинских осмотров в файл
+    Экспорт норм медицинских осмотров в файл.
+    CSV и JSON отдаются потоково, Excel - из временного файла.
     """
     form_class = MedicalNormExportForm
     template_name = 'directory/medical_exams/medical_norms/export.html'
@@ -4,7 +4,7 @@ Views для системы выдачи направлений на медиц
 import json
 import os
 from datetime import datetime
-from django.http import JsonResponse, FileResponse
+from django.http import JsonResponse, FileResponse, HttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -18,19 +18,23 @@ from django.contrib import messages
 
 from directory.models import Employee
 from directory.utils.permissions import AccessControlHelper
+from directory.utils.zip_stream import streaming_zip_response
 from deadline_control.models import (
     MedicalReferral,
-    PositionMedicalFactor,
-    MedicalExaminationNorm,
     HarmfulFactor,
-    MedicalSettings
 )
-
-try:
-    from docxtpl import DocxTemplate
-    DOCXTPL_AVAILABLE = True
-except ImportError:
-    DOCXTPL_AVAILABLE = False
+from deadline_control.utils.position_factors import get_factors_for_position, get_factors_for_position_name
+from deadline_control.utils.medical_referrals import (
+    DOCXTPL_AVAILABLE,
+    build_referral_context,
+    create_batch_referrals,
+    get_referral_filename,
+    get_referral_template_path,
+    iter_referral_archive_files,
+    merge_referral_documents,
+    render_referral,
+    select_due_employees,
+)
 
 
 def get_harmful_factors_for_employee(employee):
@@ -40,25 +44,10 @@ def get_harmful_factors_for_employee(employee):
     Приоритет:
     1. Переопределённые факторы для должности в организации (PositionMedicalFactor)
     2. Эталонные факторы по названию должности (MedicalExaminationNorm)
-    """
-    position = employee.position
-
-    # 1. Проверяем переопределения для конкретной должности
-    overridden_factors = PositionMedicalFactor.objects.filter(
-        position=position,
-        is_disabled=False  # Только активные факторы
-    ).select_related('harmful_factor')
-
-    if overridden_factors.exists():
-        # Используем переопределённые факторы
-        return [pf.harmful_factor for pf in overridden_factors]
 
-    # 2. Если переопределений нет - берём эталонные нормы по названию должности
-    reference_norms = MedicalExaminationNorm.objects.filter(
-        position_name=position.position_name
-    ).select_related('harmful_factor')
-
-    return [norm.harmful_factor for norm in reference_norms]
+    Результат кешируется (см. deadline_control/utils/position_factors.py).
+    """
+    return get_factors_for_position(employee.position)
 
 
 def generate_referral_document(referral):
@@ -69,91 +58,18 @@ def generate_referral_document(referral):
     if not DOCXTPL_AVAILABLE:
         return None
 
-    # Получаем путь к шаблону из настроек организации или используем эталонный
-    medical_settings = MedicalSettings.get_settings(employee.organization)
-
-    if medical_settings and medical_settings.referral_template:
-        # Используем шаблон из настроек
-        template_path = medical_settings.referral_template.path
-    else:
-        # Используем эталонный шаблон (исправленная версия)
-        template_path = os.path.join(
-            settings.MEDIA_ROOT,
-            'document_templates',
-            'etalon',
-            'napravlenie_blank_fixed.docx'
-        )
-        # Если исправленный шаблон не найден, пробуем оригинальный
-        if not os.path.exists(template_path):
-            template_path = os.path.join(
-                settings.MEDIA_ROOT,
-                'document_templates',
-                'etalon',
-                'napravlenie_blank.docx'
-            )
-
-    if not os.path.exists(template_path):
-        raise FileNotFoundError(f"Шаблон направления не найден: {template_path}")
-
-    # Загружаем шаблон
-    doc = DocxTemplate(template_path)
-
-    # Подготавливаем данные для заполнения
-    employee = referral.employee
-    organization = employee.organization
-
-    # Разбиваем ФИО на части
-    name_parts = employee.full_name_nominative.split()
-    last_name = name_parts[0] if len(name_parts) > 0 else ''
-    first_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else ''
-
-    # Формируем список вредных факторов (только полное наименование)
-    factors_list = []
-    for factor in referral.harmful_factors.all():
-        factors_list.append(factor.full_name)
-    harmful_factors_text = '\n'.join(factors_list) if factors_list else 'Не определены'
-
-    # Контекст для шаблона
-    context = {
-        'organization_name': organization.full_name_ru,
-        'organization_name_by': getattr(organization, 'full_name_by', organization.full_name_ru),
-        'requisites_ru': getattr(organization, 'requisites_ru', ''),
-        'requisites_by': getattr(organization, 'requisites_by', ''),
-        'last_name': last_name,
-        'first_name': first_name,
-        'full_name': employee.full_name_nominative,
-        'date_of_birth': referral.employee_birth_date.strftime('%d.%m.%Y'),
-        'address': referral.employee_address,
-        'position_name': employee.position.position_name,
-        'harmful_factors': harmful_factors_text,
-        'issue_date': referral.issue_date.strftime('%d.%m.%Y'),
-    }
+    # Шаблон из настроек организации или эталонный
+    template_path = get_referral_template_path(referral.employee.organization)
 
     # Заполняем шаблон
-    doc.render(context)
-
-    # Создаём директорию для сохранения
-    save_dir = os.path.join(
-        settings.MEDIA_ROOT,
-        'medical_referrals',
-        str(timezone.now().year),
-        str(timezone.now().month).zfill(2)
-    )
-    os.makedirs(save_dir, exist_ok=True)
-
-    # Имя файла
-    filename = f"referral_{referral.id}_{employee.full_name_nominative.replace(' ', '_')}.docx"
-    filepath = os.path.join(save_dir, filename)
-
-    # Сохраняем документ
-    doc.save(filepath)
-
-    # Сохраняем путь в модели (относительный путь от MEDIA_ROOT)
-    relative_path = os.path.relpath(filepath, settings.MEDIA_ROOT)
-    referral.document.name = relative_path
+    context = build_referral_context(referral, referral.harmful_factors.all())
+    content = render_referral(template_path, context)
+
+    # Сохраняем документ (medical_referrals/<год>/<месяц>/)
+    referral.document.save(get_referral_filename(referral), ContentFile(content), save=False)
     referral.save()
 
-    return filepath
+    return referral.document.path
 
 
 class EmployeeReferralDataView(LoginRequiredMixin, View):
@@ -411,13 +327,7 @@ class NewEmployeeReferralView(LoginRequiredMixin, View):
                 raise PermissionDenied("У вас нет доступа к этой организации")
 
             # Получаем вредные факторы по названию профессии
-            harmful_factors = []
-            reference_norms = MedicalExaminationNorm.objects.filter(
-                position_name=position_name
-            ).select_related('harmful_factor')
-
-            for norm in reference_norms:
-                harmful_factors.append(norm.harmful_factor)
+            harmful_factors = get_factors_for_position_name(position_name)
 
             if not harmful_factors:
                 errors.append(f'Для профессии "{position_name}" не найдены вредные факторы')
@@ -450,26 +360,9 @@ class NewEmployeeReferralView(LoginRequiredMixin, View):
                 return render(request, 'deadline_control/new_employee_referral.html', context)
 
             # Получаем шаблон для организации
-            medical_settings = MedicalSettings.get_settings(organization)
-
-            if medical_settings and medical_settings.referral_template:
-                template_path = medical_settings.referral_template.path
-            else:
-                template_path = os.path.join(
-                    settings.MEDIA_ROOT,
-                    'document_templates',
-                    'etalon',
-                    'napravlenie_blank_fixed.docx'
-                )
-                if not os.path.exists(template_path):
-                    template_path = os.path.join(
-                        settings.MEDIA_ROOT,
-                        'document_templates',
-                        'etalon',
-                        'napravlenie_blank.docx'
-                    )
-
-            if not os.path.exists(template_path):
+            try:
+                template_path = get_referral_template_path(organization)
+            except FileNotFoundError:
                 errors.append(f'Шаблон направления не найден')
                 context = {
                     'organizations': organizations,
@@ -478,9 +371,6 @@ class NewEmployeeReferralView(LoginRequiredMixin, View):
                 }
                 return render(request, 'deadline_control/new_employee_referral.html', context)
 
-            # Загружаем шаблон
-            doc = DocxTemplate(template_path)
-
             # Разбиваем ФИО на части
             name_parts = full_name.split()
             last_name = name_parts[0] if len(name_parts) > 0 else ''
@@ -507,7 +397,7 @@ class NewEmployeeReferralView(LoginRequiredMixin, View):
             }
 
             # Заполняем шаблон
-            doc.render(context_doc)
+            content = render_referral(template_path, context_doc)
 
             # Создаём директорию для сохранения
             save_dir = os.path.join(
@@ -525,7 +415,8 @@ class NewEmployeeReferralView(LoginRequiredMixin, View):
             filepath = os.path.join(save_dir, filename)
 
             # Сохраняем документ
-            doc.save(filepath)
+            with open(filepath, 'wb') as output:
+                output.write(content)
 
             # Возвращаем файл на скачивание
             from urllib.parse import quote
@@ -561,3 +452,63 @@ class NewEmployeeReferralView(LoginRequiredMixin, View):
             }
         }
         return render(request, 'deadline_control/new_employee_referral.html', context)
+
+
+class BatchReferralView(LoginRequiredMixin, View):
+    """
+    Пакетная выдача направлений на медосмотр по организации.
+    POST /deadline-control/medical/referral/batch/
+
+    Параметры формы:
+        organization_id - организация
+        days - срок медосмотра наступает в ближайшие N дней (по умолчанию 30)
+        output - 'docx' (один объединённый документ) или 'zip' (папки по подразделениям)
+    """
+
+    def post(self, request):
+        from directory.models import Organization
+
+        organization = get_object_or_404(Organization, pk=request.POST.get('organization_id'))
+        if not AccessControlHelper.can_access_object(request.user, organization):
+            raise PermissionDenied("У вас нет доступа к этой организации")
+
+        try:
+            days = max(0, int(request.POST.get('days', 30)))
+        except (TypeError, ValueError):
+            messages.error(request, 'Некорректное количество дней')
+            return redirect('deadline_control:medical:list')
+        output = request.POST.get('output', 'docx')
+
+        if not DOCXTPL_AVAILABLE:
+            messages.error(request, 'Библиотека docxtpl не установлена')
+            return redirect('deadline_control:medical:list')
+
+        # Сотрудники выбираются с учётом прав доступа (подразделения, отделы)
+        employees = AccessControlHelper.filter_queryset(
+            Employee.objects.filter(organization=organization), request.user, request
+        )
+        try:
+            result = create_batch_referrals(select_due_employees(employees, days), issued_by=request.user)
+        except FileNotFoundError:
+            messages.error(request, 'Шаблон направления не найден')
+            return redirect('deadline_control:medical:list')
+
+        if result['skipped']:
+            messages.warning(request, 'Направления не выданы: ' + '; '.join(
+                f'{employee.full_name_nominative} ({reason})' for employee, reason in result['skipped']
+            ))
+        if not result['items']:
+            messages.info(request, f'Нет сотрудников, которым требуется медосмотр в ближайшие {days} дн.')
+            return redirect('deadline_control:medical:list')
+
+        filename = f"Направления_на_МО_{organization.short_name_ru}_{timezone.now().strftime('%Y%m%d')}"
+        if output == 'zip':
+            return streaming_zip_response(iter_referral_archive_files(result['items']), f'{filename}.zip')
+
+        from urllib.parse import quote
+        response = HttpResponse(
+            merge_referral_documents(content for _, content in result['items']),
+            content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        )
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}.docx"
+        return response
@@ -4,18 +4,16 @@
 
 Содержит общие функции для работы с шаблонами и контекстом.
 """
-import os
-import io
 import logging
 from typing import Dict, Any, Optional, Callable
 import datetime
 import traceback
-from docxtpl import DocxTemplate
 from django.conf import settings
 from django.core.files.base import ContentFile
 
 from directory.models.document_template import DocumentTemplate, GeneratedDocument
-from directory.utils.declension import decline_full_name, decline_phrase, get_initials_from_name, format_days
+from directory.document_generators.render_pool import RenderJob, render_docx, is_rendering_deferred
+from directory.utils.declension import decline_many, get_initials_from_name, format_days
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -114,6 +112,79 @@ def get_document_template(document_type, employee=None) -> Optional[DocumentTemp
     return None
 
 
+def get_employee_position_name(employee) -> str:
+    """
+    Возвращает наименование должности для документов.
+    Для договора подряда используется наименование работы (contract_work_name), если оно задано.
+    """
+    if not employee.position:
+        return ""
+    contract_type = getattr(employee, 'contract_type', 'standard')
+    if contract_type == 'contractor' and getattr(employee.position, 'contract_work_name', None):
+        logger.info(f"Используется наименование работы по договору подряда: {employee.position.contract_work_name}")
+        return employee.position.contract_work_name
+    logger.info(f"Используется должность: {employee.position.position_name}")
+    return employee.position.position_name
+
+
+# Падежи, в которых каждое поле сотрудника подставляется в шаблоны
+EMPLOYEE_DECLENSION_CASES = {
+    'fio': ('gent', 'datv', 'accs', 'ablt', 'loct'),
+    'position': ('gent', 'datv', 'accs', 'ablt', 'loct'),
+    'department': ('gent', 'datv'),
+    'subdivision': ('gent', 'datv'),
+    'organization_name': ('gent', 'datv', 'accs', 'ablt', 'loct'),
+    'organization_full_name': ('gent', 'datv', 'accs', 'ablt', 'loct'),
+}
+
+
+def get_employee_declension_values(employee) -> Dict[str, str]:
+    """Исходные (именительный падеж) значения полей сотрудника, которые склоняются в документах"""
+    organization = employee.organization
+    return {
+        'fio': employee.full_name_nominative,
+        'position': get_employee_position_name(employee),
+        'department': employee.department.name if employee.department else "",
+        'subdivision': employee.subdivision.name if employee.subdivision else "",
+        'organization_name': organization.short_name_ru if organization else "",
+        'organization_full_name': organization.full_name_ru if organization else "",
+    }
+
+
+def _employee_declension_requests(values):
+    return [
+        (values[field], case_code, field == 'fio')
+        for field, cases in EMPLOYEE_DECLENSION_CASES.items()
+        for case_code in cases
+    ]
+
+
+def decline_employee_phrases(values: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+    """
+    Склоняет все поля сотрудника одним вызовом decline_many.
+
+    Returns:
+        dict: {'fio': {'gent': ..., ...}, 'position': {...}, ...}
+    """
+    forms = iter(decline_many(_employee_declension_requests(values)))
+    return {
+        field: {case_code: next(forms) for case_code in cases}
+        for field, cases in EMPLOYEE_DECLENSION_CASES.items()
+    }
+
+
+def warm_employee_declensions(employees) -> None:
+    """
+    Прогревает кеш склонений сразу для группы сотрудников (одним вызовом decline_many),
+    чтобы последующие prepare_employee_context для каждого сотрудника брали формы из кеша.
+    Используется в массовой генерации документов.
+    """
+    items = []
+    for employee in employees:
+        items.extend(_employee_declension_requests(get_employee_declension_values(employee)))
+    decline_many(items)
+
+
 def prepare_employee_context(employee) -> Dict[str, Any]:
     """
     Подготавливает контекст с данными сотрудника для шаблона документа.
@@ -133,15 +204,15 @@ def prepare_employee_context(employee) -> Dict[str, Any]:
     # Для обратной совместимости оставляем флаг
     is_contractor = (contract_type == 'contractor')
 
-    # Определяем, какое значение использовать для должности/работы
-    position_name = ""
-    if employee.position:
-        if contract_type == 'contractor' and hasattr(employee.position, 'contract_work_name') and employee.position.contract_work_name:
-            position_name = employee.position.contract_work_name
-            logger.info(f"Используется наименование работы по договору подряда: {position_name}")
-        else:
-            position_name = employee.position.position_name
-            logger.info(f"Используется должность: {position_name}")
+    values = get_employee_declension_values(employee)
+    position_name = values['position']
+    department_name = values['department']
+    subdivision_name = values['subdivision']
+    org_short_name = values['organization_name']
+    org_full_name = values['organization_full_name']
+
+    # Все падежные формы получаем одним пакетным вызовом
+    declined = decline_employee_phrases(values)
 
     # Основной контекст данных сотрудника
     context = {
@@ -151,46 +222,46 @@ def prepare_employee_context(employee) -> Dict[str, Any]:
 
         # ФИО в разных падежах
         'fio_nominative': employee.full_name_nominative,
-        'fio_genitive': decline_full_name(employee.full_name_nominative, 'gent'),
-        'fio_dative': decline_full_name(employee.full_name_nominative, 'datv'),
-        'fio_accusative': decline_full_name(employee.full_name_nominative, 'accs'),
-        'fio_instrumental': decline_full_name(employee.full_name_nominative, 'ablt'),
-        'fio_prepositional': decline_full_name(employee.full_name_nominative, 'loct'),
+        'fio_genitive': declined['fio']['gent'],
+        'fio_dative': declined['fio']['datv'],
+        'fio_accusative': declined['fio']['accs'],
+        'fio_instrumental': declined['fio']['ablt'],
+        'fio_prepositional': declined['fio']['loct'],
 
         # Сокращенное ФИО
         'fio_initials': get_initials_from_name(employee.full_name_nominative),
 
         # Должность/работа в разных падежах
         'position_nominative': position_name,
-        'position_genitive': decline_phrase(position_name, 'gent'),
-        'position_dative': decline_phrase(position_name, 'datv'),
-        'position_accusative': decline_phrase(position_name, 'accs'),
-        'position_instrumental': decline_phrase(position_name, 'ablt'),
-        'position_prepositional': decline_phrase(position_name, 'loct'),
+        'position_genitive': declined['position']['gent'],
+        'position_dative': declined['position']['datv'],
+        'position_accusative': declined['position']['accs'],
+        'position_instrumental': declined['position']['ablt'],
+        'position_prepositional': declined['position']['loct'],
 
         # Подразделение и отдел
-        'department': employee.department.name if employee.department else "",
-        'department_genitive': decline_phrase(employee.department.name, 'gent') if employee.department else "",
-        'department_dative': decline_phrase(employee.department.name, 'datv') if employee.department else "",
+        'department': department_name,
+        'department_genitive': declined['department']['gent'],
+        'department_dative': declined['department']['datv'],
 
-        'subdivision': employee.subdivision.name if employee.subdivision else "",
-        'subdivision_genitive': decline_phrase(employee.subdivision.name, 'gent') if employee.subdivision else "",
-        'subdivision_dative': decline_phrase(employee.subdivision.name, 'datv') if employee.subdivision else "",
+        'subdivision': subdivision_name,
+        'subdivision_genitive': declined['subdivision']['gent'],
+        'subdivision_dative': declined['subdivision']['datv'],
 
         # Организация
-        'organization_name': employee.organization.short_name_ru if employee.organization else "",
-        'organization_name_genitive': decline_phrase(employee.organization.short_name_ru, 'gent') if employee.organization else "",
-        'organization_name_dative': decline_phrase(employee.organization.short_name_ru, 'datv') if employee.organization else "",
-        'organization_name_accusative': decline_phrase(employee.organization.short_name_ru, 'accs') if employee.organization else "",
-        'organization_name_instrumental': decline_phrase(employee.organization.short_name_ru, 'ablt') if employee.organization else "",
-        'organization_name_prepositional': decline_phrase(employee.organization.short_name_ru, 'loct') if employee.organization else "",
-
-        'organization_full_name': employee.organization.full_name_ru if employee.organization else "",
-        'organization_full_name_genitive': decline_phrase(employee.organization.full_name_ru, 'gent') if employee.organization else "",
-        'organization_full_name_dative': decline_phrase(employee.organization.full_name_ru, 'datv') if employee.organization else "",
-        'organization_full_name_accusative': decline_phrase(employee.organization.full_name_ru, 'accs') if employee.organization else "",
-        'organization_full_name_instrumental': decline_phrase(employee.organization.full_name_ru, 'ablt') if employee.organization else "",
-        'organization_full_name_prepositional': decline_phrase(employee.organization.full_name_ru, 'loct') if employee.organization else "",
+        'organization_name': org_short_name,
+        'organization_name_genitive': declined['organization_name']['gent'],
+        'organization_name_dative': declined['organization_name']['datv'],
+        'organization_name_accusative': declined['organization_name']['accs'],
+        'organization_name_instrumental': declined['organization_name']['ablt'],
+        'organization_name_prepositional': declined['organization_name']['loct'],
+
+        'organization_full_name': org_full_name,
+        'organization_full_name_genitive': declined['organization_full_name']['gent'],
+        'organization_full_name_dative': declined['organization_full_name']['datv'],
+        'organization_full_name_accusative': declined['organization_full_name']['accs'],
+        'organization_full_name_instrumental': declined['organization_full_name']['ablt'],
+        'organization_full_name_prepositional': declined['organization_full_name']['loct'],
 
         # Даты и номера документов
     }
@@ -313,6 +384,41 @@ def prepare_employee_context(employee) -> Dict[str, Any]:
 
     return context
 
+def build_render_job(template: DocumentTemplate, context: Dict[str, Any], employee,
+                     post_processor: Optional[Callable] = None) -> RenderJob:
+    """
+    Готовит задание на рендеринг документа (без обращения к БД при рендеринге).
+
+    Args:
+        template (DocumentTemplate): Объект шаблона документа
+        context (Dict[str, Any]): Словарь с данными для заполнения шаблона
+        employee: Объект модели Employee
+        post_processor: Функция пост-обработки документа (например, для обработки таблиц)
+    Returns:
+        RenderJob: Задание для render_docx / render_jobs
+    """
+    template_path = template.template_file.path
+    logger.info(f"Используется шаблон: {template.name} (ID: {template.id}), путь: {template_path}")
+
+    # Удаляем объект employee из контекста перед рендерингом
+    context_to_render = context.copy()
+    context_to_render.pop('employee', None)
+
+    # Формируем человекочитаемое имя файла
+    doc_type_name = DOCUMENT_TYPE_NAMES.get(template.document_type, template.document_type)
+    employee_initials = get_initials_from_name(employee.full_name_nominative)
+    filename = f"{doc_type_name}_{employee_initials}.docx"
+    logger.info(f"Имя файла: {filename}")
+
+    return RenderJob(
+        template_path=template_path,
+        template_name=template.name,
+        context=context_to_render,
+        filename=filename,
+        post_processor=post_processor,
+    )
+
+
 def generate_docx_from_template(template: DocumentTemplate, context: Dict[str, Any],
                                 employee, user=None, post_processor: Optional[Callable] = None) -> Optional[
     Dict[str, Any]]:
@@ -320,6 +426,9 @@ def generate_docx_from_template(template: DocumentTemplate, context: Dict[str, A
     Генерирует документ DOCX на основе шаблона и контекста данных.
     Не сохраняет в базу данных, возвращает содержимое файла.
 
+    Внутри render_pool.deferred_rendering() документ не рендерится, а возвращается
+    задание {'filename', 'render_job'} для пакетного (параллельного) рендеринга.
+
     Args:
         template (DocumentTemplate): Объект шаблона документа
         context (Dict[str, Any]): Словарь с данными для заполнения шаблона
@@ -330,69 +439,17 @@ def generate_docx_from_template(template: DocumentTemplate, context: Dict[str, A
         Optional[Dict]: Словарь с 'content' (байты файла) и 'filename' или None при ошибке
     """
     try:
-        template_path = template.template_file.path
-        logger.info(f"Используется шаблон: {template.name} (ID: {template.id}), путь: {template_path}")
-
-        if not os.path.exists(template_path):
-            logger.error(f"Файл шаблона не найден: {template_path}")
-            raise FileNotFoundError(f"Файл шаблона не найден: {template_path}")
-
-        file_size = os.path.getsize(template_path)
-        if file_size == 0:
-            logger.error(f"Файл шаблона пуст: {template_path}")
-            raise ValueError(f"Файл шаблона имеет нулевой размер: {template_path}")
-
-        logger.info(f"Файл шаблона готов к обработке: {template_path}, размер: {file_size} байт")
-
-        try:
-            doc = DocxTemplate(template_path)
-            logger.info("Шаблон успешно загружен в DocxTemplate")
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке шаблона в DocxTemplate: {str(e)}")
-            raise ValueError(f"Ошибка при загрузке шаблона в DocxTemplate: {str(e)}")
-
-        try:
-            # Удаляем объект employee из контекста перед рендерингом
-            context_to_render = context.copy()
-            context_to_render.pop('employee', None)
-            doc.render(context_to_render)
-            logger.info("Шаблон успешно заполнен данными")
-
-            # Применяем пост-обработчик, если он указан
-            if post_processor and callable(post_processor):
-                try:
-                    logger.info("Применение пост-обработчика к документу")
-                    doc = post_processor(doc, context_to_render)
-                    logger.info("Пост-обработчик успешно применен")
-                except Exception as e:
-                    logger.error(f"Ошибка при применении пост-обработчика: {str(e)}")
-                    logger.error(traceback.format_exc())
-
-        except Exception as e:
-            logger.error(f"Ошибка при заполнении шаблона данными: {str(e)}")
-            logger.error(f"Контекст при ошибке: {context_to_render.keys()}")
-            raise ValueError(f"Ошибка при заполнении шаблона данными: {str(e)}")
-
-        # Формируем человекочитаемое имя файла
-        doc_type_name = DOCUMENT_TYPE_NAMES.get(template.document_type, template.document_type)
-        employee_initials = get_initials_from_name(employee.full_name_nominative)
-        filename = f"{doc_type_name}_{employee_initials}.docx"
-        logger.info(f"Имя файла: {filename}")
-
-        docx_buffer = io.BytesIO()
-        doc.save(docx_buffer)
-        docx_buffer.seek(0)
-
-        file_content = docx_buffer.getvalue()
-        if len(file_content) == 0:
-            logger.error(f"Создан пустой DOCX файл для {filename}")
-            raise ValueError("Создан пустой DOCX файл")
-
-        logger.info(f"Создан DOCX файл {filename}, размер: {len(file_content)} байт")
+        job = build_render_job(template, context, employee, post_processor)
+
+        if is_rendering_deferred():
+            return {
+                'filename': job.filename,
+                'render_job': job,
+            }
 
         return {
-            'content': file_content,
-            'filename': filename,
+            'content': render_docx(job),
+            'filename': job.filename,
         }
 
     except Exception as e:
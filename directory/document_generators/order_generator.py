@@ -10,7 +10,7 @@ from typing import Dict, Any, Optional
 from directory.document_generators.base import (
     get_document_template, prepare_employee_context, generate_docx_from_template
 )
-from directory.utils.declension import decline_phrase, decline_full_name, get_initials_from_name
+from directory.utils.declension import decline_many, get_initials_from_name
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -39,42 +39,46 @@ def prepare_internship_context(employee, context):
     logger.info(f"Получена информация о руководителе стажировки: success={success}, level={level}, position={leader_position}, name={leader_name}")
     logger.debug(f"Объект руководителя стажировки: {internship_leader}") # Лог объекта
 
-    # Получение и склонение отдела и подразделения руководителя
-    head_dept_genitive = ""
-    head_subdiv_genitive = ""
+    # Отдел и подразделение руководителя
+    dept_name = ""
+    subdiv_name = ""
     if internship_leader and success: # Проверяем, что объект руководителя найден
         logger.info(f"Руководитель стажировки найден: {internship_leader.full_name_nominative if internship_leader else 'Нет данных'}")
         if hasattr(internship_leader, 'department') and internship_leader.department:
             dept_name = internship_leader.department.name
             logger.info(f"Найден отдел руководителя: '{dept_name}'")
-            try:
-                head_dept_genitive = decline_phrase(dept_name, 'gent')
-                logger.info(f"Результат склонения отдела ('{dept_name}' -> 'gent'): '{head_dept_genitive}'")
-            except Exception as e:
-                logger.warning(f"Не удалось просклонять отдел руководителя стажировки: {dept_name}, ошибка: {e}")
-                head_dept_genitive = dept_name # Запасной вариант - исходное название
         else:
              logger.warning(f"У руководителя стажировки {internship_leader} не указан отдел или отсутствует атрибут 'department'.")
 
         if hasattr(internship_leader, 'subdivision') and internship_leader.subdivision:
             subdiv_name = internship_leader.subdivision.name
             logger.info(f"Найдено подразделение руководителя: '{subdiv_name}'")
-            try:
-                head_subdiv_genitive = decline_phrase(subdiv_name, 'gent')
-                logger.info(f"Результат склонения подразделения ('{subdiv_name}' -> 'gent'): '{head_subdiv_genitive}'")
-            except Exception as e:
-                logger.warning(f"Не удалось просклонять подразделение руководителя стажировки: {subdiv_name}, ошибка: {e}")
-                head_subdiv_genitive = subdiv_name # Запасной вариант - исходное название
         else:
             logger.warning(f"У руководителя стажировки {internship_leader} не указано подразделение или отсутствует атрибут 'subdivision'.")
     else:
         logger.warning("Не удалось получить объект руководителя стажировки или success=False для определения отдела/подразделения.")
 
+    # Все склоняемые фразы - одним пакетным вызовом
+    # (пустые строки и несклоняемые значения возвращаются без изменений)
+    declension_requests = [
+        (dept_name, 'gent', False),
+        (subdiv_name, 'gent', False),
+        (leader_position if position_success else '', 'gent', False),
+        (leader_position if position_success else '', 'accs', False),
+        (leader_name if name_success else '', 'accs', True),
+    ]
+    try:
+        forms = decline_many(declension_requests)
+    except Exception as e:
+        logger.warning(f"Не удалось просклонять данные руководителя стажировки, ошибка: {e}")
+        forms = [text for text, _, _ in declension_requests] # Запасной вариант - исходные значения
+    head_dept_genitive, head_subdiv_genitive, position_genitive, position_accusative, name_accusative = forms
+    logger.info(f"Результат склонения отдела и подразделения: '{head_dept_genitive}', '{head_subdiv_genitive}'")
 
     # Формируем полную строку должности руководителя без лишних пробелов
     head_position_parts = []
     if position_success and leader_position:
-        head_position_parts.append(decline_phrase(leader_position, 'accs'))
+        head_position_parts.append(position_accusative)
     if head_subdiv_genitive:
         head_position_parts.append(head_subdiv_genitive)
     if head_dept_genitive:
@@ -85,9 +89,9 @@ def prepare_internship_context(employee, context):
         'head_of_internship_position': leader_position,
         'head_of_internship_name': leader_name,
         'head_of_internship_name_initials': leader_initials,
-        'head_of_internship_position_genitive': decline_phrase(leader_position, 'gent') if position_success else leader_position,
-        'head_of_internship_name_accusative': decline_full_name(leader_name, 'accs') if name_success else leader_name,
-        'head_of_internship_position_accusative': decline_phrase(leader_position, 'accs') if position_success else leader_position,
+        'head_of_internship_position_genitive': position_genitive if position_success else leader_position,
+        'head_of_internship_name_accusative': name_accusative if name_success else leader_name,
+        'head_of_internship_position_accusative': position_accusative if position_success else leader_position,
         'internship_leader_level': level,
         'head_of_internship_department_genitive': head_dept_genitive,
         'head_of_internship_subdivision_genitive': head_subdiv_genitive,
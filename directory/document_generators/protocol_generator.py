@@ -5,14 +5,15 @@ from io import BytesIO
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 
-from docxtpl import DocxTemplate
 from django.conf import settings
 
 from directory.document_generators.base import (
     get_document_template,
     prepare_employee_context,
+    get_employee_position_name,
     generate_docx_from_template,
 )
+from directory.document_generators.template_cache import load_docx_template, jinja_env as template_jinja_env
 
 # Сервисные функции для работы с комиссией (экспортируемые из directory/utils/__init__.py)
 from directory.utils import find_appropriate_commission, get_commission_members_formatted
@@ -282,19 +283,20 @@ def generate_periodic_protocol(
         if custom_context:
             context.update(custom_context)
 
+        # Для строк таблицы нужен только именительный падеж - полный контекст
+        # (со склонением всех полей) для каждого сотрудника не строим
         employees_data = []
-        for idx, emp in enumerate(employees, start=1):
-            emp_ctx = prepare_employee_context(emp)
+        for emp in employees:
             employees_data.append({
-                'fio_nominative': emp_ctx.get('fio_nominative', ''),
-                'position_nominative': emp_ctx.get('position_nominative', ''),
+                'fio_nominative': emp.full_name_nominative or '',
+                'position_nominative': get_employee_position_name(emp),
                 'ticket_number': '',  # Номер билета оставляем пустым для ручного заполнения
             })
 
-        doc = DocxTemplate(template_path)
+        doc = load_docx_template(template_path)
         render_context = context.copy()
         render_context.pop('employee', None)
-        doc.render(render_context)
+        doc.render(render_context, jinja_env=template_jinja_env)
 
         table = _find_periodic_table(doc.docx)
         if table:
@@ -0,0 +1,280 @@
+# directory/document_generators/render_pool.py
+"""
+⚙️ Параллельный рендеринг документов DOCX в пуле процессов
+
+Генерация документа делится на два этапа:
+    1. подготовка (в основном процессе): выбор шаблона, запросы к БД,
+       склонения, формирование контекста → RenderJob
+    2. рендеринг (в пуле процессов): заполнение шаблона, пост-обработка
+       таблиц, сохранение в байты → render_docx(job)
+
+Второй этап не обращается к БД и занимает CPU, поэтому выполняется параллельно.
+Генераторы не меняются: внутри deferred_rendering() функция
+generate_docx_from_template возвращает RenderJob вместо готового файла.
+
+Число процессов задаётся настройкой DOCUMENT_RENDER_WORKERS:
+    1 (по умолчанию) — последовательный рендер в текущем процессе,
+    N > 1 — пул из N процессов, 0 — по числу ядер.
+Пул включается явно: каждый процесс веб-сервера запускает собственный пул,
+а каждый процесс пула — полноценный Django (django.setup()).
+При любой ошибке пула документ рендерится последовательно в текущем процессе.
+"""
+import atexit
+import contextvars
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+
+from directory.document_generators.template_cache import load_docx_template, jinja_env as template_jinja_env
+
+logger = logging.getLogger(__name__)
+
+# Меньше документов рендерим в текущем процессе: передача в пул не окупается
+MIN_JOBS_FOR_POOL = 2
+
+_deferred = contextvars.ContextVar('document_render_deferred', default=False)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class RenderJob:
+    """Всё, что нужно для рендеринга документа без обращения к БД"""
+    template_path: str
+    template_name: str
+    context: Dict[str, Any]
+    filename: str
+    post_processor: Optional[Callable] = None
+
+
+def render_docx(job: RenderJob) -> bytes:
+    """
+    Заполняет шаблон контекстом, применяет пост-обработку и возвращает байты DOCX.
+
+    Raises:
+        FileNotFoundError: файл шаблона не найден
+        ValueError: ошибка загрузки/заполнения шаблона или пустой результат
+    """
+    try:
+        doc = load_docx_template(job.template_path)
+    except (FileNotFoundError, ValueError):
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке шаблона в DocxTemplate: {str(e)}")
+        raise ValueError(f"Ошибка при загрузке шаблона в DocxTemplate: {str(e)}")
+
+    try:
+        doc.render(job.context, jinja_env=template_jinja_env)
+        logger.info("Шаблон успешно заполнен данными")
+
+        # Применяем пост-обработчик, если он указан
+        if job.post_processor and callable(job.post_processor):
+            try:
+                logger.info("Применение пост-обработчика к документу")
+                doc = job.post_processor(doc, job.context)
+                logger.info("Пост-обработчик успешно применен")
+            except Exception as e:
+                logger.error(f"Ошибка при применении пост-обработчика: {str(e)}")
+                logger.error(traceback.format_exc())
+
+    except Exception as e:
+        logger.error(f"Ошибка при заполнении шаблона данными: {str(e)}")
+        logger.error(f"Контекст при ошибке: {job.context.keys()}")
+        raise ValueError(f"Ошибка при заполнении шаблона данными: {str(e)}")
+
+    docx_buffer = io.BytesIO()
+    doc.save(docx_buffer)
+
+    file_content = docx_buffer.getvalue()
+    if len(file_content) == 0:
+        logger.error(f"Создан пустой DOCX файл для {job.filename}")
+        raise ValueError("Создан пустой DOCX файл")
+
+    logger.info(f"Создан DOCX файл {job.filename}, размер: {len(file_content)} байт")
+    return file_content
+
+
+@contextmanager
+def deferred_rendering():
+    """
+    Внутри блока generate_docx_from_template не рендерит документ,
+    а возвращает {'filename': ..., 'render_job': RenderJob}.
+    """
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def is_rendering_deferred() -> bool:
+    return _deferred.get()
+
+
+def get_render_workers() -> int:
+    """Число процессов рендеринга с учётом настройки DOCUMENT_RENDER_WORKERS"""
+    workers = getattr(settings, 'DOCUMENT_RENDER_WORKERS', 1)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _init_worker():
+    """Инициализация процесса пула: Django нужен для импорта пост-обработчиков"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+
+    workers = get_render_workers()
+    if workers <= 1:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn: дочерние процессы не наследуют соединения с БД и потоки веб-сервера
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            logger.info(f"Запущен пул рендеринга документов: {workers} процессов")
+        return _pool
+
+
+def shutdown_render_pool():
+    """Останавливает пул рендеринга (следующий вызов создаст новый)"""
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_render_pool)
+
+
+def _render_serial(job: RenderJob) -> Optional[bytes]:
+    try:
+        return render_docx(job)
+    except Exception as e:
+        logger.error(f"Ошибка при рендеринге документа {job.filename}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return None
+
+
+def iter_render_jobs(jobs: List[RenderJob]) -> Iterator[Optional[bytes]]:
+    """
+    Рендерит документы, по возможности параллельно, и отдаёт результаты
+    по порядку по мере готовности.
+
+    Yields:
+        байты документа для каждого job (None, если рендеринг не удался)
+    """
+    pool = _get_pool() if len(jobs) >= MIN_JOBS_FOR_POOL else None
+    if pool is None:
+        for job in jobs:
+            yield _render_serial(job)
+        return
+
+    try:
+        futures = [pool.submit(render_docx, job) for job in jobs]
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.warning(f"Пул рендеринга недоступен, последовательный режим: {e}")
+        shutdown_render_pool()
+        for job in jobs:
+            yield _render_serial(job)
+        return
+
+    for job, future in zip(jobs, futures):
+        try:
+            content = future.result()
+        except Exception as e:
+            # Ошибка пула, передачи контекста в процесс или рендеринга:
+            # повторяем в текущем процессе, чтобы получить документ или понятную ошибку
+            logger.warning(f"Документ {job.filename} не отрендерен в пуле ({e}), повтор в текущем процессе")
+            if isinstance(e, BrokenProcessPool):
+                shutdown_render_pool()
+            content = _render_serial(job)
+        yield content
+
+
+def render_jobs(jobs: List[RenderJob]) -> List[Optional[bytes]]:
+    """
+    Рендерит документы, по возможности параллельно.
+
+    Returns:
+        list: байты документа для каждого job (None, если рендеринг не удался)
+    """
+    return list(iter_render_jobs(jobs))
+
+
+def prepare_documents(calls) -> List[Optional[Dict[str, Any]]]:
+    """
+    Вызывает генераторы документов с отложенным рендерингом (только подготовка данных).
+
+    Args:
+        calls: список (generator_func, kwargs)
+
+    Returns:
+        list: для каждого вызова {'filename', 'render_job'}, готовый документ или None
+    """
+    prepared = []
+    with deferred_rendering():
+        for generator_func, kwargs in calls:
+            try:
+                prepared.append(generator_func(**kwargs))
+            except Exception as e:
+                logger.error(f"Ошибка генератора {generator_func.__name__}: {str(e)}", exc_info=True)
+                prepared.append(None)
+    return prepared
+
+
+def iter_prepared_documents(prepared) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Рендерит подготовленные prepare_documents документы и отдаёт их по порядку
+    по мере готовности. К БД не обращается.
+
+    Yields:
+        {'content', 'filename'} или None для каждого элемента prepared
+    """
+    jobs = [result['render_job'] for result in prepared if result and 'render_job' in result]
+    rendered = iter_render_jobs(jobs)
+
+    for result in prepared:
+        if result and 'render_job' in result:
+            content = next(rendered)
+            yield {'content': content, 'filename': result['filename']} if content else None
+        else:
+            # Генератор мог вернуть уже готовый документ или None
+            yield result
+
+
+def generate_documents(calls) -> List[Optional[Dict[str, Any]]]:
+    """
+    Вызывает генераторы документов с отложенным рендерингом и рендерит
+    все подготовленные документы одним пакетом.
+
+    Args:
+        calls: список (generator_func, kwargs)
+
+    Returns:
+        list: для каждого вызова {'content', 'filename'} или None
+    """
+    return list(iter_prepared_documents(prepare_documents(calls)))
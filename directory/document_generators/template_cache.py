@@ -0,0 +1,139 @@
+# directory/document_generators/template_cache.py
+"""
+💾 Кеш шаблонов DOCX для генерации документов
+
+Вместо того чтобы для каждого документа открывать и разбирать .docx с диска,
+содержимое файла шаблона и подготовленный Jinja-исходник тела документа
+хранятся в памяти процесса. Каждый рендер получает собственный экземпляр
+DocxTemplate, построенный из байтов в памяти, поэтому рендеры не влияют друг на друга.
+
+Ключ кеша: путь к файлу шаблона + mtime + размер файла, поэтому замена файла
+(в т.ч. через админку) автоматически даёт новый ключ. Дополнительно записи
+конкретного DocumentTemplate сбрасываются сигналом при его сохранении/удалении.
+
+Скомпилированные Jinja-шаблоны переиспользуются через CachingJinjaEnvironment.
+"""
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from docxtpl import DocxTemplate
+from jinja2 import Environment
+
+logger = logging.getLogger(__name__)
+
+# Максимальное число шаблонов / скомпилированных Jinja-шаблонов в памяти процесса
+TEMPLATE_CACHE_SIZE = 32
+JINJA_CACHE_SIZE = 128
+
+
+class TemplateCacheEntry:
+    """Содержимое файла шаблона и лениво подготовленный Jinja-исходник тела документа"""
+
+    def __init__(self, path, content):
+        self.path = path
+        self.content = content
+        self.body_xml = None
+        self.lock = threading.Lock()
+
+
+class CachedDocxTemplate(DocxTemplate):
+    """
+    DocxTemplate, который берёт исходник из памяти и не повторяет
+    подготовку (patch_xml) тела документа для каждого рендера.
+    """
+
+    def __init__(self, entry: TemplateCacheEntry):
+        super().__init__(io.BytesIO(entry.content))
+        self._cache_entry = entry
+
+    def build_xml(self, context, jinja_env=None):
+        entry = self._cache_entry
+        if entry.body_xml is None:
+            with entry.lock:
+                if entry.body_xml is None:
+                    entry.body_xml = self.patch_xml(self.get_xml())
+        return self.render_xml_part(entry.body_xml, self.docx._part, context, jinja_env)
+
+
+class CachingJinjaEnvironment(Environment):
+    """Jinja-окружение, которое компилирует одинаковые исходники один раз"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compiled = OrderedDict()
+        self._compiled_lock = threading.Lock()
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None:
+            return super().from_string(source, globals, template_class)
+        with self._compiled_lock:
+            template = self._compiled.get(source)
+            if template is not None:
+                self._compiled.move_to_end(source)
+                return template
+        template = super().from_string(source)
+        with self._compiled_lock:
+            self._compiled[source] = template
+            if len(self._compiled) > JINJA_CACHE_SIZE:
+                self._compiled.popitem(last=False)
+        return template
+
+
+_entries = OrderedDict()
+_entries_lock = threading.Lock()
+jinja_env = CachingJinjaEnvironment()
+
+
+def load_docx_template(template_path) -> DocxTemplate:
+    """
+    Возвращает новый DocxTemplate для рендера, используя кеш содержимого шаблона.
+
+    Raises:
+        FileNotFoundError: файл шаблона не найден
+        ValueError: файл шаблона пуст
+    """
+    template_path = str(template_path)
+    try:
+        stat = os.stat(template_path)
+    except FileNotFoundError:
+        logger.error(f"Файл шаблона не найден: {template_path}")
+        raise FileNotFoundError(f"Файл шаблона не найден: {template_path}")
+
+    if stat.st_size == 0:
+        logger.error(f"Файл шаблона пуст: {template_path}")
+        raise ValueError(f"Файл шаблона имеет нулевой размер: {template_path}")
+
+    key = (template_path, stat.st_mtime_ns, stat.st_size)
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+
+    if entry is None:
+        with open(template_path, 'rb') as template_file:
+            content = template_file.read()
+        entry = TemplateCacheEntry(template_path, content)
+        with _entries_lock:
+            # Старые версии того же файла больше не нужны
+            for stale_key in [k for k in _entries if k[0] == template_path]:
+                del _entries[stale_key]
+            _entries[key] = entry
+            if len(_entries) > TEMPLATE_CACHE_SIZE:
+                _entries.popitem(last=False)
+        logger.info(f"Шаблон загружен в кеш: {template_path}, размер: {stat.st_size} байт")
+
+    return CachedDocxTemplate(entry)
+
+
+def invalidate_template_cache(template_path=None):
+    """Удаляет из кеша записи указанного файла шаблона (или все записи)"""
+    with _entries_lock:
+        if template_path is None:
+            _entries.clear()
+            return
+        template_path = str(template_path)
+        for stale_key in [k for k in _entries if k[0] == template_path]:
+            del _entries[stale_key]
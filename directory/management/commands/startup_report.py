@@ -0,0 +1,60 @@
+import sys
+import time
+from collections import Counter
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Отчёт о времени запуска: импорт URLconf и загрузка анализатора морфологии'
+
+    # Системные проверки загружают URLconf заранее и исказили бы замер
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--with-morph',
+            action='store_true',
+            help='Дополнительно замерить загрузку словарей pymorphy3',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Сколько пакетов с наибольшим числом импортированных модулей показать',
+        )
+
+    def handle(self, *args, **options):
+        from directory.utils.declension import get_morph, is_morph_analyzer_loaded
+
+        modules_before = set(sys.modules)
+
+        started = time.perf_counter()
+        import_module(settings.ROOT_URLCONF)
+        urlconf_time = time.perf_counter() - started
+
+        new_modules = set(sys.modules) - modules_before
+        packages = Counter(name.split('.')[0] for name in new_modules)
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"URLconf '{settings.ROOT_URLCONF}': {urlconf_time * 1000:.1f} мс")
+        self.stdout.write(f"Импортировано новых модулей: {len(new_modules)}")
+        for package, count in packages.most_common(options['top']):
+            self.stdout.write(f"  - {package}: {count}")
+
+        if is_morph_analyzer_loaded():
+            self.stdout.write(self.style.WARNING(
+                'Анализатор морфологии загружен при импорте URLconf (ожидается ленивая загрузка)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Анализатор морфологии при импорте URLconf не загружался'))
+
+        if options['with_morph']:
+            started = time.perf_counter()
+            get_morph()
+            morph_time = time.perf_counter() - started
+            self.stdout.write(f"Загрузка pymorphy3.MorphAnalyzer: {morph_time * 1000:.1f} мс")
+
+        self.stdout.write("=" * 60)
@@ -5,11 +5,39 @@ from directory.utils.medical_examination import update_medical_examination_statu
 class Command(BaseCommand):
     help = 'Обновляет статусы медицинских осмотров'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Поставить обновление в очередь фоновых задач вместо выполнения в текущем процессе',
+        )
+        parser.add_argument(
+            '--repeat-hours',
+            type=int,
+            default=0,
+            help='Повторять фоновое обновление с указанным периодом в часах (вместе с --background)',
+        )
+
     def handle(self, *args, **options):
+        if options['background']:
+            from directory.tasks import schedule_medical_statuses_job
+
+            result = schedule_medical_statuses_job(repeat_hours=options['repeat_hours'])
+            if result is None:
+                self.stdout.write(self.style.WARNING('Задача уже запланирована, повторно не поставлена'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Задача поставлена в очередь: {result.id}'))
+            return
+
         result = update_medical_examination_statuses()
 
+        for org_id, counts in sorted(result['by_organization'].items()):
+            self.stdout.write(
+                f'  Организация {org_id}: to_issue={counts["to_issue"]}, expired={counts["expired"]}'
+            )
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'Обновлено статусов: to_issue={result["to_issue_updated"]}, expired={result["expired_updated"]}'
             )
-        )
\ No newline at end of file
+        )
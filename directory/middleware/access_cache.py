@@ -4,6 +4,7 @@ Middleware для инициализации request-level кеша прав д
 
 Кеш хранится в атрибутах request и автоматически очищается после каждого запроса.
 Это решает проблему множественных обращений к БД для проверки прав в рамках одного HTTP запроса.
+Между запросами AccessScope живёт в Django cache (см. directory/utils/permissions.py).
 """
 
 
@@ -11,12 +12,10 @@ class AccessCacheMiddleware:
     """
     Инициализирует кеш прав доступа для каждого запроса.
 
-    Добавляет в request следующие атрибуты:
-    - _user_orgs_cache: QuerySet доступных организаций
-    - _user_subdivs_cache: QuerySet доступных подразделений
-    - _user_depts_cache: QuerySet доступных отделов
+    Добавляет в request атрибут:
+    - _user_access_scope: AccessScope (ID доступных организаций, подразделений и отделов)
 
-    Эти атрибуты заполняются лениво (при первом обращении) в AccessControlHelper.
+    Атрибут заполняется лениво (при первом обращении) в AccessControlHelper.
     """
 
     def __init__(self, get_response):
@@ -24,9 +23,7 @@ class AccessCacheMiddleware:
 
     def __call__(self, request):
         # Инициализируем кеш перед обработкой запроса
-        request._user_orgs_cache = None
-        request._user_subdivs_cache = None
-        request._user_depts_cache = None
+        request._user_access_scope = None
 
         # Обрабатываем запрос
         response = self.get_response(request)
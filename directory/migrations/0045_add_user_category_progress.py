@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0044_remove_commission_role_from_position'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategoryProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered_count', models.PositiveIntegerField(default=0, verbose_name='Отвечено вопросов')),
+                ('is_stale', models.BooleanField(default=False, verbose_name='Требует пересчёта')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='directory.quizcategory', verbose_name='Раздел')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='directory.quiz', verbose_name='Экзамен')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_category_progress', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Прогресс по разделу',
+                'verbose_name_plural': 'Прогресс по разделам',
+                'unique_together': {('user', 'quiz', 'category')},
+            },
+        ),
+    ]
@@ -13,7 +13,10 @@ from .document_template import DocumentTemplate, GeneratedDocument, DocumentGene
 from .commission import Commission, CommissionMember
 from .hiring import EmployeeHiring
 # Добавляем импорт моделей экзаменов
-from .quiz import QuizCategory, QuizCategoryOrder, Quiz, Question, Answer, QuizAttempt, UserAnswer, QuizAccessToken, QuizQuestionOrder
+from .quiz import (
+    QuizCategory, QuizCategoryOrder, Quiz, Question, Answer, QuizAttempt, UserAnswer, QuizAccessToken, QuizQuestionOrder,
+    UserCategoryProgress
+)
 
 __all__ = [
     'Organization',
@@ -43,4 +46,5 @@ __all__ = [
     'UserAnswer',
     'QuizAccessToken',
     'QuizQuestionOrder',
+    'UserCategoryProgress',
 ]
@@ -219,128 +219,17 @@ class Employee(models.Model):
                 'status': str,  # no_date, expired, upcoming, normal
                 'factors': list,  # Список вредных факторов
             }
+
+        Для списков сотрудников используйте пакетный расчёт
+        deadline_control.utils.medical_status.get_medical_statuses().
         """
-        from deadline_control.models import EmployeeMedicalExamination, MedicalExaminationNorm
-        from django.utils import timezone
+        from deadline_control.utils.medical_status import get_medical_statuses
 
         # Проверяем наличие должности
-        if not self.position:
-            return None
-
-        # ШАГИ 1-2: Получаем вредные факторы с учетом иерархии
-        # 1. Проверяем переопределения для конкретной должности (PositionMedicalFactor)
-        position_factors = self.position.medical_factors.filter(is_disabled=False).select_related('harmful_factor')
-
-        harmful_factors = []
-        if position_factors.exists():
-            # Используем переопределённые факторы
-            harmful_factors = [pf.harmful_factor for pf in position_factors]
-        else:
-            # 2. Если переопределений нет - берём эталонные нормы по названию должности
-            reference_norms = MedicalExaminationNorm.objects.filter(
-                position_name=self.position.position_name
-            ).select_related('harmful_factor')
-            harmful_factors = [norm.harmful_factor for norm in reference_norms]
-
-        # Если вообще нет факторов - медосмотры не требуются
-        if not harmful_factors:
+        if not self.position_id:
             return None
 
-        # ШАГ 3: Получаем записи медосмотров для этих факторов (только активные)
-        harmful_factor_ids = [f.id for f in harmful_factors]
-        examinations = self.medical_examinations.filter(
-            harmful_factor_id__in=harmful_factor_ids,
-            is_disabled=False  # Игнорируем отключенные медосмотры
-        ).select_related('harmful_factor')
-
-        # ШАГ 4: Собираем информацию о факторах и датах
-        factors = []
-        min_periodicity = None
-        has_date = False
-        earliest_date = None
-
-        # Если записей медосмотров нет - используем факторы напрямую
-        if not examinations.exists():
-            for factor in harmful_factors:
-                factors.append({
-                    'name': factor.full_name,
-                    'short_name': factor.short_name,
-                    'periodicity': factor.periodicity,
-                })
-                if min_periodicity is None or factor.periodicity < min_periodicity:
-                    min_periodicity = factor.periodicity
-
-            # Возвращаем статус "нужно внести дату"
-            return {
-                'has_date': False,
-                'date_completed': None,
-                'next_date': None,
-                'min_periodicity': min_periodicity,
-                'days_until': None,
-                'status': 'no_date',
-                'factors': factors,
-            }
-
-        # Если записи есть - анализируем их
-        exams_without_date = []
-        for exam in examinations:
-            factors.append({
-                'name': exam.harmful_factor.full_name,
-                'short_name': exam.harmful_factor.short_name,
-                'periodicity': exam.harmful_factor.periodicity,
-            })
-
-            # Находим минимальную периодичность
-            if min_periodicity is None or exam.harmful_factor.periodicity < min_periodicity:
-                min_periodicity = exam.harmful_factor.periodicity
-
-            # Проверяем, есть ли дата
-            if exam.date_completed:
-                has_date = True
-                if earliest_date is None or exam.date_completed < earliest_date:
-                    earliest_date = exam.date_completed
-            else:
-                exams_without_date.append(exam)
-
-        # Если нет ни одной даты - статус "нужно внести дату"
-        if not has_date:
-            return {
-                'has_date': False,
-                'date_completed': None,
-                'next_date': None,
-                'min_periodicity': min_periodicity,
-                'days_until': None,
-                'status': 'no_date',
-                'factors': factors,
-                'exams_without_date_count': len(exams_without_date),
-            }
-
-        # Рассчитываем следующую дату на основе минимальной периодичности
-        from deadline_control.models.medical_norm import EmployeeMedicalExamination as MedExamModel
-        next_date = MedExamModel._add_months(earliest_date, min_periodicity)
-
-        # Рассчитываем дни до следующего медосмотра
-        today = timezone.now().date()
-        days_until = (next_date - today).days
-
-        # Определяем статус
-        if days_until < 0:
-            status = 'expired'
-        elif days_until <= 30:
-            status = 'upcoming'
-        else:
-            status = 'normal'
-
-        return {
-            'has_date': True,
-            'date_completed': earliest_date,
-            'next_date': next_date,
-            'min_periodicity': min_periodicity,
-            'days_until': days_until,
-            'status': status,
-            'factors': factors,
-            'exams_without_date_count': len(exams_without_date),
-        }
+        return get_medical_statuses([self])[self.id]
 
     def __str__(self):
         parts = [self.full_name_nominative, "-", str(self.position)]
@@ -53,8 +53,10 @@ class QuizCategory(TimeStampedModel):
         return self.name
 
     def get_questions_count(self):
-        """Количество вопросов в разделе"""
-        return self.questions.filter(is_active=True).count()
+        """Количество вопросов в разделе (из кешированного индекса раздела)"""
+        from directory.utils.quiz_question_bank import get_category_question_counts
+
+        return get_category_question_counts([self.id])[self.id]
 
 
 class QuizCategoryOrder(models.Model):
@@ -196,41 +198,48 @@ class Quiz(TimeStampedModel):
 
         return questions
 
-    def get_questions_for_exam(self):
-        """Получить вопросы для итогового экзамена (срез из всех разделов)"""
-        questions = []
-        categories = self.categories.filter(is_active=True).order_by('order', 'name')
+    def get_question_ids_for_exam(self):
+        """
+        ID вопросов для итогового экзамена (срез из всех разделов).
+
+        Вопросы выбираются по кешированным индексам разделов
+        (directory/utils/quiz_question_bank.py), без загрузки вопросов из БД.
+        """
+        from directory.utils.quiz_question_bank import get_category_question_ids
+
+        category_ids = list(
+            self.categories.filter(is_active=True).order_by('order', 'name').values_list('id', flat=True)
+        )
+        indexes = get_category_question_ids(category_ids)
         max_questions = self.exam_total_questions
-        selected_count = 0
+        question_ids = []
 
-        for category in categories:
-            if max_questions and selected_count >= max_questions:
+        for category_id in category_ids:
+            if max_questions and len(question_ids) >= max_questions:
                 break
 
-            # Берем N вопросов из каждого раздела
-            category_questions = list(Question.objects.filter(
-                category=category,
-                is_active=True
-            ))
-
-            if not category_questions:
+            category_question_ids = indexes[category_id]
+            if not category_question_ids:
                 continue
 
             # Берем questions_per_category вопросов из текущей категории
             questions_to_take = min(
                 self.questions_per_category,
-                len(category_questions),
-                max_questions - selected_count
+                len(category_question_ids),
+                max_questions - len(question_ids)
             )
-
-            selected_questions = random.sample(category_questions, questions_to_take)
-            questions.extend(selected_questions)
-            selected_count += len(selected_questions)
+            question_ids.extend(random.sample(category_question_ids, questions_to_take))
 
         if self.random_order:
-            random.shuffle(questions)
+            random.shuffle(question_ids)
 
-        return questions
+        return question_ids
+
+    def get_questions_for_exam(self):
+        """Получить вопросы для итогового экзамена (срез из всех разделов)"""
+        question_ids = self.get_question_ids_for_exam()
+        questions = Question.objects.in_bulk(question_ids)
+        return [questions[question_id] for question_id in question_ids if question_id in questions]
 
     def get_total_questions_for_category(self, category):
         """Количество вопросов в конкретном разделе"""
@@ -238,14 +247,12 @@ class Quiz(TimeStampedModel):
 
     def get_total_questions_for_exam(self):
         """Общее количество вопросов для итогового экзамена"""
-        categories = self.categories.filter(is_active=True)
-        total = 0
-        for category in categories:
-            questions_count = Question.objects.filter(
-                category=category,
-                is_active=True
-            ).count()
-            total += min(self.questions_per_category, questions_count)
+        from directory.utils.quiz_question_bank import get_category_question_counts
+
+        counts = get_category_question_counts(
+            self.categories.filter(is_active=True).values_list('id', flat=True)
+        )
+        total = sum(min(self.questions_per_category, count) for count in counts.values())
         return min(total, self.exam_total_questions)
 
     def get_exam_categories(self):
@@ -719,3 +726,47 @@ class QuizQuestionOrder(models.Model):
 
     def __str__(self):
         return f"Попытка #{self.attempt.id} - Вопрос {self.order + 1}"
+
+
+class UserCategoryProgress(models.Model):
+    """
+    Прогресс тренировки пользователя по разделу экзамена: число уникальных
+    вопросов раздела, на которые пользователь ответил (не пропустил).
+
+    Счётчик увеличивается при ответе (directory/utils/quiz_progress.py).
+    При удалении/переносе вопросов, удалении или прерывании тренировки запись
+    помечается устаревшей и пересчитывается по ответам при следующем чтении.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='quiz_category_progress',
+        verbose_name=_("Пользователь")
+    )
+    quiz = models.ForeignKey(
+        Quiz,
+        on_delete=models.CASCADE,
+        verbose_name=_("Экзамен")
+    )
+    category = models.ForeignKey(
+        QuizCategory,
+        on_delete=models.CASCADE,
+        verbose_name=_("Раздел")
+    )
+    answered_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Отвечено вопросов")
+    )
+    is_stale = models.BooleanField(
+        default=False,
+        verbose_name=_("Требует пересчёта")
+    )
+
+    class Meta:
+        verbose_name = _("Прогресс по разделу")
+        verbose_name_plural = _("Прогресс по разделам")
+        unique_together = [['user', 'quiz', 'category']]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.category.name}: {self.answered_count}"
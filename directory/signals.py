@@ -1,8 +1,17 @@
 # 📁 directory/signals.py
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from directory.models import Employee, Position, StructuralSubdivision, Profile
+from directory.models import (
+    Employee, Position, StructuralSubdivision, Profile, Organization, Department, QuizAttempt, Question, Answer,
+    UserAnswer
+)
+from directory.utils.permissions import invalidate_user_access_scope, invalidate_all_access_scopes
+from directory.models.document_template import DocumentTemplate
+from directory.utils.quiz_attempt_state import invalidate_attempt_state
+from directory.utils.quiz_question_bank import invalidate_question_bank
+from directory.utils.quiz_progress import mark_progress_stale
+from directory.document_generators.template_cache import invalidate_template_cache
 
 
 @receiver(post_save, sender=User)
@@ -34,21 +43,171 @@ def update_departments(sender, instance, **kwargs):
         instance.department_set.all().update(organization=instance.organization)
 
 
+@receiver(m2m_changed, sender=Profile.organizations.through)
+@receiver(m2m_changed, sender=Profile.subdivisions.through)
+@receiver(m2m_changed, sender=Profile.departments.through)
+def invalidate_profile_access_scope(sender, instance, action, reverse, **kwargs):
+    """
+    Сбрасывает кешированный AccessScope при изменении прав доступа профиля.
+    При изменении со стороны организации/подразделения/отдела (reverse)
+    затронуто сразу несколько профилей - сбрасываем кеш целиком.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        invalidate_all_access_scopes()
+    else:
+        invalidate_user_access_scope(instance.user_id)
+
+
+# Поля, от которых зависит AccessScope: привязка подразделений и отделов в оргструктуре
+STRUCTURE_PARENT_FIELDS = {
+    StructuralSubdivision: ('organization_id',),
+    Department: ('organization_id', 'subdivision_id'),
+}
+
+
+@receiver(pre_save, sender=StructuralSubdivision)
+@receiver(pre_save, sender=Department)
+def cache_old_structure_parents(sender, instance, **kwargs):
+    """
+    Запоминает прежнюю привязку подразделения/отдела перед сохранением,
+    чтобы в post_save сбрасывать AccessScope только при перемещении.
+    """
+    fields = STRUCTURE_PARENT_FIELDS[sender]
+    # Для нового элемента старых значений нет
+    instance._old_structure_parents = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first() if instance.pk else None
+
+
+@receiver(post_save, sender=StructuralSubdivision)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Organization)
+@receiver(post_delete, sender=StructuralSubdivision)
+@receiver(post_delete, sender=Department)
+def invalidate_access_scopes_on_structure_change(sender, instance, created=False, **kwargs):
+    """
+    Сбрасывает AccessScope всех пользователей при создании, перемещении
+    или удалении элементов оргструктуры. Переименование кеш не затрагивает.
+    """
+    if kwargs['signal'] is post_save and not created:
+        old_parents = getattr(instance, '_old_structure_parents', None)
+        new_parents = tuple(getattr(instance, field) for field in STRUCTURE_PARENT_FIELDS[sender])
+        if old_parents == new_parents:
+            return
+    invalidate_all_access_scopes()
+
+
+@receiver(post_save, sender=DocumentTemplate)
+@receiver(post_delete, sender=DocumentTemplate)
+def invalidate_document_template_cache(sender, instance, **kwargs):
+    """
+    Сбрасывает кеш разобранного шаблона при замене файла или удалении шаблона.
+    """
+    if instance.template_file:
+        invalidate_template_cache(instance.template_file.path)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+def invalidate_quiz_attempt_state(sender, instance, **kwargs):
+    """
+    Сбрасывает снимок состояния попытки, если она завершена, прервана
+    (в т.ч. через админку) или удалена.
+    """
+    if kwargs.get('signal') is post_delete or instance.status != QuizAttempt.STATUS_IN_PROGRESS:
+        invalidate_attempt_state(instance.id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+def mark_attempt_progress_stale(sender, instance, **kwargs):
+    """Удалённая или прерванная тренировка больше не учитывается в прогрессе раздела"""
+    if instance.category_id is None:
+        return
+    if kwargs.get('signal') is post_delete or instance.status == QuizAttempt.STATUS_ABANDONED:
+        mark_progress_stale(
+            user_id=instance.user_id,
+            quiz_id=instance.quiz_id,
+            category_id=instance.category_id
+        )
+
+
+@receiver(post_delete, sender=UserAnswer)
+def mark_answer_progress_stale(sender, instance, **kwargs):
+    """Удаление отдельного ответа (например, через админку) пересчитывает прогресс раздела"""
+    # Каскадное удаление (с попыткой, вопросом, пользователем) обрабатывается
+    # сигналами попытки и вопроса или удаляет сам прогресс
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is not UserAnswer:
+        return
+
+    attempt = QuizAttempt.objects.filter(pk=instance.attempt_id).values(
+        'user_id', 'quiz_id', 'category_id'
+    ).first()
+    if attempt and attempt['category_id']:
+        mark_progress_stale(**attempt)
+
+
+@receiver(pre_save, sender=Question)
+def cache_old_question_category(sender, instance, **kwargs):
+    """Запоминает прежний раздел вопроса, чтобы сбросить кеш обоих разделов при переносе"""
+    instance._old_category_id = Question.objects.filter(
+        pk=instance.pk
+    ).values_list('category_id', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_bank_for_question(sender, instance, **kwargs):
+    """Сбрасывает кеш вопросов раздела при изменении, импорте или удалении вопроса"""
+    invalidate_question_bank(instance.category_id, getattr(instance, '_old_category_id', None))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def mark_question_progress_stale(sender, instance, **kwargs):
+    """Удаление (в т.ч. повторный импорт раздела) или перенос вопроса пересчитывает прогресс раздела"""
+    old_category_id = getattr(instance, '_old_category_id', None)
+    if kwargs.get('signal') is post_delete:
+        mark_progress_stale(category_id=instance.category_id)
+    elif old_category_id and old_category_id != instance.category_id:
+        mark_progress_stale(category_id__in=[old_category_id, instance.category_id])
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_question_bank_for_answer(sender, instance, **kwargs):
+    """Сбрасывает кеш вопросов раздела при изменении вариантов ответа"""
+    # Каскадное удаление вместе с вопросами (в т.ч. при повторном импорте
+    # раздела): раздел сбрасывается сигналом удаления вопроса
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is Question:
+        return
+
+    if Answer.question.is_cached(instance):
+        category_id = instance.question.category_id
+    else:
+        category_id = Question.objects.filter(
+            pk=instance.question_id
+        ).values_list('category_id', flat=True).first()
+    invalidate_question_bank(category_id)
+
+
 @receiver(pre_save, sender=Employee)
 def cache_old_position(sender, instance, **kwargs):
     """
-    Кэширует старую должность сотрудника перед сохранением,
-    чтобы в post_save можно было определить, изменилась ли она.
+    Кэширует старые должность и организацию сотрудника перед сохранением,
+    чтобы в post_save можно было определить, изменились ли они
+    (здесь и в deadline_control/signals.py).
     """
-    if instance.pk:
-        try:
-            # Сохраняем старую должность в самом объекте instance
-            instance._old_position = Employee.objects.get(pk=instance.pk).position
-        except Employee.DoesNotExist:
-            instance._old_position = None
-    else:
-        # Для нового сотрудника старой должности нет
-        instance._old_position = None
+    stored = Employee.objects.filter(
+        pk=instance.pk
+    ).values('position_id', 'organization_id').first() if instance.pk else None
+    # Для нового сотрудника старых значений нет
+    instance._old_position_id = stored['position_id'] if stored else None
+    instance._old_organization_id = stored['organization_id'] if stored else None
 
 
 def get_harmful_factors_for_position(position):
@@ -57,82 +216,35 @@ def get_harmful_factors_for_position(position):
     1. PositionMedicalFactor (переопределения для конкретной должности)
     2. MedicalExaminationNorm (эталонные нормы по названию профессии)
 
+    Факторы берутся из кеша (deadline_control/utils/position_factors.py).
+
     Returns:
         QuerySet[HarmfulFactor]
     """
-    from deadline_control.models import MedicalExaminationNorm, HarmfulFactor
+    from deadline_control.models import HarmfulFactor
+    from deadline_control.utils.position_factors import get_factors_for_position
 
     if not position:
         return HarmfulFactor.objects.none()
 
-    # Проверяем переопределения для конкретной должности
-    position_factors = position.medical_factors.filter(is_disabled=False).select_related('harmful_factor')
-
-    if position_factors.exists():
-        # Используем переопределённые факторы
-        return HarmfulFactor.objects.filter(
-            id__in=position_factors.values_list('harmful_factor_id', flat=True)
-        )
-    else:
-        # Если переопределений нет - берём эталонные нормы по названию должности
-        reference_norms = MedicalExaminationNorm.objects.filter(
-            position_name=position.position_name
-        ).select_related('harmful_factor')
-
-        return HarmfulFactor.objects.filter(
-            id__in=reference_norms.values_list('harmful_factor_id', flat=True)
-        )
+    return HarmfulFactor.objects.filter(
+        id__in=[factor.id for factor in get_factors_for_position(position)]
+    )
 
 
 @receiver(post_save, sender=Employee)
 def update_medical_examinations_on_change(sender, instance, created, **kwargs):
     """
-    Автоматически создает или обновляет записи медосмотров при создании
+    Автоматически создает записи медосмотров при создании
     или изменении должности сотрудника.
 
     Учитывает иерархию: PositionMedicalFactor → MedicalExaminationNorm
     """
     # Импортируем здесь, чтобы избежать циклических импортов
-    from deadline_control.models import EmployeeMedicalExamination
+    from deadline_control.utils.medical_sync import sync_medical_examinations
 
-    if created:
-        # --- Логика для НОВОГО сотрудника ---
-        if instance.position:
-            harmful_factors = get_harmful_factors_for_position(instance.position)
-            for factor in harmful_factors:
-                EmployeeMedicalExamination.objects.get_or_create(
-                    employee=instance,
-                    harmful_factor=factor,
-                )
-    elif hasattr(instance, '_old_position') and instance._old_position != instance.position:
-        # --- Логика для ИЗМЕНЕНИЯ ДОЛЖНОСТИ ---
-        old_position = instance._old_position
-        new_position = instance.position
-
-        # Получаем наборы ID вредных факторов с учетом иерархии
-        old_factor_ids = set()
-        if old_position:
-            old_factors = get_harmful_factors_for_position(old_position)
-            old_factor_ids = set(old_factors.values_list('id', flat=True))
-
-        new_factor_ids = set()
-        if new_position:
-            new_factors = get_harmful_factors_for_position(new_position)
-            new_factor_ids = set(new_factors.values_list('id', flat=True))
-
-        # Находим факторы, которые нужно добавить
-        factors_to_add_ids = new_factor_ids - old_factor_ids
-
-        if factors_to_add_ids:
-            from deadline_control.models.medical_examination import HarmfulFactor
-            factors_to_add = HarmfulFactor.objects.filter(pk__in=factors_to_add_ids)
-            for factor in factors_to_add:
-                # Создаем только если такого медосмотра еще нет (на всякий случай)
-                EmployeeMedicalExamination.objects.get_or_create(
-                    employee=instance,
-                    harmful_factor=factor,
-                )
-
-        # Факторы, которые были в старой должности, но нет в новой, мы не трогаем.
-        # Логика их фильтрации теперь лежит в методе Employee.get_medical_status(),
-        # который учитывает только факторы ТЕКУЩЕЙ должности.
+    if created or getattr(instance, '_old_position_id', None) != instance.position_id:
+        # Недостающие записи по факторам текущей должности создаются одним bulk_create.
+        # Записи по факторам прежней должности не трогаем: Employee.get_medical_status()
+        # учитывает только факторы ТЕКУЩЕЙ должности.
+        sync_medical_examinations([instance])
@@ -0,0 +1,221 @@
+# directory/tasks.py
+"""
+⏳ Фоновые задачи приложения directory (django-tasks)
+
+Бэкенд задач задаётся настройкой TASKS (см. settings.py). Прогресс задач
+публикуется через directory.utils.background_jobs.
+"""
+import logging
+import os
+import re
+import zipfile
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django_tasks import task
+
+from directory.utils.background_jobs import (
+    JOB_STATUS_DONE,
+    JOB_STATUS_FAILED,
+    JOB_STATUS_RUNNING,
+    cleanup_export_dir,
+    get_export_dir,
+    update_job,
+)
+
+logger = logging.getLogger(__name__)
+
+SIZ_CARDS_JOB_KIND = 'siz_cards'
+
+
+def _safe_filename(value):
+    return re.sub(r'[<>:"/\\|?*]', '_', value)
+
+
+@task()
+def generate_siz_cards_archive(job_id, subdivision_ids, user_id=None):
+    """
+    📦 Генерация ZIP-архива с карточками СИЗ для выбранных подразделений.
+
+    Архив пишется во временный файл на диске; прогресс обновляется
+    после каждого подразделения.
+    """
+    from directory.document_generators.base import warm_employee_declensions
+    from directory.document_generators.render_pool import generate_documents
+    from directory.document_generators.siz_card_docx_generator import generate_siz_card_docx
+    from directory.models import Employee
+    from directory.models.position import Position
+    from directory.models.subdivision import StructuralSubdivision
+
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+
+    cleanup_export_dir()
+    file_path = os.path.join(get_export_dir(), f'{job_id}.zip')
+    partial_path = f'{file_path}.part'
+    filename = f'Карточки_СИЗ_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+
+    update_job(job_id, status=JOB_STATUS_RUNNING, total=len(subdivision_ids))
+
+    # Должности, для которых есть нормы СИЗ (прямо или через эталонную с тем же названием)
+    position_names_with_norms = set(
+        Position.objects.filter(siz_norms__isnull=False).values_list('position_name', flat=True)
+    )
+    subdivisions = StructuralSubdivision.objects.in_bulk(subdivision_ids)
+
+    generated_count = 0
+    errors = []
+
+    try:
+        with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for processed, subdivision_id in enumerate(subdivision_ids, start=1):
+                subdivision = subdivisions.get(subdivision_id)
+                try:
+                    if subdivision is None:
+                        raise StructuralSubdivision.DoesNotExist("Подразделение не найдено")
+
+                    update_job(job_id, current=subdivision.name)
+
+                    # Сотрудники подразделения, у которых есть нормы СИЗ
+                    employees = [
+                        employee for employee in Employee.objects.filter(
+                            position__department__subdivision=subdivision
+                        ).select_related(
+                            'position', 'position__department', 'organization', 'subdivision', 'department'
+                        )
+                        if employee.position and employee.position.position_name in position_names_with_norms
+                    ]
+
+                    # Склонения для всех сотрудников подразделения - одним пакетным вызовом
+                    warm_employee_declensions(employees)
+
+                    # Данные карточек готовятся здесь, рендеринг DOCX - в пуле процессов
+                    results = generate_documents([
+                        (generate_siz_card_docx, {'employee': employee, 'user': user})
+                        for employee in employees
+                    ])
+
+                    safe_subdivision = _safe_filename(subdivision.name)
+                    for employee, result in zip(employees, results):
+                        if result and 'content' in result:
+                            safe_employee = _safe_filename(employee.full_name_nominative)
+                            archive_path = f"{safe_subdivision}/{safe_employee}_карточка_СИЗ.docx"
+                            zip_file.writestr(archive_path, result['content'])
+                            generated_count += 1
+                            logger.info(f"Добавлена карточка: {archive_path}")
+                        else:
+                            errors.append(f"Ошибка генерации для {employee.full_name_nominative}")
+
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке подразделения {subdivision_id}: {e}")
+                    errors.append(f"Ошибка подразделения ID={subdivision_id}: {str(e)}")
+
+                update_job(
+                    job_id,
+                    processed=processed,
+                    generated_count=generated_count,
+                    errors=errors,
+                )
+
+            # Добавляем файл со сводкой
+            summary = f"""Массовая генерация карточек СИЗ
+Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}
+Сгенерировано карточек: {generated_count}
+
+"""
+            if errors:
+                summary += "Ошибки:\n" + "\n".join(errors)
+
+            zip_file.writestr("_summary.txt", summary.encode('utf-8'))
+
+        os.replace(partial_path, file_path)
+
+    except Exception as e:
+        logger.exception(f"Ошибка фоновой генерации карточек СИЗ (задача {job_id}): {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        update_job(job_id, status=JOB_STATUS_FAILED, errors=errors + [str(e)])
+        raise
+
+    update_job(
+        job_id,
+        status=JOB_STATUS_DONE,
+        current='',
+        generated_count=generated_count,
+        errors=errors,
+        file_path=file_path,
+        filename=filename,
+    )
+    logger.info(f"Массовая генерация завершена. Создано файлов: {generated_count}")
+
+    return {'generated_count': generated_count, 'errors': len(errors)}
+
+
+@task()
+def update_medical_statuses_job(repeat_hours=0):
+    """
+    🏥 Обновление статусов медосмотров (см. update_medical_examination_statuses).
+
+    Если указан repeat_hours, задача ставит себя в очередь повторно через
+    указанное число часов - в том числе после ошибки, чтобы цепочка запусков
+    не обрывалась (нужен бэкенд с поддержкой отложенного запуска, например
+    DatabaseBackend + db_worker). Без такого бэкенда периодический запуск
+    настраивается через cron: manage.py update_medical_statuses.
+    """
+    from directory.utils.medical_examination import update_medical_examination_statuses
+
+    try:
+        result = update_medical_examination_statuses()
+    finally:
+        if repeat_hours:
+            schedule_medical_statuses_job(repeat_hours, delay_hours=repeat_hours)
+
+    logger.info(
+        f"Статусы медосмотров обновлены: to_issue={result['to_issue_updated']}, "
+        f"expired={result['expired_updated']}"
+    )
+
+    return {
+        'to_issue_updated': result['to_issue_updated'],
+        'expired_updated': result['expired_updated'],
+        'by_organization': {str(org_id): counts for org_id, counts in result['by_organization'].items()},
+    }
+
+
+def _has_pending_run(job):
+    """Есть ли в очереди ожидающий запуск задачи (только для DatabaseBackend)"""
+    from django_tasks import ResultStatus
+    from django_tasks.backends.database.backend import DatabaseBackend
+
+    if not isinstance(job.get_backend(), DatabaseBackend):
+        return False
+
+    from django_tasks.backends.database.models import DBTaskResult
+
+    return DBTaskResult.objects.filter(task_path=job.module_path, status=ResultStatus.READY).exists()
+
+
+def schedule_medical_statuses_job(repeat_hours=0, delay_hours=0):
+    """
+    Ставит задачу обновления статусов медосмотров в очередь.
+
+    Периодическая задача не ставится, если в очереди уже есть ожидающий
+    запуск (повторный вызов команды не создаёт вторую цепочку).
+
+    Args:
+        repeat_hours: период повторного запуска (0 - однократно)
+        delay_hours: через сколько часов выполнить (0 - сразу)
+
+    Returns:
+        TaskResult или None, если задача не поставлена
+    """
+    job = update_medical_statuses_job
+    if repeat_hours and _has_pending_run(job):
+        logger.info("Обновление статусов медосмотров уже запланировано, повторная постановка пропущена")
+        return None
+    if delay_hours:
+        if not job.get_backend().supports_defer:
+            logger.warning("Бэкенд задач не поддерживает отложенный запуск, периодическое обновление статусов остановлено")
+            return None
+        job = job.using(run_after=timezone.now() + timedelta(hours=delay_hours))
+    return job.enqueue(repeat_hours=repeat_hours)
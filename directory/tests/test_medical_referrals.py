@@ -0,0 +1,117 @@
+import datetime
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from docx import Document
+
+from directory.models import Organization, Employee, Position
+from deadline_control.models import HarmfulFactor, MedicalExaminationNorm, MedicalReferral, EmployeeMedicalExamination
+from deadline_control.utils.medical_referrals import create_batch_referrals
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='ot_online_test_media_')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, ROOT_URLCONF='directory.tests.urls')
+class BatchReferralTests(TestCase):
+    """Пакетная выдача направлений на медосмотр"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+        self.org = Organization.objects.create(
+            full_name_ru="Тестовая организация",
+            short_name_ru="ТестОрг",
+            full_name_by="Тэставая арганізацыя",
+            short_name_by="ТэстАрг"
+        )
+        factor = HarmfulFactor.objects.create(short_name="4.2.5", full_name="Шум", periodicity=12)
+        MedicalExaminationNorm.objects.create(position_name="Слесарь", harmful_factor=factor)
+        position = Position.objects.create(position_name="Слесарь", organization=self.org)
+        self.employees = [
+            Employee.objects.create(
+                full_name_nominative=full_name,
+                date_of_birth=datetime.date(1990, 1, 1),
+                organization=self.org,
+                position=position,
+            )
+            for full_name in ("Иванов Иван Иванович", "Петров Петр Петрович")
+        ]
+
+        # Эталонный шаблон направления
+        template_dir = os.path.join(MEDIA_ROOT, 'document_templates', 'etalon')
+        os.makedirs(template_dir, exist_ok=True)
+        self.template_path = os.path.join(template_dir, 'napravlenie_blank.docx')
+        document = Document()
+        document.add_paragraph('{{ full_name }}: {{ harmful_factors }}')
+        document.save(self.template_path)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(MEDIA_ROOT, 'medical_referrals'), ignore_errors=True)
+
+    def saved_files(self):
+        return [
+            name
+            for _, _, files in os.walk(os.path.join(MEDIA_ROOT, 'medical_referrals'))
+            for name in files
+        ]
+
+    def test_creates_referrals_and_files(self):
+        result = create_batch_referrals(self.employees, max_workers=2)
+
+        self.assertEqual(len(result['items']), 2)
+        self.assertEqual(MedicalReferral.objects.count(), 2)
+        self.assertEqual(MedicalReferral.objects.first().harmful_factors.count(), 1)
+        self.assertEqual(len(self.saved_files()), 2)
+        for referral, content in result['items']:
+            self.assertTrue(referral.document.name)
+            self.assertIn(referral.employee.full_name_nominative, Document(referral.document.path).paragraphs[0].text)
+            self.assertTrue(content)
+
+    def test_render_error_creates_nothing(self):
+        with mock.patch(
+            'deadline_control.utils.medical_referrals.render_referral', side_effect=ValueError('bad template')
+        ):
+            with self.assertRaises(ValueError):
+                create_batch_referrals(self.employees)
+
+        self.assertFalse(MedicalReferral.objects.exists())
+        self.assertEqual(self.saved_files(), [])
+
+    def test_rollback_removes_saved_files(self):
+        with mock.patch.object(
+            MedicalReferral.objects, 'bulk_update', side_effect=RuntimeError('db is down')
+        ):
+            with self.assertRaises(RuntimeError):
+                create_batch_referrals(self.employees)
+
+        self.assertFalse(MedicalReferral.objects.exists())
+        self.assertEqual(self.saved_files(), [])
+
+    def test_view_reports_missing_template(self):
+        # Медосмотры просрочены - сотрудники попадают в выборку
+        for exam in EmployeeMedicalExamination.objects.filter(employee__in=self.employees):
+            exam.perform_examination(datetime.date(2000, 1, 1))
+        os.remove(self.template_path)
+        User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+
+        response = self.client.post(reverse('deadline_control:medical:referral_batch'), {
+            'organization_id': self.org.id,
+            'days': 30,
+        })
+
+        self.assertRedirects(response, reverse('deadline_control:medical:list'), fetch_redirect_response=False)
+        self.assertFalse(MedicalReferral.objects.exists())
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertIn('Шаблон направления не найден', messages)
@@ -0,0 +1,298 @@
+import datetime
+import importlib
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django_tasks import ResultStatus
+from django_tasks.backends.database.models import DBTaskResult
+
+from directory.models import Organization, Employee, Position
+from deadline_control.models import (
+    HarmfulFactor, MedicalExaminationNorm, EmployeeMedicalExamination, EmployeeMedicalStatus, EmailSettings
+)
+from deadline_control.utils.medical_status import refresh_medical_status_records
+from deadline_control.views.medical import MedicalExaminationListView
+from directory.utils.medical_examination import import_medical_norms_from_file
+from directory.tasks import schedule_medical_statuses_job, update_medical_statuses_job
+
+
+class MedicalStatusTestMixin:
+    def setUp(self):
+        cache.clear()
+
+        self.org = Organization.objects.create(
+            full_name_ru="Тестовая организация",
+            short_name_ru="ТестОрг",
+            full_name_by="Тэставая арганізацыя",
+            short_name_by="ТэстАрг"
+        )
+        self.other_org = Organization.objects.create(
+            full_name_ru="Другая организация",
+            short_name_ru="ДрОрг",
+            full_name_by="Іншая арганізацыя",
+            short_name_by="ІнАрг"
+        )
+        self.factor = HarmfulFactor.objects.create(short_name="4.2.5", full_name="Шум", periodicity=12)
+        MedicalExaminationNorm.objects.create(position_name="Слесарь", harmful_factor=self.factor)
+
+        self.harmful_position = Position.objects.create(position_name="Слесарь", organization=self.org)
+        self.office_position = Position.objects.create(position_name="Бухгалтер", organization=self.org)
+
+    def create_employee(self, position, **kwargs):
+        return Employee.objects.create(
+            full_name_nominative=kwargs.pop('full_name_nominative', "Иванов Иван Иванович"),
+            date_of_birth=datetime.date(1990, 1, 1),
+            organization=kwargs.pop('organization', self.org),
+            position=position,
+            **kwargs
+        )
+
+    def get_examination(self, employee):
+        # Запись медосмотра создаётся сигналом по факторам должности
+        return EmployeeMedicalExamination.objects.get_or_create(
+            employee=employee, harmful_factor=self.factor
+        )[0]
+
+
+class RefreshMedicalStatusRecordsTests(MedicalStatusTestMixin, TestCase):
+    """Пересчёт денормализованной таблицы EmployeeMedicalStatus"""
+
+    def test_creates_and_updates_record(self):
+        employee = self.create_employee(self.harmful_position)
+        EmployeeMedicalStatus.objects.all().delete()
+
+        self.assertEqual(refresh_medical_status_records([employee.id]), (1, 0))
+        record = EmployeeMedicalStatus.objects.get(employee=employee)
+        self.assertEqual(record.status, 'no_date')
+        self.assertEqual(record.min_periodicity, 12)
+
+        exam = self.get_examination(employee)
+        exam.date_completed = datetime.date(2000, 1, 1)
+        exam.save()
+
+        self.assertEqual(refresh_medical_status_records([employee.id]), (1, 0))
+        record = EmployeeMedicalStatus.objects.get(employee=employee)
+        self.assertEqual(record.status, 'expired')
+        self.assertEqual(record.date_completed, datetime.date(2000, 1, 1))
+        self.assertEqual(record.next_date, datetime.date(2001, 1, 1))
+        self.assertEqual(EmployeeMedicalStatus.objects.count(), 1)
+
+    def test_deletes_records_that_are_no_longer_needed(self):
+        employee = self.create_employee(self.harmful_position)
+        office_employee = self.create_employee(self.office_position, full_name_nominative="Петров Петр Петрович")
+        refresh_medical_status_records([employee.id, office_employee.id])
+        self.assertTrue(EmployeeMedicalStatus.objects.filter(employee=employee).exists())
+        self.assertFalse(EmployeeMedicalStatus.objects.filter(employee=office_employee).exists())
+
+        # Должность больше не требует медосмотров
+        MedicalExaminationNorm.objects.all().delete()
+
+        self.assertEqual(refresh_medical_status_records([employee.id, office_employee.id]), (0, 1))
+        self.assertFalse(EmployeeMedicalStatus.objects.exists())
+
+    def test_ignores_deleted_employees(self):
+        self.assertEqual(refresh_medical_status_records([999999, None]), (0, 0))
+
+    def test_backfill_migration(self):
+        employee = self.create_employee(self.harmful_position)
+        exam = self.get_examination(employee)
+        exam.date_completed = datetime.date(2000, 1, 1)
+        exam.save()
+        self.create_employee(self.office_position, full_name_nominative="Петров Петр Петрович")
+        EmployeeMedicalStatus.objects.all().delete()
+
+        migration = importlib.import_module('deadline_control.migrations.0015_backfill_employee_medical_status')
+        migration.backfill_medical_statuses(apps, None)
+
+        record = EmployeeMedicalStatus.objects.get()
+        self.assertEqual(record.employee_id, employee.id)
+        self.assertEqual(record.status, 'expired')
+        self.assertEqual(record.next_date, datetime.date(2001, 1, 1))
+
+
+
+    def test_norm_import_refreshes_status_once(self):
+        employee = self.create_employee(self.office_position)
+        csv_file = SimpleUploadedFile('norms.csv', "Бухгалтер,4.2.5\n".encode('utf-8'))
+
+        with mock.patch(
+            'deadline_control.utils.medical_status.refresh_medical_status_records',
+            wraps=refresh_medical_status_records
+        ) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = import_medical_norms_from_file(csv_file, skip_first_row=False)
+
+        self.assertEqual(result['imported'], 1)
+        refresh.assert_called_once_with({employee.id})
+        self.assertEqual(EmployeeMedicalStatus.objects.get(employee=employee).status, 'no_date')
+
+class MedicalExaminationListViewTests(MedicalStatusTestMixin, TestCase):
+    """Список медосмотров по денормализованной таблице"""
+
+    def test_list_is_paginated_with_total_counts(self):
+        for number in range(3):
+            employee = self.create_employee(self.harmful_position, full_name_nominative=f"Сотрудник {number}")
+            if number:
+                exam = self.get_examination(employee)
+                exam.date_completed = datetime.date(2000, 1, 1)
+                exam.save()
+        refresh_medical_status_records(Employee.objects.values_list('id', flat=True))
+
+        request = RequestFactory().get('/', {'page': 2})
+        request.user = User.objects.create_superuser(username='admin', password='adminpass123')
+        with mock.patch.object(MedicalExaminationListView, 'paginate_by', 2):
+            context = MedicalExaminationListView.as_view()(request).context_data
+
+        self.assertEqual(context['page_obj'].number, 2)
+        self.assertEqual(len(context['employees_with_medical']), 1)
+        self.assertEqual(context['status_counts'], {'expired': 2, 'no_date': 1})
+
+class MedicalStatusSignalTests(MedicalStatusTestMixin, TestCase):
+    """Пересчёт статусов сигналами после фиксации транзакции"""
+
+    def test_new_employee_gets_record(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = self.create_employee(self.harmful_position)
+
+        self.assertEqual(EmployeeMedicalStatus.objects.get(employee=employee).status, 'no_date')
+
+    def test_examination_change_refreshes_record(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = self.create_employee(self.harmful_position)
+
+        exam = self.get_examination(employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            exam.date_completed = datetime.date.today()
+            exam.save()
+
+        record = EmployeeMedicalStatus.objects.get(employee=employee)
+        self.assertEqual(record.status, 'normal')
+        self.assertEqual(record.date_completed, datetime.date.today())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exam.delete()
+
+        self.assertEqual(EmployeeMedicalStatus.objects.get(employee=employee).status, 'no_date')
+
+    def test_position_change_refreshes_record(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = self.create_employee(self.harmful_position)
+        self.assertTrue(EmployeeMedicalStatus.objects.filter(employee=employee).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.position = self.office_position
+            employee.save()
+
+        self.assertFalse(EmployeeMedicalStatus.objects.filter(employee=employee).exists())
+
+    def test_save_without_position_change_does_not_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = self.create_employee(self.harmful_position)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            employee.full_name_nominative = "Иванов Иван Петрович"
+            employee.save()
+
+        self.assertEqual(callbacks, [])
+
+    def test_old_values_are_cached_before_save(self):
+        employee = self.create_employee(self.harmful_position)
+        other_position = Position.objects.create(position_name="Бухгалтер", organization=self.other_org)
+
+        employee.position = other_position
+        employee.organization = self.other_org
+        employee.save()
+
+        self.assertEqual(employee._old_position_id, self.harmful_position.id)
+        self.assertEqual(employee._old_organization_id, self.org.id)
+
+
+class MedicalNotificationDeliveryTests(MedicalStatusTestMixin, TestCase):
+    """Сохранение результатов рассылки send_medical_notifications"""
+
+    def setUp(self):
+        super().setUp()
+        self.create_employee(self.harmful_position)
+        refresh_medical_status_records(Employee.objects.values_list('id', flat=True))
+
+    def create_email_settings(self, organization, backend):
+        return EmailSettings.objects.create(
+            organization=organization,
+            email_backend=backend,
+            email_host='smtp.example.com',
+            email_host_user='robot@example.com',
+            email_host_password='secret',
+            recipient_emails='safety@example.com',
+        )
+
+    def test_successful_delivery_is_saved(self):
+        email_settings = self.create_email_settings(self.org, 'django.core.mail.backends.locmem.EmailBackend')
+
+        call_command('send_medical_notifications', organization=self.org.id, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        email_settings.refresh_from_db()
+        self.assertTrue(email_settings.last_delivery_success)
+        self.assertIsNotNone(email_settings.last_delivery_at)
+        self.assertEqual(email_settings.last_delivery_error, '')
+
+    def test_failed_delivery_is_saved(self):
+        email_settings = self.create_email_settings(self.org, 'directory.tests.missing.EmailBackend')
+
+        call_command('send_medical_notifications', organization=self.org.id, stdout=StringIO())
+
+        email_settings.refresh_from_db()
+        self.assertIs(email_settings.last_delivery_success, False)
+        self.assertIsNotNone(email_settings.last_delivery_at)
+        self.assertIn('Ошибка подключения', email_settings.last_delivery_error)
+
+    def test_skipped_organization_is_not_touched(self):
+        email_settings = self.create_email_settings(self.other_org, 'django.core.mail.backends.locmem.EmailBackend')
+
+        call_command('send_medical_notifications', organization=self.other_org.id, stdout=StringIO())
+
+        email_settings.refresh_from_db()
+        self.assertIsNone(email_settings.last_delivery_at)
+        self.assertIsNone(email_settings.last_delivery_success)
+
+
+@override_settings(TASKS={'default': {'BACKEND': 'django_tasks.backends.database.DatabaseBackend'}})
+class MedicalStatusesJobTests(TestCase):
+    """Периодическая задача обновления статусов медосмотров"""
+
+    def pending_runs(self):
+        return DBTaskResult.objects.filter(
+            task_path=update_medical_statuses_job.module_path,
+            status=ResultStatus.READY
+        )
+
+    def test_repeat_is_not_scheduled_twice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNotNone(schedule_medical_statuses_job(repeat_hours=6))
+        self.assertIsNone(schedule_medical_statuses_job(repeat_hours=6))
+        self.assertEqual(self.pending_runs().count(), 1)
+
+    def test_job_reschedules_itself(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            update_medical_statuses_job.call(repeat_hours=6)
+
+        run = self.pending_runs().get()
+        self.assertGreater(run.run_after, timezone.now())
+
+    def test_job_reschedules_itself_after_error(self):
+        with mock.patch(
+            'directory.utils.medical_examination.update_medical_examination_statuses',
+            side_effect=RuntimeError('db is down')
+        ):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                update_medical_statuses_job.call(repeat_hours=6)
+
+        self.assertEqual(self.pending_runs().count(), 1)
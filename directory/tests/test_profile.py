@@ -1,7 +1,11 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
-from directory.models import Organization, Employee, Position
+from django.core.cache import cache
+from directory.models import Organization, Employee, Position, StructuralSubdivision, Department
+from directory.utils.permissions import AccessControlHelper
 
 
 class HomePageViewTests(TestCase):
@@ -77,4 +81,170 @@ class HomePageViewTests(TestCase):
 
         response = self.client.post(reverse('directory:home'), form_data)
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'directory/preview.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'directory/preview.html')
+
+
+class AccessScopeCacheTests(TestCase):
+    """Отзыв прав и изменение оргструктуры сбрасывают кешированный AccessScope"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create_user(username='scopeuser', password='testpass123')
+        self.profile = self.user.profile
+
+        self.org = self._create_organization("Первая организация", "Орг1")
+        self.other_org = self._create_organization("Вторая организация", "Орг2")
+        self.subdivision = StructuralSubdivision.objects.create(name="Цех", organization=self.org)
+        self.department = Department.objects.create(
+            name="Участок", organization=self.org, subdivision=self.subdivision
+        )
+
+        self.org_position = Position.objects.create(position_name="Директор", organization=self.org)
+        self.subdivision_position = Position.objects.create(
+            position_name="Мастер", organization=self.org, subdivision=self.subdivision
+        )
+        self.department_position = Position.objects.create(
+            position_name="Слесарь", organization=self.org,
+            subdivision=self.subdivision, department=self.department
+        )
+
+    @staticmethod
+    def _create_organization(full_name, short_name):
+        return Organization.objects.create(
+            full_name_ru=full_name, short_name_ru=short_name,
+            full_name_by=full_name, short_name_by=short_name
+        )
+
+    def _visible_positions(self):
+        # Новый объект пользователя - без request-level кеша
+        user = User.objects.get(pk=self.user.pk)
+        return set(AccessControlHelper.filter_queryset(Position.objects.all(), user))
+
+    def _can_access(self, obj):
+        return AccessControlHelper.can_access_object(User.objects.get(pk=self.user.pk), obj)
+
+    def test_remove_organization_from_profile(self):
+        self.profile.organizations.add(self.org)
+        self.assertIn(self.org_position, self._visible_positions())
+        self.assertTrue(self._can_access(self.org_position))
+
+        self.profile.organizations.remove(self.org)
+
+        self.assertEqual(self._visible_positions(), set())
+        self.assertFalse(self._can_access(self.org_position))
+
+    def test_remove_profile_from_organization_side(self):
+        self.profile.organizations.add(self.org)
+        self.assertTrue(self._can_access(self.org_position))
+
+        self.org.user_profiles.remove(self.profile)
+
+        self.assertEqual(self._visible_positions(), set())
+        self.assertFalse(self._can_access(self.org_position))
+
+    def test_clear_profile_subdivisions(self):
+        self.profile.subdivisions.add(self.subdivision)
+        self.assertTrue(
+            {self.subdivision_position, self.department_position} <= self._visible_positions()
+        )
+        self.assertTrue(self._can_access(self.subdivision_position))
+
+        self.profile.subdivisions.clear()
+
+        self.assertEqual(self._visible_positions(), set())
+        self.assertFalse(self._can_access(self.subdivision_position))
+
+    def test_clear_profiles_from_subdivision_side(self):
+        self.profile.subdivisions.add(self.subdivision)
+        self.assertTrue(self._can_access(self.subdivision_position))
+
+        self.subdivision.user_profiles.clear()
+
+        self.assertEqual(self._visible_positions(), set())
+        self.assertFalse(self._can_access(self.subdivision_position))
+
+    def test_remove_department_from_profile(self):
+        self.profile.departments.add(self.department)
+        self.assertEqual(self._visible_positions(), {self.department_position})
+        self.assertTrue(self._can_access(self.department_position))
+
+        self.profile.departments.remove(self.department)
+
+        self.assertEqual(self._visible_positions(), set())
+        self.assertFalse(self._can_access(self.department_position))
+
+    def test_clear_profiles_from_department_side(self):
+        self.profile.departments.add(self.department)
+        self.assertTrue(self._can_access(self.department_position))
+
+        self.department.user_profiles.clear()
+
+        self.assertEqual(self._visible_positions(), set())
+        self.assertFalse(self._can_access(self.department_position))
+
+    def test_delete_subdivision(self):
+        subdivision = StructuralSubdivision.objects.create(name="Склад", organization=self.org)
+        self.profile.subdivisions.add(subdivision)
+        scope = AccessControlHelper.get_access_scope(User.objects.get(pk=self.user.pk))
+        self.assertIn(subdivision.pk, scope.direct_subdivision_ids)
+
+        # Строки M2M удаляются каскадом, без m2m_changed
+        subdivision_id = subdivision.pk
+        subdivision.delete()
+
+        scope = AccessControlHelper.get_access_scope(User.objects.get(pk=self.user.pk))
+        self.assertNotIn(subdivision_id, scope.direct_subdivision_ids)
+        self.assertNotIn(subdivision_id, scope.subdivision_ids)
+
+        # Подразделение другой организации (ID может быть переиспользован) недоступно
+        foreign_subdivision = StructuralSubdivision.objects.create(name="Чужой цех", organization=self.other_org)
+        foreign_position = Position.objects.create(
+            position_name="Оператор", organization=self.other_org, subdivision=foreign_subdivision
+        )
+        self.assertNotIn(foreign_position, self._visible_positions())
+        self.assertFalse(self._can_access(foreign_position))
+
+    def test_delete_department(self):
+        department = Department.objects.create(
+            name="Лаборатория", organization=self.org, subdivision=self.subdivision
+        )
+        self.profile.departments.add(department)
+        scope = AccessControlHelper.get_access_scope(User.objects.get(pk=self.user.pk))
+        self.assertIn(department.pk, scope.department_ids)
+
+        department_id = department.pk
+        department.delete()
+
+        scope = AccessControlHelper.get_access_scope(User.objects.get(pk=self.user.pk))
+        self.assertNotIn(department_id, scope.direct_department_ids)
+        self.assertNotIn(department_id, scope.department_ids)
+        self.assertEqual(self._visible_positions(), set())
+
+    def test_move_department_to_foreign_subdivision(self):
+        self.profile.subdivisions.add(self.subdivision)
+        self.assertIn(self.department_position, self._visible_positions())
+
+        foreign_subdivision = StructuralSubdivision.objects.create(name="Чужой цех", organization=self.other_org)
+        self.department.organization = self.other_org
+        self.department.subdivision = foreign_subdivision
+        self.department.save()
+
+        scope = AccessControlHelper.get_access_scope(User.objects.get(pk=self.user.pk))
+        self.assertNotIn(self.department.pk, scope.department_ids)
+
+    def test_rename_keeps_access_scopes(self):
+        with mock.patch('directory.signals.invalidate_all_access_scopes') as invalidate_all_access_scopes:
+            self.subdivision.name = "Цех №1"
+            self.subdivision.save()
+            self.department.name = "Участок №1"
+            self.department.save()
+
+        invalidate_all_access_scopes.assert_not_called()
+
+    def test_move_subdivision_invalidates_access_scopes(self):
+        with mock.patch('directory.signals.invalidate_all_access_scopes') as invalidate_all_access_scopes:
+            self.subdivision.organization = self.other_org
+            self.subdivision.save()
+
+        invalidate_all_access_scopes.assert_called_once_with()
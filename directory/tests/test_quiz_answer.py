@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from directory.models import Quiz, QuizCategory, Question, Answer, QuizAttempt, UserAnswer, QuizQuestionOrder
+from directory.utils.quiz_attempt_state import get_attempt_state, _get_state_key
+
+
+@override_settings(ROOT_URLCONF='directory.tests.urls')
+class QuizAnswerTests(TestCase):
+    """Ответы на вопросы через снимок попытки в кеше"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+        self.category = QuizCategory.objects.create(name="Общие вопросы")
+        self.quiz = Quiz.objects.create(
+            title="Экзамен по охране труда",
+            exam_time_limit=30,
+            exam_total_questions=3,
+            questions_per_category=3,
+            allow_skip=True,
+        )
+        self.quiz.categories.add(self.category)
+
+        for number in range(3):
+            question = Question.objects.create(category=self.category, question_text=f"Вопрос {number}")
+            Answer.objects.create(question=question, answer_text="Верно", is_correct=True)
+            Answer.objects.create(question=question, answer_text="Неверно", is_correct=False)
+
+    def start(self, category=None):
+        if category is None:
+            url = reverse('directory:quiz:quiz_start', kwargs={'quiz_id': self.quiz.id})
+        else:
+            url = reverse('directory:quiz:quiz_start_category', kwargs={
+                'quiz_id': self.quiz.id, 'category_id': category.id
+            })
+        self.client.get(url)
+        attempt = QuizAttempt.objects.filter(user=self.user).latest('id')
+        question_ids = list(
+            QuizQuestionOrder.objects.filter(attempt=attempt).order_by('order').values_list('question_id', flat=True)
+        )
+        return attempt, question_ids
+
+    def post_answer(self, attempt, question_id, correct=True):
+        answer = Answer.objects.get(question_id=question_id, is_correct=correct)
+        return self.client.post(
+            reverse('directory:quiz:quiz_answer', kwargs={'attempt_id': attempt.id, 'question_id': question_id}),
+            {'answer_id': answer.id}
+        ).json()
+
+    def post_skip(self, attempt, question_id):
+        return self.client.post(
+            reverse('directory:quiz:quiz_answer', kwargs={'attempt_id': attempt.id, 'question_id': question_id}),
+            {'skip': 'true'}
+        ).json()
+
+    def assertCounters(self, attempt, correct, incorrect, skipped):
+        attempt.refresh_from_db()
+        self.assertEqual(
+            (attempt.correct_answers, attempt.incorrect_answers, attempt.skipped_questions),
+            (correct, incorrect, skipped)
+        )
+
+    def test_answer(self):
+        attempt, question_ids = self.start()
+
+        data = self.post_answer(attempt, question_ids[0])
+        self.assertTrue(data['is_correct'])
+        self.assertEqual(data['correct_answer_id'], Answer.objects.get(question_id=question_ids[0], is_correct=True).id)
+        self.assertEqual(data['next_url'], reverse('directory:quiz:quiz_question', kwargs={
+            'attempt_id': attempt.id, 'question_number': 2
+        }))
+
+        data = self.post_answer(attempt, question_ids[1], correct=False)
+        self.assertFalse(data['is_correct'])
+        self.assertEqual(data['incorrect_answers'], 1)
+
+        self.assertCounters(attempt, correct=1, incorrect=1, skipped=0)
+        self.assertEqual(UserAnswer.objects.filter(attempt=attempt).count(), 2)
+
+    def test_last_answer_finishes_attempt(self):
+        attempt, question_ids = self.start()
+
+        for question_id in question_ids:
+            data = self.post_answer(attempt, question_id)
+
+        self.assertTrue(data['finished'])
+        self.assertEqual(data['next_url'], reverse('directory:quiz:quiz_result', kwargs={'attempt_id': attempt.id}))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, QuizAttempt.STATUS_COMPLETED)
+
+    def test_skip(self):
+        attempt, question_ids = self.start()
+
+        data = self.post_skip(attempt, question_ids[0])
+        self.assertTrue(data['skipped'])
+
+        self.assertCounters(attempt, correct=0, incorrect=0, skipped=1)
+        self.assertTrue(UserAnswer.objects.get(attempt=attempt, question_id=question_ids[0]).is_skipped)
+
+    def test_skip_then_answer(self):
+        attempt, question_ids = self.start()
+
+        self.post_skip(attempt, question_ids[0])
+        data = self.post_answer(attempt, question_ids[0], correct=False)
+        self.assertFalse(data['is_correct'])
+        self.assertCounters(attempt, correct=0, incorrect=1, skipped=0)
+
+        self.post_skip(attempt, question_ids[1])
+        self.post_answer(attempt, question_ids[1])
+        self.assertCounters(attempt, correct=1, incorrect=1, skipped=0)
+
+        user_answer = UserAnswer.objects.get(attempt=attempt, question_id=question_ids[0])
+        self.assertFalse(user_answer.is_skipped)
+        self.assertEqual(UserAnswer.objects.filter(attempt=attempt).count(), 2)
+
+    def test_duplicate_post_returns_already_answered(self):
+        attempt, question_ids = self.start()
+
+        self.post_answer(attempt, question_ids[0])
+        data = self.post_answer(attempt, question_ids[0], correct=False)
+        self.assertTrue(data['already_answered'])
+
+        # Повторный пропуск отвеченного вопроса тоже не засчитывается
+        data = self.post_skip(attempt, question_ids[0])
+        self.assertTrue(data['already_answered'])
+
+        self.assertCounters(attempt, correct=1, incorrect=0, skipped=0)
+        self.assertEqual(UserAnswer.objects.filter(attempt=attempt).count(), 1)
+
+    def test_integrity_error_invalidates_state(self):
+        attempt, question_ids = self.start()
+        self.assertIsNotNone(get_attempt_state(attempt.id, self.user.id))
+
+        # Параллельный запрос уже сохранил ответ, снимок в кеше об этом не знает
+        UserAnswer.objects.create(attempt=attempt, question_id=question_ids[0], is_correct=False)
+
+        data = self.post_answer(attempt, question_ids[0])
+        self.assertTrue(data['already_answered'])
+        self.assertIsNone(cache.get(_get_state_key(attempt.id)))
+        self.assertCounters(attempt, correct=0, incorrect=0, skipped=0)
+
+        # Снимок восстанавливается из БД с учётом сохранённого ответа
+        state = get_attempt_state(attempt.id, self.user.id)
+        self.assertTrue(state.is_answered(0))
+
+    def test_resume_after_cache_miss(self):
+        attempt, question_ids = self.start()
+
+        self.post_answer(attempt, question_ids[0])
+        self.post_skip(attempt, question_ids[1])
+        cache.clear()
+
+        data = self.post_answer(attempt, question_ids[0])
+        self.assertTrue(data['already_answered'])
+
+        data = self.post_answer(attempt, question_ids[2], correct=False)
+        self.assertFalse(data['is_correct'])
+        # Остался пропущенный вопрос
+        self.assertEqual(data['next_url'], reverse('directory:quiz:quiz_question', kwargs={
+            'attempt_id': attempt.id, 'question_number': 2
+        }))
+
+        self.post_answer(attempt, question_ids[1])
+        self.assertCounters(attempt, correct=2, incorrect=1, skipped=0)
+
+    def test_time_limit_finishes_attempt(self):
+        attempt, question_ids = self.start()
+        QuizAttempt.objects.filter(id=attempt.id).update(started_at=attempt.started_at - timedelta(minutes=31))
+        cache.clear()
+
+        data = self.post_answer(attempt, question_ids[0])
+        self.assertTrue(data['finished'])
+        self.assertEqual(data['reason'], 'timeout')
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, QuizAttempt.STATUS_COMPLETED)
+        self.assertEqual(attempt.failure_reason, QuizAttempt.FAILURE_TIMEOUT)
+        self.assertFalse(UserAnswer.objects.filter(attempt=attempt).exists())
+
+        # Завершённая попытка больше не принимает ответы
+        response = self.client.post(
+            reverse('directory:quiz:quiz_answer', kwargs={'attempt_id': attempt.id, 'question_id': question_ids[1]}),
+            {'skip': 'true'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_training_answer(self):
+        attempt, question_ids = self.start(category=self.category)
+
+        data = self.post_answer(attempt, question_ids[0])
+        self.assertTrue(data['is_correct'])
+        self.assertCounters(attempt, correct=1, incorrect=0, skipped=0)
@@ -0,0 +1,217 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from directory.models import (
+    Quiz, QuizCategory, Question, Answer, QuizAttempt, UserAnswer, UserCategoryProgress
+)
+from directory.utils.quiz_progress import compute_answered_counts, get_answered_counts, record_training_answer
+
+
+class TrainingProgressTests(TestCase):
+    """Счётчик «пройдено N из M» по разделам (UserCategoryProgress)"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.category = QuizCategory.objects.create(name="Общие вопросы")
+        self.other_category = QuizCategory.objects.create(name="Электробезопасность")
+        self.quiz = Quiz.objects.create(title="Экзамен по охране труда")
+        self.quiz.categories.add(self.category, self.other_category)
+
+        self.questions = []
+        for number in range(3):
+            question = Question.objects.create(category=self.category, question_text=f"Вопрос {number}")
+            Answer.objects.create(question=question, answer_text="Верно", is_correct=True)
+            Answer.objects.create(question=question, answer_text="Неверно", is_correct=False)
+            self.questions.append(question)
+
+        self.pair = (self.quiz.id, self.category.id)
+
+    def create_training(self, status=QuizAttempt.STATUS_IN_PROGRESS):
+        return QuizAttempt.objects.create(
+            quiz=self.quiz,
+            user=self.user,
+            category=self.category,
+            total_questions=len(self.questions),
+            status=status,
+        )
+
+    def answer(self, attempt, question, is_skipped=False):
+        """Ответ так же, как в quiz_answer: UserAnswer, затем счётчик прогресса"""
+        user_answer = UserAnswer.objects.create(
+            attempt=attempt,
+            question=question,
+            selected_answer=None if is_skipped else question.answers.get(is_correct=True),
+            is_correct=not is_skipped,
+            is_skipped=is_skipped
+        )
+        if not is_skipped:
+            record_training_answer(self.user.id, self.quiz.id, self.category.id, question.id, attempt.id)
+        return user_answer
+
+    def get_progress(self):
+        return UserCategoryProgress.objects.get(user=self.user, quiz=self.quiz, category=self.category)
+
+    def assertProgress(self, answered_count):
+        self.assertEqual(get_answered_counts(self.user, [self.pair])[self.pair], answered_count)
+        self.assertEqual(compute_answered_counts(self.user, [self.pair])[self.pair], answered_count)
+
+    # --- Счётчик ---
+
+    def test_missing_record_is_computed_and_saved(self):
+        attempt = self.create_training()
+        self.answer(attempt, self.questions[0])
+
+        self.assertProgress(1)
+        progress = self.get_progress()
+        self.assertEqual(progress.answered_count, 1)
+        self.assertFalse(progress.is_stale)
+
+    def test_answer_increments_counter(self):
+        get_answered_counts(self.user, [self.pair])
+        attempt = self.create_training()
+
+        self.answer(attempt, self.questions[0])
+        self.answer(attempt, self.questions[1], is_skipped=True)
+
+        self.assertEqual(self.get_progress().answered_count, 1)
+        self.assertProgress(1)
+
+    def test_repeat_answer_in_another_training_is_not_counted(self):
+        get_answered_counts(self.user, [self.pair])
+        first = self.create_training(status=QuizAttempt.STATUS_COMPLETED)
+        self.answer(first, self.questions[0])
+
+        second = self.create_training()
+        self.answer(second, self.questions[0])
+        self.assertEqual(self.get_progress().answered_count, 1)
+
+        self.answer(second, self.questions[1])
+        self.assertEqual(self.get_progress().answered_count, 2)
+        self.assertProgress(2)
+
+    def test_stale_record_is_not_incremented(self):
+        get_answered_counts(self.user, [self.pair])
+        UserCategoryProgress.objects.update(is_stale=True)
+
+        attempt = self.create_training()
+        self.answer(attempt, self.questions[0])
+
+        progress = self.get_progress()
+        self.assertTrue(progress.is_stale)
+        self.assertEqual(progress.answered_count, 0)
+        self.assertProgress(1)
+
+    def test_recompute_keeps_fresh_records(self):
+        UserCategoryProgress.objects.create(
+            user=self.user, quiz=self.quiz, category=self.other_category, answered_count=5
+        )
+        other_pair = (self.quiz.id, self.other_category.id)
+
+        counts = get_answered_counts(self.user, [self.pair, other_pair])
+
+        self.assertEqual(counts, {self.pair: 0, other_pair: 5})
+
+    # --- Пометка устаревшими ---
+
+    def answered_progress(self):
+        attempt = self.create_training()
+        self.answer(attempt, self.questions[0])
+        self.answer(attempt, self.questions[1])
+        self.assertProgress(2)
+        return attempt
+
+    def test_question_delete_marks_stale(self):
+        self.answered_progress()
+
+        self.questions[0].delete()
+
+        self.assertTrue(self.get_progress().is_stale)
+        self.assertProgress(1)
+
+    def test_question_move_marks_stale(self):
+        self.answered_progress()
+
+        question = Question.objects.get(pk=self.questions[0].pk)
+        question.category = self.other_category
+        question.save()
+
+        self.assertTrue(self.get_progress().is_stale)
+        self.assertProgress(1)
+
+    def test_question_edit_keeps_record(self):
+        self.answered_progress()
+
+        question = Question.objects.get(pk=self.questions[0].pk)
+        question.question_text = "Вопрос 0 (исправлен)"
+        question.save()
+
+        self.assertFalse(self.get_progress().is_stale)
+
+    def test_attempt_delete_marks_stale(self):
+        attempt = self.answered_progress()
+
+        attempt.delete()
+
+        self.assertTrue(self.get_progress().is_stale)
+        self.assertProgress(0)
+
+    def test_attempt_abandon_marks_stale(self):
+        attempt = self.answered_progress()
+
+        attempt.status = QuizAttempt.STATUS_ABANDONED
+        attempt.save()
+
+        self.assertTrue(self.get_progress().is_stale)
+        self.assertProgress(0)
+
+    def test_attempt_complete_keeps_record(self):
+        attempt = self.answered_progress()
+
+        attempt.status = QuizAttempt.STATUS_COMPLETED
+        attempt.save()
+
+        self.assertFalse(self.get_progress().is_stale)
+        self.assertProgress(2)
+
+    def test_user_answer_delete_marks_stale(self):
+        attempt = self.answered_progress()
+
+        UserAnswer.objects.get(attempt=attempt, question=self.questions[0]).delete()
+
+        self.assertTrue(self.get_progress().is_stale)
+        self.assertProgress(1)
+
+    # --- Каскадное удаление ---
+
+    def test_attempt_delete_skips_per_answer_receiver(self):
+        attempt = self.answered_progress()
+
+        with mock.patch('directory.signals.mark_progress_stale') as mark_progress_stale:
+            attempt.delete()
+
+        # Один вызов от сигнала попытки, ответы при каскаде не обрабатываются
+        mark_progress_stale.assert_called_once_with(
+            user_id=self.user.id, quiz_id=self.quiz.id, category_id=self.category.id
+        )
+
+    def test_question_delete_skips_per_answer_receivers(self):
+        self.answered_progress()
+
+        with mock.patch('directory.signals.mark_progress_stale') as mark_progress_stale, \
+                mock.patch('directory.signals.invalidate_question_bank') as invalidate_question_bank:
+            self.questions[0].delete()
+
+        # Один вызов на вопрос; варианты ответа и ответы пользователя удалены каскадом
+        mark_progress_stale.assert_called_once_with(category_id=self.category.id)
+        invalidate_question_bank.assert_called_once_with(self.category.id, None)
+
+    def test_answer_option_delete_invalidates_question_bank(self):
+        with mock.patch('directory.signals.invalidate_question_bank') as invalidate_question_bank:
+            self.questions[0].answers.filter(is_correct=False).delete()
+
+        invalidate_question_bank.assert_called_once_with(self.category.id)
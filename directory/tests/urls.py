@@ -0,0 +1,20 @@
+# directory/tests/urls.py
+"""
+URL-конфигурация для тестов представлений (подключается через ROOT_URLCONF)
+"""
+from django.urls import path, include
+
+from directory.views import quiz_views
+
+quiz_patterns = [
+    path('<int:quiz_id>/start/', quiz_views.quiz_start, name='quiz_start'),
+    path('<int:quiz_id>/start/category/<int:category_id>/', quiz_views.quiz_start, name='quiz_start_category'),
+    path('<int:attempt_id>/question/<int:question_number>/', quiz_views.quiz_question, name='quiz_question'),
+    path('<int:attempt_id>/answer/<int:question_id>/', quiz_views.quiz_answer, name='quiz_answer'),
+    path('<int:attempt_id>/result/', quiz_views.quiz_result, name='quiz_result'),
+]
+
+urlpatterns = [
+    path('directory/', include(([path('quiz/', include((quiz_patterns, 'quiz')))], 'directory'))),
+    path('deadline-control/', include('deadline_control.urls')),
+]
@@ -142,6 +142,8 @@ siz_patterns = [
     # Карточки СИЗ (массовая генерация)
     path('mass-generation/', siz.SIZMassGenerationView.as_view(), name='mass_generation'),
     path('mass-generation/generate/', siz.generate_siz_cards_bulk, name='mass_generation_generate'),
+    path('mass-generation/jobs/<str:job_id>/', siz.siz_cards_job_status, name='mass_generation_status'),
+    path('mass-generation/jobs/<str:job_id>/download/', siz.siz_cards_job_download, name='mass_generation_download'),
 ]
 
 # 📑 Приемы на работу
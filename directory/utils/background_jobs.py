@@ -0,0 +1,125 @@
+# directory/utils/background_jobs.py
+"""
+⏳ Состояние фоновых задач генерации документов
+
+Фоновые задачи (django-tasks, см. directory/tasks.py) публикуют свой прогресс
+в Django cache, а веб-процесс отдаёт его при опросе статуса из браузера.
+Готовые архивы пишутся во временную папку на диске (BULK_EXPORT_DIR),
+общую для веб-процесса и воркера, и отдаются по ссылке на скачивание.
+
+Структура состояния задачи:
+    {
+        'id', 'kind', 'user_id', 'status',
+        'total', 'processed', 'current', 'generated_count', 'errors',
+        'file_path', 'filename', 'created_at', 'finished_at',
+    }
+"""
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+JOB_CACHE_PREFIX = 'background_job'
+JOB_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Готовые файлы старше этого срока удаляются при запуске следующей задачи
+EXPORT_FILE_MAX_AGE = 60 * 60 * 24
+
+JOB_STATUS_PENDING = 'pending'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_DONE = 'done'
+JOB_STATUS_FAILED = 'failed'
+
+# Поля, которые не отдаются в браузер
+PRIVATE_JOB_FIELDS = ('file_path', 'user_id')
+
+
+def _get_job_key(job_id):
+    return f'{JOB_CACHE_PREFIX}:{job_id}'
+
+
+def create_job(kind, user_id, total=0):
+    """
+    Регистрирует новую фоновую задачу и возвращает её состояние.
+    """
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'user_id': user_id,
+        'status': JOB_STATUS_PENDING,
+        'total': total,
+        'processed': 0,
+        'current': '',
+        'generated_count': 0,
+        'errors': [],
+        'file_path': None,
+        'filename': None,
+        'created_at': timezone.now().isoformat(),
+        'finished_at': None,
+    }
+    cache.set(_get_job_key(job['id']), job, JOB_CACHE_TIMEOUT)
+    return job
+
+
+def get_job(job_id):
+    """Возвращает состояние задачи или None, если задача не найдена/устарела"""
+    return cache.get(_get_job_key(job_id))
+
+
+def update_job(job_id, **changes):
+    """
+    Обновляет состояние задачи. Пишет только воркер, выполняющий задачу,
+    поэтому простого get/set достаточно.
+    """
+    job = get_job(job_id)
+    if job is None:
+        logger.warning(f"Состояние фоновой задачи {job_id} не найдено в кеше")
+        return None
+    job.update(changes)
+    if changes.get('status') in (JOB_STATUS_DONE, JOB_STATUS_FAILED):
+        job['finished_at'] = timezone.now().isoformat()
+    cache.set(_get_job_key(job_id), job, JOB_CACHE_TIMEOUT)
+    return job
+
+
+def get_public_job_state(job):
+    """Состояние задачи для отдачи в JSON (без путей на диске)"""
+    return {key: value for key, value in job.items() if key not in PRIVATE_JOB_FIELDS}
+
+
+def get_export_dir():
+    """
+    Папка для готовых архивов. Должна быть общей для веб-процесса и воркера.
+    """
+    export_dir = getattr(
+        settings,
+        'BULK_EXPORT_DIR',
+        os.path.join(tempfile.gettempdir(), 'ot_online_exports'),
+    )
+    os.makedirs(export_dir, exist_ok=True)
+    return str(export_dir)
+
+
+def cleanup_export_dir(max_age=EXPORT_FILE_MAX_AGE):
+    """Удаляет устаревшие файлы из папки экспорта"""
+    export_dir = get_export_dir()
+    threshold = time.time() - max_age
+    removed = 0
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < threshold:
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"Не удалось удалить устаревший файл экспорта {path}: {e}")
+    if removed:
+        logger.info(f"Удалено устаревших файлов экспорта: {removed}")
+    return removed
@@ -1,8 +1,58 @@
-import pymorphy3
+import hashlib
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.core.cache import cache
+
+# 🧠 Анализатор морфологии создаётся лениво при первом использовании:
+# загрузка словарей pymorphy3 занимает заметное время и память, а модуль импортируется
+# многими views и management-командами, которым склонение не нужно.
+# Для gunicorn с --preload анализатор можно загрузить заранее в мастер-процессе
+# (см. preload_morph_analyzer и wsgi.py), тогда воркеры разделяют его через copy-on-write.
+_morph = None
+_morph_lock = threading.Lock()
+
+
+def get_morph():
+    """Возвращает общий экземпляр pymorphy3.MorphAnalyzer, создавая его при первом вызове"""
+    global _morph
+    if _morph is None:
+        with _morph_lock:
+            if _morph is None:
+                import pymorphy3
+                _morph = pymorphy3.MorphAnalyzer()
+    return _morph
+
+
+@lru_cache(maxsize=16384)
+def parse_word(word: str) -> tuple:
+    """
+    Разбор слова анализатором с мемоизацией: каждый уникальный токен разбирается один раз
+    и результат переиспользуется для всех падежей и всех фраз, где он встречается.
+    """
+    return tuple(get_morph().parse(word))
+
+
+def preload_morph_analyzer():
+    """Загружает анализатор заранее (для мастер-процесса gunicorn с --preload)"""
+    return get_morph()
 
-# Создаем анализатор морфологии один раз при импорте модуля
-morph = pymorphy3.MorphAnalyzer()
+
+def is_morph_analyzer_loaded() -> bool:
+    return _morph is not None
+
+# 💾 Кеш склонений:
+#   1) in-process LRU (без обращений к кешу и анализатору для частых фраз)
+#   2) персистентный уровень в Django cache (общий для всех воркеров, переживает рестарт)
+# Кеш заполняется при генерации документов (пакетно, см. decline_many): сохранение
+# справочников не загружает анализатор.
+# При изменении алгоритмов склонения увеличьте DECLENSION_CACHE_VERSION.
+DECLENSION_CACHE_PREFIX = 'declension'
+DECLENSION_CACHE_VERSION = 1
+DECLENSION_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+DECLENSION_LRU_SIZE = 8192
 
 CASE_CODES = {
     'nomn': 'именительный',  # Кто? Что? (работает Иванов)
@@ -48,7 +98,7 @@ def decline_word_to_case(word: str, target_case: str, gender: str = None) -> str
     Если gender=None (для фраз), pymorphy2 подбирает форму без учёта пола.
     Если gender='masc'/'femn' (для ФИО), то учитываем род.
     """
-    parse_results = morph.parse(word)
+    parse_results = parse_word(word)
     if not parse_results:
         return word
 
@@ -118,7 +168,7 @@ def pick_parse_in_nomn(word: str):
     Нужен для того, чтобы мы точно взяли форму 'клиническое' (ADJF, nomn, neut, sing)
     вместо какой-нибудь другой, если pymorphy2 распознает несколько вариантов.
     """
-    parses = morph.parse(word)
+    parses = parse_word(word)
     if not parses:
         return None
     best_nomn = None
@@ -138,7 +188,7 @@ def is_word_in_nominative(word: str) -> bool:
     Возвращает True только если наиболее вероятный разбор - именительный падеж
     единственного числа.
     """
-    parses = morph.parse(word)
+    parses = parse_word(word)
     if not parses:
         return False
 
@@ -155,7 +205,85 @@ def is_word_in_nominative(word: str) -> bool:
     return False
 
 
+def _get_declension_cache_key(kind: str, text: str, target_case: str, gender: str = None) -> str:
+    """
+    Ключ персистентного кеша. Текст хешируется, чтобы ключ был допустим для memcached/redis.
+    """
+    digest = hashlib.md5(text.encode('utf-8')).hexdigest()
+    return f'{DECLENSION_CACHE_PREFIX}:{DECLENSION_CACHE_VERSION}:{kind}:{target_case}:{gender or "-"}:{digest}'
+
+
+class _DeclensionLRU:
+    """Потокобезопасный in-process LRU для готовых склонений"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_declension_lru = _DeclensionLRU(DECLENSION_LRU_SIZE)
+
+
+def _compute_declension(kind: str, text: str, target_case: str, gender: str = None) -> str:
+    if kind == 'fio':
+        return _decline_full_name_uncached(text, target_case, gender)
+    return _decline_phrase_uncached(text, target_case)
+
+
+def _get_cached_declension(kind: str, text: str, target_case: str, gender: str = None) -> str:
+    """
+    Возвращает склонение из кеша (LRU → Django cache), при промахе вычисляет и сохраняет его.
+    """
+    lru_key = (kind, text, target_case, gender)
+    declined = _declension_lru.get(lru_key)
+    if declined is not None:
+        return declined
+
+    cache_key = _get_declension_cache_key(kind, text, target_case, gender)
+    declined = cache.get(cache_key)
+    if declined is None:
+        declined = _compute_declension(kind, text, target_case, gender)
+        cache.set(cache_key, declined, DECLENSION_CACHE_TIMEOUT)
+    _declension_lru.set(lru_key, declined)
+    return declined
+
+
+def clear_declension_cache():
+    """Очищает in-process кеши склонений (персистентный уровень сбрасывается сменой версии)"""
+    _declension_lru.clear()
+    parse_word.cache_clear()
+
+
 def decline_phrase(phrase: str, target_case: str) -> str:
+    """
+    Склоняет фразу (должность, словосочетание) в заданный падеж с использованием кеша.
+    См. _decline_phrase_uncached.
+    """
+    if target_case == 'nomn' or not phrase:
+        return phrase
+    return _get_cached_declension('phrase', phrase, target_case)
+
+
+def _decline_phrase_uncached(phrase: str, target_case: str) -> str:
     """
     Склоняет фразу (должность, словосочетание типа "Клиническое отделение", и т.д.)
     в заданный падеж.
@@ -170,7 +298,7 @@ def decline_phrase(phrase: str, target_case: str) -> str:
     declined_parts = []
 
     for part in parts:
-        parses = morph.parse(part)
+        parses = parse_word(part)
         if not parses:
             declined_parts.append(part)
             continue
@@ -208,13 +336,19 @@ def decline_phrase(phrase: str, target_case: str) -> str:
 
 def decline_full_name(full_name: str, target_case: str) -> str:
     """
-    Склоняет ФИО с учётом пола.
-    Каждое из слов (Фамилия, Имя, Отчество) будет иметь первую букву заглавную.
+    Склоняет ФИО с учётом пола с использованием кеша.
+    См. _decline_full_name_uncached.
     """
-    if target_case == 'nomn':
+    if target_case == 'nomn' or not full_name:
         return full_name
+    return _get_cached_declension('fio', full_name, target_case, get_gender_from_name(full_name))
+
 
-    gender = get_gender_from_name(full_name)
+def _decline_full_name_uncached(full_name: str, target_case: str, gender: str) -> str:
+    """
+    Склоняет ФИО с учётом пола.
+    Каждое из слов (Фамилия, Имя, Отчество) будет иметь первую букву заглавную.
+    """
     parts = full_name.split()
     declined_parts = []
 
@@ -237,7 +371,7 @@ def decline_surname(surname: str, target_case: str, gender: str) -> str:
     Склоняет фамилию с учётом её типа и пола.
     Обрабатывает редкие фамилии, которые pymorphy3 не распознаёт.
     """
-    parse_results = morph.parse(surname)
+    parse_results = parse_word(surname)
     if not parse_results:
         return surname
 
@@ -313,6 +447,65 @@ def decline_surname(surname: str, target_case: str, gender: str) -> str:
     return decline_word_to_case(surname, target_case, gender)
 
 
+def decline_many(items) -> list:
+    """
+    Пакетное склонение.
+
+    Принимает список запросов (text, case, is_full_name) и возвращает список результатов
+    в том же порядке. Повторяющиеся запросы вычисляются один раз, готовые формы
+    берутся из LRU и одним запросом get_many из Django cache, а для оставшихся
+    каждый уникальный токен разбирается анализатором один раз (parse_word)
+    и переиспользуется для всех падежей.
+
+    Пример:
+        fio_gent, position_datv = decline_many([
+            ('Иванов Иван Иванович', 'gent', True),
+            ('Главный инженер', 'datv', False),
+        ])
+    """
+    items = list(items)
+    requests = []
+    for text, target_case, is_full_name in items:
+        if target_case == 'nomn' or not text:
+            requests.append(None)
+            continue
+        if is_full_name:
+            requests.append(('fio', text, target_case, get_gender_from_name(text)))
+        else:
+            requests.append(('phrase', text, target_case, None))
+
+    unique = set(request for request in requests if request is not None)
+    resolved = {}
+    for request in unique:
+        declined = _declension_lru.get(request)
+        if declined is not None:
+            resolved[request] = declined
+
+    missing = {
+        _get_declension_cache_key(*request): request
+        for request in unique if request not in resolved
+    }
+    if missing:
+        for cache_key, declined in cache.get_many(list(missing)).items():
+            request = missing.pop(cache_key)
+            resolved[request] = declined
+            _declension_lru.set(request, declined)
+
+    if missing:
+        computed = {}
+        for cache_key, request in missing.items():
+            declined = _compute_declension(*request)
+            resolved[request] = declined
+            computed[cache_key] = declined
+            _declension_lru.set(request, declined)
+        cache.set_many(computed, DECLENSION_CACHE_TIMEOUT)
+
+    return [
+        resolved[request] if request is not None else text
+        for request, (text, _, _) in zip(requests, items)
+    ]
+
+
 def get_all_cases(text: str, is_full_name: bool = False) -> dict:
     """
     Возвращает все падежные формы (nomn, gent, datv, accs, ablt, loct)
@@ -321,13 +514,8 @@ def get_all_cases(text: str, is_full_name: bool = False) -> dict:
     Если is_full_name=True, будет использоваться decline_full_name (учёт пола, заглавные буквы).
     Если is_full_name=False, будет использоваться decline_phrase (общая фраза).
     """
-    result = {}
-    for case_code in CASE_CODES:
-        if is_full_name:
-            result[case_code] = decline_full_name(text, case_code)
-        else:
-            result[case_code] = decline_phrase(text, case_code)
-    return result
+    forms = decline_many([(text, case_code, is_full_name) for case_code in CASE_CODES])
+    return dict(zip(CASE_CODES, forms))
 
 
 def get_initials_from_name(full_name: str) -> str:
@@ -2,12 +2,16 @@ import os
 import csv
 import json
 import datetime
+import itertools
+import tempfile
+import textwrap
+from collections import defaultdict
 import openpyxl
-from io import BytesIO
+from openpyxl.utils import get_column_letter
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, Q
 
 from deadline_control.models.medical_examination import MedicalExaminationType, HarmfulFactor, MedicalSettings
 from deadline_control.models.medical_norm import (
@@ -15,6 +19,8 @@ from deadline_control.models.medical_norm import (
     PositionMedicalFactor,
     EmployeeMedicalExamination
 )
+from deadline_control.utils.medical_sync import sync_medical_examinations
+from deadline_control.utils.position_factors import invalidate_position_factors
 from directory.models.position import Position
 from directory.models.employee import Employee
 
@@ -27,58 +33,94 @@ def update_medical_examination_statuses():
     1. Для медосмотров, до окончания которых осталось меньше заданного периода - "Нужно выдать направление"
     2. Для просроченных медосмотров - "Просрочен"
 
-    Обрабатывает каждую организацию отдельно с учетом её настроек.
+    Период выдачи направления берётся из настроек каждой организации.
+    Число запросов не зависит от числа организаций: организации группируются
+    по значению days_before_issue (обычно одно-два значения), для каждой группы
+    выполняется один подсчёт по организациям и один UPDATE.
+    Выполняется как команда update_medical_statuses или фоновая задача
+    directory.tasks.update_medical_statuses_job.
 
     Returns:
-        dict: Информация о количестве обновленных записей
+        dict: Информация о количестве обновленных записей (всего и по организациям)
     """
     from directory.models import Organization
     today = timezone.now().date()
 
-    to_issue_count = 0
-    expired_count = 0
+    # Настройки всех организаций (недостающие создаются со значениями по умолчанию)
+    days_by_org = dict(
+        MedicalSettings.objects.filter(organization__isnull=False).values_list('organization_id', 'days_before_issue')
+    )
+    missing_org_ids = list(
+        Organization.objects.exclude(id__in=list(days_by_org)).values_list('id', flat=True)
+    )
+    if missing_org_ids:
+        MedicalSettings.objects.bulk_create(
+            [MedicalSettings(organization_id=org_id) for org_id in missing_org_ids],
+            ignore_conflicts=True,
+        )
+        default_days = MedicalSettings._meta.get_field('days_before_issue').default
+        days_by_org.update({org_id: default_days for org_id in missing_org_ids})
 
-    # Обрабатываем каждую организацию отдельно
-    for organization in Organization.objects.all():
-        settings = MedicalSettings.get_settings(organization)
-        if not settings:
-            continue
+    org_ids_by_days = defaultdict(list)
+    for org_id, days_before_issue in days_by_org.items():
+        org_ids_by_days[days_before_issue].append(org_id)
 
-        # Определяем даты для изменения статусов
-        issue_date = today + datetime.timedelta(days=settings.days_before_issue)
+    by_organization = defaultdict(lambda: {'to_issue': 0, 'expired': 0})
 
-        # Находим все медосмотры со статусом "Пройден", у которых срок подходит к концу
-        to_issue_exams = EmployeeMedicalExamination.objects.filter(
-            employee__organization=organization,
-            next_date__lte=issue_date,
-            next_date__gt=today,
-            status='completed'
-        )
+    def count_by_organization(queryset, key):
+        for row in queryset.order_by().values('employee__organization_id').annotate(count=Count('pk')):
+            by_organization[row['employee__organization_id']][key] = row['count']
 
-        # Меняем статус на "Нужно выдать направление"
-        to_issue_count += to_issue_exams.update(status='to_issue')
+    to_issue_count = 0
+    expired_count = 0
 
-        # Находим все просроченные медосмотры
+    with transaction.atomic():
+        # "Пройден" → "Нужно выдать направление": одна группа на значение days_before_issue
+        for days_before_issue, org_ids in org_ids_by_days.items():
+            issue_date = today + datetime.timedelta(days=days_before_issue)
+            to_issue_exams = EmployeeMedicalExamination.objects.filter(
+                employee__organization_id__in=org_ids,
+                next_date__lte=issue_date,
+                next_date__gt=today,
+                status='completed'
+            )
+            count_by_organization(to_issue_exams, 'to_issue')
+            to_issue_count += to_issue_exams.update(status='to_issue')
+
+        # "Пройден" / "Нужно выдать направление" → "Просрочен": от настроек не зависит
         expired_exams = EmployeeMedicalExamination.objects.filter(
-            employee__organization=organization,
+            employee__organization_id__in=list(days_by_org),
             next_date__lt=today,
             status__in=['completed', 'to_issue']
         )
-
-        # Меняем статус на "Просрочен"
+        count_by_organization(expired_exams, 'expired')
         expired_count += expired_exams.update(status='expired')
 
     return {
         'to_issue_updated': to_issue_count,
         'expired_updated': expired_count,
+        'by_organization': dict(by_organization),
         'timestamp': timezone.now()
     }
 
 
+def _cell_to_str(value):
+    """Значение ячейки в строку (в xlsx коды и названия могут прийти числами)"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
 def import_medical_norms_from_file(file, skip_first_row=True, update_existing=False):
     """
     Импорт норм медосмотров из файла
 
+    Файл читается целиком, коды вредных факторов и существующие нормы загружаются
+    одним запросом каждый, изменения сравниваются в памяти и применяются
+    через bulk_create/bulk_update в одной транзакции.
+
     Args:
         file: Загруженный файл (xlsx или csv)
         skip_first_row: Пропустить первую строку (заголовки)
@@ -101,67 +143,106 @@ def import_medical_norms_from_file(file, skip_first_row=True, update_existing=Fa
         else:
             return {'success': False, 'message': 'Неподдерживаемый формат файла'}
 
-        with transaction.atomic():
-            for row_idx, row in enumerate(data):
-                total_rows += 1
+        # 1. Разбор строк (без запросов к БД)
+        parsed_rows = []
+        for row_idx, row in enumerate(data):
+            total_rows += 1
+            line = row_idx + 1 + (1 if skip_first_row else 0)
+
+            try:
+                # Ожидаемые столбцы: название_должности, код_фактора, переопределение_периодичности, примечания
+                if len(row) < 2:
+                    errors.append((line, f"Строка {line}: Недостаточно данных"))
+                    continue
 
-                try:
-                    # Ожидаемые столбцы: название_должности, код_фактора, переопределение_периодичности, примечания
-                    if len(row) < 2:
-                        errors.append(f"Строка {row_idx + 1 + (1 if skip_first_row else 0)}: Недостаточно данных")
+                position_name = _cell_to_str(row[0])
+                factor_code = _cell_to_str(row[1])
+
+                periodicity_override = None
+                if len(row) > 2 and row[2]:
+                    try:
+                        periodicity_override = int(row[2])
+                        if periodicity_override <= 0:
+                            raise ValueError("Периодичность должна быть положительным числом")
+                    except ValueError:
+                        errors.append((line, f"Строка {line}: Некорректное значение периодичности: {row[2]}"))
                         continue
 
-                    position_name = row[0].strip()
-                    factor_code = row[1].strip()
+                notes = (row[3] or "") if len(row) > 3 else ""
 
-                    periodicity_override = None
-                    if len(row) > 2 and row[2]:
-                        try:
-                            periodicity_override = int(row[2])
-                            if periodicity_override <= 0:
-                                raise ValueError("Периодичность должна быть положительным числом")
-                        except ValueError:
-                            errors.append(f"Строка {row_idx + 1 + (1 if skip_first_row else 0)}: "
-                                          f"Некорректное значение периодичности: {row[2]}")
-                            continue
+                parsed_rows.append((line, position_name, factor_code, periodicity_override, notes))
 
-                    notes = row[3] if len(row) > 3 else ""
+            except Exception as e:
+                errors.append((line, f"Строка {line}: {str(e)}"))
 
-                    # Проверяем существование вредного фактора
-                    try:
-                        harmful_factor = HarmfulFactor.objects.get(short_name=factor_code)
-                    except HarmfulFactor.DoesNotExist:
-                        errors.append(f"Строка {row_idx + 1 + (1 if skip_first_row else 0)}: "
-                                      f"Вредный фактор с кодом '{factor_code}' не найден")
-                        continue
+        # 2. Все вредные факторы из файла - одним запросом
+        # (short_name уникален: unique_together в HarmfulFactor.Meta)
+        factors_by_code = {
+            factor.short_name: factor
+            for factor in HarmfulFactor.objects.filter(short_name__in={row[2] for row in parsed_rows})
+        }
 
-                    # Проверяем существование нормы
-                    norm, created = MedicalExaminationNorm.objects.get_or_create(
+        with transaction.atomic():
+            # 3. Существующие нормы для должностей из файла - одним запросом
+            norms_by_key = {
+                (norm.position_name, norm.harmful_factor_id): norm
+                for norm in MedicalExaminationNorm.objects.filter(
+                    position_name__in={row[1] for row in parsed_rows}
+                )
+            }
+
+            to_create = {}
+            to_update = {}
+            for line, position_name, factor_code, periodicity_override, notes in parsed_rows:
+                harmful_factor = factors_by_code.get(factor_code)
+                if harmful_factor is None:
+                    errors.append((line, f"Строка {line}: Вредный фактор с кодом '{factor_code}' не найден"))
+                    continue
+
+                key = (position_name, harmful_factor.id)
+                norm = norms_by_key.get(key)
+
+                if norm is None:
+                    norm = MedicalExaminationNorm(
                         position_name=position_name,
                         harmful_factor=harmful_factor,
-                        defaults={
-                            'periodicity_override': periodicity_override,
-                            'notes': notes
-                        }
+                        periodicity_override=periodicity_override,
+                        notes=notes,
                     )
-
-                    if created:
-                        imported += 1
-                    elif update_existing:
-                        norm.periodicity_override = periodicity_override
-                        norm.notes = notes
-                        norm.save()
-                        updated += 1
-
-                except Exception as e:
-                    errors.append(f"Строка {row_idx + 1 + (1 if skip_first_row else 0)}: {str(e)}")
+                    norms_by_key[key] = to_create[key] = norm
+                    imported += 1
+                elif update_existing:
+                    norm.periodicity_override = periodicity_override
+                    norm.notes = notes
+                    if key not in to_create:
+                        to_update[key] = norm
+                    updated += 1
+
+            # 4. Применяем изменения пакетно
+            if to_create:
+                MedicalExaminationNorm.objects.bulk_create(to_create.values(), batch_size=1000)
+            if to_update:
+                MedicalExaminationNorm.objects.bulk_update(
+                    to_update.values(), ['periodicity_override', 'notes'], batch_size=1000
+                )
+
+            # bulk-операции не вызывают сигналы - сбрасываем кеш факторов должностей
+            # и создаём недостающие записи медосмотров сотрудникам затронутых должностей
+            # (пересчёт статусов изменённых сотрудников планирует sync_medical_examinations)
+            changed_position_names = {key[0] for key in to_create} | {key[0] for key in to_update}
+            if changed_position_names:
+                invalidate_position_factors()
+                employees = list(Employee.objects.filter(
+                    position__position_name__in=changed_position_names
+                ).only('id', 'position_id', 'organization_id'))
+                sync_medical_examinations(employees)
 
         return {
             'success': True,
             'total_rows': total_rows,
             'imported': imported,
             'updated': updated,
-            'errors': errors,
+            'errors': [message for line, message in sorted(errors, key=lambda error: error[0])],
         }
 
     except Exception as e:
@@ -198,10 +279,49 @@ def import_from_csv(file, skip_first_row):
     return data
 
 
+# Колонки экспорта норм медосмотров
+NORM_EXPORT_HEADERS = [
+    'Наименование должности',
+    'Код вредного фактора',
+    'Наименование вредного фактора',
+    'Периодичность (мес.)',
+    'Переопределение периодичности',
+    'Примечания'
+]
+
+NORM_EXPORT_FIELDS = [
+    'position_name',
+    'harmful_factor__short_name',
+    'harmful_factor__full_name',
+    'harmful_factor__periodicity',
+    'periodicity_override',
+    'notes',
+]
+
+# Сколько первых строк учитывается при подборе ширины столбцов Excel
+EXPORT_WIDTH_SAMPLE_ROWS = 500
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_medical_norm_rows():
+    """
+    Строки норм для экспорта (кортежи в порядке NORM_EXPORT_FIELDS).
+    Читаются из БД частями, без создания объектов моделей.
+    """
+    return MedicalExaminationNorm.objects.order_by(
+        'position_name', 'harmful_factor__short_name'
+    ).values_list(*NORM_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
 def export_medical_norms(format_type='xlsx', include_headers=True):
     """
     Экспорт норм медосмотров в файл
 
+    Нормы не загружаются целиком: CSV и JSON формируются по мере отдачи
+    (StreamingHttpResponse), Excel пишется в режиме write-only во временный
+    файл и отдаётся с диска.
+
     Args:
         format_type: Формат экспорта ('xlsx', 'csv' или 'json')
         include_headers: Включать ли заголовки
@@ -209,139 +329,114 @@ def export_medical_norms(format_type='xlsx', include_headers=True):
     Returns:
         HttpResponse: Ответ для скачивания файла
     """
-    norms = MedicalExaminationNorm.objects.select_related('harmful_factor', 'harmful_factor__examination_type').all()
+    rows = iter_medical_norm_rows()
 
-    if format_type == 'xlsx':
-        return export_to_xlsx(norms, include_headers)
-    elif format_type == 'csv':
-        return export_to_csv(norms, include_headers)
+    if format_type == 'csv':
+        return export_to_csv(rows, include_headers)
     elif format_type == 'json':
-        return export_to_json(norms)
+        return export_to_json(rows)
     else:
         # По умолчанию используем Excel
-        return export_to_xlsx(norms, include_headers)
+        return export_to_xlsx(rows, include_headers)
 
 
-def export_to_xlsx(norms, include_headers):
-    """Экспорт данных в Excel-файл"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Нормы медосмотров"
+def _export_filename(extension):
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"medical_norms_{timestamp}.{extension}"
+
+
+def _export_row(row):
+    """Строка экспорта: пустое переопределение периодичности выводится пустой ячейкой"""
+    position_name, short_name, full_name, periodicity, periodicity_override, notes = row
+    return [position_name, short_name, full_name, periodicity, periodicity_override or '', notes]
+
+
+def export_to_xlsx(rows, include_headers):
+    """Экспорт данных в Excel-файл (write-only, ширина столбцов по первым строкам)"""
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, EXPORT_WIDTH_SAMPLE_ROWS))
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Нормы медосмотров")
+
+    # В режиме write-only ширину столбцов задаём до записи строк
+    widths = [len(header) if include_headers else 0 for header in NORM_EXPORT_HEADERS]
+    for row in sample:
+        for idx, value in enumerate(row):
+            if value:
+                widths[idx] = max(widths[idx], len(str(value)))
+    for idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = width + 2
 
     # Добавляем заголовки
     if include_headers:
-        headers = [
-            'Наименование должности',
-            'Код вредного фактора',
-            'Наименование вредного фактора',
-            'Вид медосмотра',
-            'Периодичность (мес.)',
-            'Переопределение периодичности',
-            'Примечания'
-        ]
-        ws.append(headers)
+        ws.append(NORM_EXPORT_HEADERS)
 
     # Добавляем данные
-    for norm in norms:
-        row = [
-            norm.position_name,
-            norm.harmful_factor.short_name,
-            norm.harmful_factor.full_name,
-            norm.harmful_factor.examination_type.name,
-            norm.harmful_factor.periodicity,
-            norm.periodicity_override or '',
-            norm.notes
-        ]
-        ws.append(row)
-
-    # Автоматически регулируем ширину столбцов
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            if cell.value:
-                max_length = max(max_length, len(str(cell.value)))
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column].width = adjusted_width
-
-    # Создаем ответ
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    for row in itertools.chain(sample, rows):
+        ws.append(_export_row(row))
 
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"medical_norms_{timestamp}.xlsx"
+    # Файл удаляется при закрытии ответа
+    tmp_file = tempfile.TemporaryFile(suffix='.xlsx')
+    wb.save(tmp_file)
+    tmp_file.seek(0)
 
-    response = HttpResponse(buffer.getvalue(),
-                            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return FileResponse(
+        tmp_file,
+        as_attachment=True,
+        filename=_export_filename('xlsx'),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
 
-    return response
 
+class _EchoBuffer:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи"""
 
-def export_to_csv(norms, include_headers):
-    """Экспорт данных в CSV-файл"""
-    response = HttpResponse(content_type='text/csv')
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"medical_norms_{timestamp}.csv"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    def write(self, value):
+        return value
 
-    writer = csv.writer(response)
+
+def _iter_csv(rows, include_headers):
+    writer = csv.writer(_EchoBuffer())
 
     # Добавляем заголовки
     if include_headers:
-        headers = [
-            'Наименование должности',
-            'Код вредного фактора',
-            'Наименование вредного фактора',
-            'Вид медосмотра',
-            'Периодичность (мес.)',
-            'Переопределение периодичности',
-            'Примечания'
-        ]
-        writer.writerow(headers)
+        yield writer.writerow(NORM_EXPORT_HEADERS)
 
     # Добавляем данные
-    for norm in norms:
-        row = [
-            norm.position_name,
-            norm.harmful_factor.short_name,
-            norm.harmful_factor.full_name,
-            norm.harmful_factor.examination_type.name,
-            norm.harmful_factor.periodicity,
-            norm.periodicity_override or '',
-            norm.notes
-        ]
-        writer.writerow(row)
+    for row in rows:
+        yield writer.writerow(_export_row(row))
 
-    return response
 
+def export_to_csv(rows, include_headers):
+    """Экспорт данных в CSV-файл (формируется по мере отдачи)"""
+    response = StreamingHttpResponse(_iter_csv(rows, include_headers), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{_export_filename("csv")}"'
+    return response
 
-def export_to_json(norms):
-    """Экспорт данных в JSON-файл"""
-    data = []
 
-    for norm in norms:
-        data.append({
-            'position_name': norm.position_name,
+def _iter_json(rows):
+    yield '['
+    for idx, row in enumerate(rows):
+        position_name, short_name, full_name, periodicity, periodicity_override, notes = row
+        item = json.dumps({
+            'position_name': position_name,
             'harmful_factor': {
-                'short_name': norm.harmful_factor.short_name,
-                'full_name': norm.harmful_factor.full_name,
-                'periodicity': norm.harmful_factor.periodicity,
+                'short_name': short_name,
+                'full_name': full_name,
+                'periodicity': periodicity,
             },
-            'examination_type': norm.harmful_factor.examination_type.name,
-            'periodicity_override': norm.periodicity_override,
-            'notes': norm.notes
-        })
-
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"medical_norms_{timestamp}.json"
-
-    json_data = json.dumps(data, ensure_ascii=False, indent=4)
+            'periodicity_override': periodicity_override,
+            'notes': notes
+        }, ensure_ascii=False, indent=4)
+        yield (',\n' if idx else '\n') + textwrap.indent(item, '    ')
+    yield '\n]'
 
-    response = HttpResponse(json_data, content_type='application/json')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
 
+def export_to_json(rows):
+    """Экспорт данных в JSON-файл (формируется по мере отдачи)"""
+    response = StreamingHttpResponse(_iter_json(rows), content_type='application/json')
+    response['Content-Disposition'] = f'attachment; filename="{_export_filename("json")}"'
     return response
 
 
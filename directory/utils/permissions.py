@@ -11,12 +11,140 @@
     3. Если дан доступ к Department → доступ только к нему
 
 Оптимизация:
-    - Request-level cache (данные кешируются на время HTTP запроса)
-    - Оптимизированные запросы (избежание N+1 проблемы)
+    - AccessScope: неизменяемый снимок ID доступных организаций/подразделений/отделов
+    - Межзапросный кеш (Django cache) по пользователю + request-level кеш
+    - Инвалидация сигналами (directory/signals.py) при изменении M2M профиля
+      и при создании/перемещении/удалении организаций, подразделений и отделов
+    - Фильтрация по спискам ID (избежание N+1 проблемы и подзапросов)
 """
 
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 
+ACCESS_SCOPE_CACHE_PREFIX = 'access_scope'
+ACCESS_SCOPE_GENERATION_KEY = f'{ACCESS_SCOPE_CACHE_PREFIX}:generation'
+
+
+@dataclass(frozen=True)
+class AccessScope:
+    """
+    🔐 Снимок прав доступа пользователя.
+
+    Хранит прямые закрепления профиля и развёрнутые по иерархии множества ID.
+    Объект неизменяемый и сериализуемый, поэтому безопасно кладётся в кеш.
+    """
+    is_superuser: bool = False
+    direct_organization_ids: frozenset = frozenset()
+    direct_subdivision_ids: frozenset = frozenset()
+    direct_department_ids: frozenset = frozenset()
+    organization_ids: frozenset = frozenset()
+    subdivision_ids: frozenset = frozenset()
+    department_ids: frozenset = frozenset()
+
+    @property
+    def is_department_only(self):
+        """Пользователь закреплён ТОЛЬКО за отделами (без организаций и подразделений)"""
+        return (
+            bool(self.direct_department_ids)
+            and not self.direct_organization_ids
+            and not self.direct_subdivision_ids
+        )
+
+    @property
+    def access_level(self):
+        if self.is_superuser:
+            return 'superuser'
+        if self.direct_organization_ids:
+            return 'organization'
+        if self.direct_subdivision_ids:
+            return 'subdivision'
+        if self.direct_department_ids:
+            return 'department'
+        return 'none'
+
+
+EMPTY_ACCESS_SCOPE = AccessScope()
+SUPERUSER_ACCESS_SCOPE = AccessScope(is_superuser=True)
+
+
+def _get_scope_generation():
+    """Текущее поколение структуры организаций (меняется при её изменении)"""
+    generation = cache.get(ACCESS_SCOPE_GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(ACCESS_SCOPE_GENERATION_KEY, generation, None)
+    return generation
+
+
+def _get_scope_cache_key(user_id, generation):
+    return f'{ACCESS_SCOPE_CACHE_PREFIX}:{generation}:{user_id}'
+
+
+def build_access_scope(profile):
+    """
+    Вычисляет AccessScope профиля за фиксированное число запросов (5).
+    """
+    from directory.models import StructuralSubdivision, Department
+
+    direct_org_ids = set(profile.organizations.values_list('id', flat=True))
+    direct_subdivs = list(profile.subdivisions.values_list('id', 'organization_id'))
+    direct_depts = list(profile.departments.values_list('id', 'organization_id', 'subdivision_id'))
+
+    direct_subdiv_ids = {subdiv_id for subdiv_id, _ in direct_subdivs}
+    direct_dept_ids = {dept_id for dept_id, _, _ in direct_depts}
+
+    # 1. Организации: прямой доступ + родительские организации подразделений и отделов
+    org_ids = set(direct_org_ids)
+    org_ids.update(org_id for _, org_id in direct_subdivs)
+    org_ids.update(org_id for _, org_id, _ in direct_depts)
+
+    # 2. Подразделения: все подразделения прямых организаций + прямые + подразделения отделов
+    subdiv_ids = set(direct_subdiv_ids)
+    subdiv_ids.update(subdiv_id for _, _, subdiv_id in direct_depts if subdiv_id)
+    if direct_org_ids:
+        subdiv_ids.update(
+            StructuralSubdivision.objects.filter(
+                organization_id__in=direct_org_ids
+            ).values_list('id', flat=True)
+        )
+
+    # 3. Отделы: все отделы прямых организаций и подразделений + прямые
+    dept_ids = set(direct_dept_ids)
+    if direct_org_ids or direct_subdiv_ids:
+        dept_ids.update(
+            Department.objects.filter(
+                Q(organization_id__in=direct_org_ids) | Q(subdivision_id__in=direct_subdiv_ids)
+            ).values_list('id', flat=True)
+        )
+
+    return AccessScope(
+        direct_organization_ids=frozenset(direct_org_ids),
+        direct_subdivision_ids=frozenset(direct_subdiv_ids),
+        direct_department_ids=frozenset(direct_dept_ids),
+        organization_ids=frozenset(org_ids),
+        subdivision_ids=frozenset(subdiv_ids),
+        department_ids=frozenset(dept_ids),
+    )
+
+
+def invalidate_user_access_scope(user_id):
+    """Сбрасывает кешированный AccessScope одного пользователя"""
+    cache.delete(_get_scope_cache_key(user_id, _get_scope_generation()))
+
+
+def invalidate_all_access_scopes():
+    """
+    Сбрасывает AccessScope всех пользователей сменой поколения.
+    Старые ключи просто перестают читаться и истекают по таймауту.
+    """
+    try:
+        cache.incr(ACCESS_SCOPE_GENERATION_KEY)
+    except ValueError:
+        cache.set(ACCESS_SCOPE_GENERATION_KEY, 2, None)
+
 
 class AccessControlHelper:
     """
@@ -25,59 +153,63 @@ class AccessControlHelper:
     """
 
     @staticmethod
-    def get_accessible_organizations(user, request=None):
+    def get_access_scope(user, request=None):
         """
-        Возвращает QuerySet организаций, доступных пользователю.
+        Возвращает AccessScope пользователя.
 
-        Логика:
-        - Суперпользователь: все организации
-        - Обычный: организации из profile.organizations + родительские организации
-          из subdivisions и departments
+        Порядок поиска: request-level кеш → Django cache → вычисление из БД.
+        Таймаут межзапросного кеша задаётся настройкой ACCESS_SCOPE_CACHE_TIMEOUT.
 
         Args:
             user: объект User
             request: объект HttpRequest (для кеширования)
 
         Returns:
-            QuerySet[Organization]
+            AccessScope
         """
-        # Request-level cache
-        if request and hasattr(request, '_user_orgs_cache') and request._user_orgs_cache is not None:
-            return request._user_orgs_cache
-
-        from directory.models import Organization
+        if request is not None and getattr(request, '_user_access_scope', None) is not None:
+            return request._user_access_scope
 
-        # Проверка на анонимного пользователя
         if not user or not user.is_authenticated:
-            orgs = Organization.objects.none()
+            scope = EMPTY_ACCESS_SCOPE
         elif user.is_superuser:
-            orgs = Organization.objects.all()
-        elif not hasattr(user, 'profile') or user.profile is None:
-            orgs = Organization.objects.none()
+            scope = SUPERUSER_ACCESS_SCOPE
         else:
-            # Получаем организации из всех источников
-            profile = user.profile
+            cache_key = _get_scope_cache_key(user.pk, _get_scope_generation())
+            scope = cache.get(cache_key)
+            if scope is None:
+                profile = getattr(user, 'profile', None)
+                scope = build_access_scope(profile) if profile is not None else EMPTY_ACCESS_SCOPE
+                cache.set(cache_key, scope, getattr(settings, 'ACCESS_SCOPE_CACHE_TIMEOUT', 300))
 
-            # 1. Прямой доступ к организациям
-            org_ids = set(profile.organizations.values_list('id', flat=True))
+        if request is not None:
+            request._user_access_scope = scope
 
-            # 2. Организации через подразделения
-            org_ids.update(
-                profile.subdivisions.values_list('organization_id', flat=True)
-            )
+        return scope
 
-            # 3. Организации через отделы
-            org_ids.update(
-                profile.departments.values_list('organization_id', flat=True)
-            )
+    @staticmethod
+    def get_accessible_organizations(user, request=None):
+        """
+        Возвращает QuerySet организаций, доступных пользователю.
+
+        Логика:
+        - Суперпользователь: все организации
+        - Обычный: организации из profile.organizations + родительские организации
+          из subdivisions и departments
 
-            orgs = Organization.objects.filter(id__in=org_ids)
+        Args:
+            user: объект User
+            request: объект HttpRequest (для кеширования)
 
-        # Сохраняем в request-cache
-        if request:
-            request._user_orgs_cache = orgs
+        Returns:
+            QuerySet[Organization]
+        """
+        from directory.models import Organization
 
-        return orgs
+        scope = AccessControlHelper.get_access_scope(user, request)
+        if scope.is_superuser:
+            return Organization.objects.all()
+        return Organization.objects.filter(id__in=scope.organization_ids)
 
     @staticmethod
     def get_accessible_subdivisions(user, request=None):
@@ -96,44 +228,12 @@ class AccessControlHelper:
         Returns:
             QuerySet[StructuralSubdivision]
         """
-        # Request-level cache
-        if request and hasattr(request, '_user_subdivs_cache') and request._user_subdivs_cache is not None:
-            return request._user_subdivs_cache
-
         from directory.models import StructuralSubdivision
 
-        # Проверка на анонимного пользователя
-        if not user or not user.is_authenticated:
-            subdivs = StructuralSubdivision.objects.none()
-        elif user.is_superuser:
-            subdivs = StructuralSubdivision.objects.all()
-        elif not hasattr(user, 'profile') or user.profile is None:
-            subdivs = StructuralSubdivision.objects.none()
-        else:
-            # Получаем подразделения из всех источников
-            profile = user.profile
-
-            # 1. Все подразделения доступных организаций
-            subdivs_from_orgs = StructuralSubdivision.objects.filter(
-                organization__in=profile.organizations.all()
-            )
-
-            # 2. Прямой доступ к подразделениям
-            direct_subdivs = profile.subdivisions.all()
-
-            # 3. Подразделения через отделы
-            subdivs_from_depts = StructuralSubdivision.objects.filter(
-                id__in=profile.departments.values_list('subdivision_id', flat=True)
-            )
-
-            # Объединяем все источники
-            subdivs = (subdivs_from_orgs | direct_subdivs | subdivs_from_depts).distinct()
-
-        # Сохраняем в request-cache
-        if request:
-            request._user_subdivs_cache = subdivs
-
-        return subdivs
+        scope = AccessControlHelper.get_access_scope(user, request)
+        if scope.is_superuser:
+            return StructuralSubdivision.objects.all()
+        return StructuralSubdivision.objects.filter(id__in=scope.subdivision_ids)
 
     @staticmethod
     def get_accessible_departments(user, request=None):
@@ -152,44 +252,12 @@ class AccessControlHelper:
         Returns:
             QuerySet[Department]
         """
-        # Request-level cache
-        if request and hasattr(request, '_user_depts_cache') and request._user_depts_cache is not None:
-            return request._user_depts_cache
-
         from directory.models import Department
 
-        # Проверка на анонимного пользователя
-        if not user or not user.is_authenticated:
-            depts = Department.objects.none()
-        elif user.is_superuser:
-            depts = Department.objects.all()
-        elif not hasattr(user, 'profile') or user.profile is None:
-            depts = Department.objects.none()
-        else:
-            # Получаем отделы из всех источников
-            profile = user.profile
-
-            # 1. Все отделы доступных организаций
-            depts_from_orgs = Department.objects.filter(
-                organization__in=profile.organizations.all()
-            )
-
-            # 2. Все отделы доступных подразделений
-            depts_from_subdivs = Department.objects.filter(
-                subdivision__in=profile.subdivisions.all()
-            )
-
-            # 3. Прямой доступ к отделам
-            direct_depts = profile.departments.all()
-
-            # Объединяем все источники
-            depts = (depts_from_orgs | depts_from_subdivs | direct_depts).distinct()
-
-        # Сохраняем в request-cache
-        if request:
-            request._user_depts_cache = depts
-
-        return depts
+        scope = AccessControlHelper.get_access_scope(user, request)
+        if scope.is_superuser:
+            return Department.objects.all()
+        return Department.objects.filter(id__in=scope.department_ids)
 
     @staticmethod
     def filter_queryset(queryset, user, request=None):
@@ -211,7 +279,8 @@ class AccessControlHelper:
         Returns:
             Отфильтрованный QuerySet
         """
-        if user.is_superuser:
+        scope = AccessControlHelper.get_access_scope(user, request)
+        if scope.is_superuser:
             return queryset
 
         if not hasattr(user, 'profile'):
@@ -229,26 +298,16 @@ class AccessControlHelper:
         if not (has_org or has_subdiv or has_dept):
             return queryset.none()
 
-        # Получаем доступные объекты
-        accessible_orgs = AccessControlHelper.get_accessible_organizations(user, request) if has_org else []
-        accessible_subdivs = AccessControlHelper.get_accessible_subdivisions(user, request) if has_subdiv else []
-        # Отделы нужны и для моделей без поля department (например, Department)
-        # поэтому запрашиваем их без привязки к has_dept
-        accessible_depts = AccessControlHelper.get_accessible_departments(user, request)
-        # Признак: у пользователя есть прямое закрепление ТОЛЬКО за отделами
-        # (без доступа к целым организациям или подразделениям)
-        direct_dept_user = (
-            hasattr(user, 'profile') and
-            user.profile.departments.exists() and
-            not user.profile.organizations.exists() and
-            not user.profile.subdivisions.exists()
-        )
+        # Доступные объекты берём из AccessScope (без дополнительных запросов)
+        accessible_orgs = scope.organization_ids
+        accessible_subdivs = scope.subdivision_ids
+        accessible_depts = scope.department_ids
 
         # Для пользователей, привязанных напрямую к отделам:
         # 1) список отделов – ровно их own departments
         # 2) для моделей с полем department – фильтруем только по ним, без отката на подразделение/организацию
         # 3) НЕ показываем сотрудников подразделения без конкретного отдела
-        if direct_dept_user:
+        if scope.is_department_only:
             # Специальный случай: сама модель Department
             if model._meta.model_name == 'department':
                 return queryset.filter(id__in=accessible_depts).distinct()
@@ -314,38 +373,37 @@ class AccessControlHelper:
         Returns:
             bool: True если доступ разрешен
         """
-        if user.is_superuser:
+        scope = AccessControlHelper.get_access_scope(user)
+        if scope.is_superuser:
             return True
 
         if not hasattr(user, 'profile'):
             return False
 
-        profile = user.profile
-
         # Проверяем organization
-        if hasattr(obj, 'organization') and obj.organization:
-            if obj.organization in profile.organizations.all():
+        if getattr(obj, 'organization_id', None):
+            if obj.organization_id in scope.direct_organization_ids:
                 return True
 
         # Проверяем subdivision
         if hasattr(obj, 'subdivision') and obj.subdivision:
             # Прямой доступ к подразделению
-            if obj.subdivision in profile.subdivisions.all():
+            if obj.subdivision.pk in scope.direct_subdivision_ids:
                 return True
             # Доступ через организацию
-            if obj.subdivision.organization in profile.organizations.all():
+            if obj.subdivision.organization_id in scope.direct_organization_ids:
                 return True
 
         # Проверяем department
         if hasattr(obj, 'department') and obj.department:
             # Прямой доступ к отделу
-            if obj.department in profile.departments.all():
+            if obj.department.pk in scope.direct_department_ids:
                 return True
             # Доступ через подразделение
-            if obj.department.subdivision and obj.department.subdivision in profile.subdivisions.all():
+            if obj.department.subdivision_id and obj.department.subdivision_id in scope.direct_subdivision_ids:
                 return True
             # Доступ через организацию
-            if obj.department.organization in profile.organizations.all():
+            if obj.department.organization_id in scope.direct_organization_ids:
                 return True
 
         return False
@@ -374,13 +432,4 @@ class AccessControlHelper:
         if not hasattr(user, 'profile'):
             return 'none'
 
-        profile = user.profile
-
-        if profile.organizations.exists():
-            return 'organization'
-        elif profile.subdivisions.exists():
-            return 'subdivision'
-        elif profile.departments.exists():
-            return 'department'
-        else:
-            return 'none'
+        return AccessControlHelper.get_access_scope(user).access_level
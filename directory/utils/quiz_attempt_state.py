@@ -0,0 +1,303 @@
+# directory/utils/quiz_attempt_state.py
+"""
+📝 Состояние попытки экзамена/тренировки в кеше
+
+Цикл «вопрос → ответ» не перечитывает из БД порядок вопросов, ответы
+пользователя и счётчики попытки: компактный снимок AttemptState хранится
+в Django cache по ID попытки:
+    - упорядоченные ID вопросов (QuizQuestionOrder) и их разделов
+      (для ключей кеша вопросов, см. directory/utils/quiz_question_bank.py)
+    - битовые маски по позиции вопроса: отвеченные, пропущенные, правильные
+    - счётчики правильных/неправильных/пропущенных ответов
+    - дедлайн (для экзамена с лимитом времени) и настройки экзамена
+
+Запись сквозная: ответ сначала сохраняется в UserAnswer и счётчики QuizAttempt
+(через F-выражения), затем обновляется снимок в кеше. При промахе кеша
+снимок восстанавливается из БД (попытка, порядок вопросов, ответы — 3 запроса).
+
+Снимок удаляется при завершении или прерывании попытки (сигнал в directory/signals.py).
+
+Настройки:
+    QUIZ_ATTEMPT_STATE_TIMEOUT — время жизни снимка в секундах (по умолчанию 6 часов)
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+QUIZ_ATTEMPT_STATE_PREFIX = 'quiz_attempt_state'
+
+
+def _get_state_key(attempt_id):
+    return f'{QUIZ_ATTEMPT_STATE_PREFIX}:{attempt_id}'
+
+
+def get_state_timeout():
+    return getattr(settings, 'QUIZ_ATTEMPT_STATE_TIMEOUT', 60 * 60 * 6)
+
+
+@dataclass
+class AttemptState:
+    """
+    📦 Снимок незавершённой попытки.
+
+    Совместим с шаблоном вопроса вместо объекта QuizAttempt
+    (attempt.id, attempt.is_exam_mode).
+    """
+    id: int
+    user_id: int
+    quiz_id: int
+    quiz_title: str
+    category_id: Optional[int]
+    question_ids: Tuple[int, ...]
+    question_category_ids: Tuple[int, ...]
+    show_correct_answer: bool
+    allow_skip: bool
+    allowed_incorrect_answers: int
+    deadline: Optional[float] = None  # unix-время окончания или None без лимита
+    answered_mask: int = 0  # отвечено (не пропущено)
+    skipped_mask: int = 0
+    correct_mask: int = 0
+    correct_answers: int = 0
+    incorrect_answers: int = 0
+    skipped_questions: int = 0
+
+    # --- Вопросы ---
+
+    @property
+    def total_questions(self):
+        return len(self.question_ids)
+
+    def is_exam_mode(self):
+        return self.category_id is None
+
+    def get_question_id(self, question_number):
+        """ID вопроса по номеру (с 1) или None"""
+        if 1 <= question_number <= len(self.question_ids):
+            return self.question_ids[question_number - 1]
+        return None
+
+    def get_question_category_id(self, position):
+        return self.question_category_ids[position]
+
+    def get_position(self, question_id):
+        """Позиция вопроса (с 0) или None, если вопрос не входит в попытку"""
+        try:
+            return self.question_ids.index(question_id)
+        except ValueError:
+            return None
+
+    # --- Ответы ---
+
+    def is_answered(self, position):
+        return bool(self.answered_mask >> position & 1)
+
+    def is_skipped(self, position):
+        return bool(self.skipped_mask >> position & 1)
+
+    @property
+    def answered_count(self):
+        """Число вопросов с записью UserAnswer (в т.ч. пропущенных)"""
+        return bin(self.answered_mask | self.skipped_mask).count('1')
+
+    @property
+    def skipped_count(self):
+        return bin(self.skipped_mask).count('1')
+
+    def first_unanswered_number(self, start=0):
+        """Номер (с 1) первого вопроса без ответа или пропущенного, начиная с позиции start"""
+        for position in range(start, len(self.question_ids)):
+            if not self.is_answered(position):
+                return position + 1
+        return None
+
+    def mark(self, position, is_correct=False, is_skipped=False):
+        bit = 1 << position
+        if self.skipped_mask & bit:
+            self.skipped_mask &= ~bit
+            self.skipped_questions -= 1
+
+        if is_skipped:
+            self.skipped_mask |= bit
+            self.skipped_questions += 1
+            return
+
+        self.answered_mask |= bit
+        if is_correct:
+            self.correct_mask |= bit
+            self.correct_answers += 1
+        else:
+            self.incorrect_answers += 1
+
+    # --- Время ---
+
+    def get_time_left_seconds(self):
+        """Оставшееся время в секундах или None, если лимита нет"""
+        if self.deadline is None:
+            return None
+        return max(0, int(self.deadline - time.time()))
+
+
+def build_attempt_state(attempt, session=None):
+    """
+    Собирает снимок попытки из БД.
+
+    Args:
+        attempt: QuizAttempt (quiz подгружается через select_related)
+        session: сессия для старых попыток без QuizQuestionOrder
+
+    Returns:
+        AttemptState или None, если порядок вопросов не найден
+    """
+    from directory.models import Question, QuizQuestionOrder, UserAnswer
+
+    questions = list(
+        QuizQuestionOrder.objects.filter(attempt=attempt).order_by('order').values_list(
+            'question_id', 'question__category_id'
+        )
+    )
+    if not questions and session is not None:
+        # Fallback на сессию (для старых попыток)
+        question_ids = session.get(f'quiz_questions_{attempt.id}') or []
+        categories = dict(Question.objects.filter(id__in=question_ids).values_list('id', 'category_id'))
+        questions = [
+            (question_id, categories[question_id]) for question_id in question_ids if question_id in categories
+        ]
+    if not questions:
+        return None
+
+    deadline = None
+    if attempt.time_limit_seconds > 0:
+        deadline = attempt.started_at.timestamp() + attempt.time_limit_seconds
+
+    quiz = attempt.quiz
+    state = AttemptState(
+        id=attempt.id,
+        user_id=attempt.user_id,
+        quiz_id=quiz.id,
+        quiz_title=quiz.title,
+        category_id=attempt.category_id,
+        question_ids=tuple(question_id for question_id, _ in questions),
+        question_category_ids=tuple(category_id for _, category_id in questions),
+        show_correct_answer=quiz.show_correct_answer,
+        allow_skip=quiz.allow_skip,
+        allowed_incorrect_answers=attempt.allowed_incorrect_answers,
+        deadline=deadline,
+        correct_answers=attempt.correct_answers,
+        incorrect_answers=attempt.incorrect_answers,
+        skipped_questions=attempt.skipped_questions,
+    )
+
+    for question_id, is_correct, is_skipped in UserAnswer.objects.filter(
+        attempt=attempt
+    ).values_list('question_id', 'is_correct', 'is_skipped'):
+        position = state.get_position(question_id)
+        if position is None:
+            continue
+        bit = 1 << position
+        if is_skipped:
+            state.skipped_mask |= bit
+        else:
+            state.answered_mask |= bit
+            if is_correct:
+                state.correct_mask |= bit
+
+    return state
+
+
+def save_attempt_state(state):
+    cache.set(_get_state_key(state.id), state, get_state_timeout())
+
+
+def get_attempt_state(attempt_id, user_id, session=None):
+    """
+    Снимок незавершённой попытки пользователя.
+
+    При промахе кеша попытка загружается из БД; завершённые и чужие попытки
+    не кешируются.
+
+    Returns:
+        AttemptState или None (попытка не найдена, завершена или без вопросов)
+    """
+    from directory.models import QuizAttempt
+
+    state = cache.get(_get_state_key(attempt_id))
+    if state is not None:
+        return state if state.user_id == user_id else None
+
+    attempt = QuizAttempt.objects.select_related('quiz').filter(
+        id=attempt_id,
+        user_id=user_id,
+        status=QuizAttempt.STATUS_IN_PROGRESS
+    ).first()
+    if attempt is None:
+        return None
+
+    state = build_attempt_state(attempt, session)
+    if state is not None:
+        save_attempt_state(state)
+    return state
+
+
+def invalidate_attempt_state(attempt_id):
+    cache.delete(_get_state_key(attempt_id))
+
+
+def record_answer(state, question_id, answer_id=None, is_correct=False, is_skipped=False):
+    """
+    Сохраняет ответ (или пропуск) в UserAnswer и счётчики QuizAttempt,
+    затем обновляет снимок в кеше.
+
+    Пропущенный ранее вопрос можно пройти повторно: запись UserAnswer обновляется.
+
+    Returns:
+        bool: False, если на вопрос уже был дан ответ (повторный запрос)
+    """
+    from directory.models import QuizAttempt, UserAnswer
+
+    position = state.get_position(question_id)
+    if state.is_answered(position) or (is_skipped and state.is_skipped(position)):
+        return False
+
+    counters = {}
+    if is_skipped:
+        counters['skipped_questions'] = F('skipped_questions') + 1
+    elif is_correct:
+        counters['correct_answers'] = F('correct_answers') + 1
+    else:
+        counters['incorrect_answers'] = F('incorrect_answers') + 1
+
+    was_skipped = state.is_skipped(position)
+    try:
+        with transaction.atomic():
+            if was_skipped:
+                counters['skipped_questions'] = F('skipped_questions') - 1
+                updated = UserAnswer.objects.filter(
+                    attempt_id=state.id,
+                    question_id=question_id,
+                    is_skipped=True
+                ).update(selected_answer_id=answer_id, is_correct=is_correct, is_skipped=False)
+                if not updated:
+                    raise IntegrityError('Ответ на вопрос уже сохранён')
+            else:
+                UserAnswer.objects.create(
+                    attempt_id=state.id,
+                    question_id=question_id,
+                    selected_answer_id=answer_id,
+                    is_correct=is_correct,
+                    is_skipped=is_skipped
+                )
+            QuizAttempt.objects.filter(id=state.id).update(**counters)
+    except IntegrityError:
+        # Параллельный запрос уже записал ответ - снимок устарел
+        invalidate_attempt_state(state.id)
+        return False
+
+    state.mark(position, is_correct=is_correct, is_skipped=is_skipped)
+    save_attempt_state(state)
+    return True
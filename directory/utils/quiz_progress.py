@@ -0,0 +1,252 @@
+# directory/utils/quiz_progress.py
+"""
+📈 Прогресс тренировок пользователя по разделам экзаменов
+
+Прогресс раздела — «пройдено N из M»:
+    - N: число уникальных вопросов раздела, на которые пользователь ответил
+      (не пропустил) в завершённых и незавершённых тренировках по этому разделу
+    - M: число активных вопросов раздела из кешированного индекса
+      (directory/utils/quiz_question_bank.py), который сбрасывается сигналами
+      при изменении вопросов, в т.ч. при импорте
+
+N хранится в таблице UserCategoryProgress и не пересчитывается по истории ответов:
+    - при ответе в тренировке счётчик увеличивается, если пользователь ещё
+      не отвечал на этот вопрос в других тренировках раздела
+    - при удалении/переносе вопросов, удалении или прерывании тренировки
+      записи помечаются устаревшими (сигналы в directory/signals.py)
+    - отсутствующие и устаревшие записи пересчитываются при чтении одним
+      сгруппированным запросом по ответам и сохраняются под блокировкой строк
+
+Для списка экзаменов всё считается пакетно, независимо от числа экзаменов
+и разделов.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from directory.utils.quiz_question_bank import get_category_question_counts
+
+
+def get_exam_categories_by_quiz(quiz_ids):
+    """
+    Разделы экзаменов с учётом порядка (как Quiz.get_exam_categories):
+    только активные разделы, в которых есть активные вопросы.
+
+    Returns:
+        dict: {quiz_id: [QuizCategory, ...]}
+    """
+    from directory.models import QuizCategoryOrder
+
+    category_orders = list(
+        QuizCategoryOrder.objects.filter(
+            quiz_id__in=quiz_ids,
+            category__is_active=True
+        ).select_related('category').order_by('order', 'category__name')
+    )
+    counts = get_category_question_counts(
+        category_order.category_id for category_order in category_orders
+    )
+
+    categories = defaultdict(list)
+    for category_order in category_orders:
+        if counts[category_order.category_id]:
+            categories[category_order.quiz_id].append(category_order.category)
+    return categories
+
+
+def _get_training_answers(user_id, quiz_id, category_id):
+    """Ответы (не пропуски) пользователя в действующих тренировках по разделу"""
+    from directory.models import QuizAttempt, UserAnswer
+
+    return UserAnswer.objects.filter(
+        attempt__user_id=user_id,
+        attempt__quiz_id=quiz_id,
+        attempt__category_id=category_id,
+        attempt__status__in=[QuizAttempt.STATUS_COMPLETED, QuizAttempt.STATUS_IN_PROGRESS],
+        is_skipped=False
+    )
+
+
+def compute_answered_counts(user, pairs):
+    """
+    Число уникальных отвеченных вопросов по тренировкам пользователя
+    (полный пересчёт по ответам, одним сгруппированным запросом).
+
+    Args:
+        pairs: [(quiz_id, category_id), ...]
+
+    Returns:
+        dict: {(quiz_id, category_id): answered_count}
+    """
+    from directory.models import QuizAttempt, UserAnswer
+
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+
+    rows = UserAnswer.objects.filter(
+        attempt__user=user,
+        attempt__quiz_id__in={quiz_id for quiz_id, _ in pairs},
+        attempt__category_id__in={category_id for _, category_id in pairs},
+        attempt__status__in=[QuizAttempt.STATUS_COMPLETED, QuizAttempt.STATUS_IN_PROGRESS],
+        question__category=F('attempt__category'),
+        is_skipped=False  # Не считаем пропущенные
+    ).values(
+        'attempt__quiz_id', 'attempt__category_id'
+    ).annotate(
+        answered=Count('question_id', distinct=True)
+    ).order_by()
+
+    counts = {
+        (row['attempt__quiz_id'], row['attempt__category_id']): row['answered']
+        for row in rows
+    }
+    return {pair: counts.get(pair, 0) for pair in pairs}
+
+
+def get_answered_counts(user, pairs):
+    """
+    Число уникальных отвеченных вопросов из UserCategoryProgress;
+    отсутствующие и устаревшие записи пересчитываются и сохраняются.
+
+    Args:
+        pairs: [(quiz_id, category_id), ...]
+
+    Returns:
+        dict: {(quiz_id, category_id): answered_count}
+    """
+    from directory.models import UserCategoryProgress
+
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+
+    counts = {
+        (quiz_id, category_id): answered_count
+        for quiz_id, category_id, answered_count in UserCategoryProgress.objects.filter(
+            user=user,
+            quiz_id__in={quiz_id for quiz_id, _ in pairs},
+            category_id__in={category_id for _, category_id in pairs},
+            is_stale=False
+        ).values_list('quiz_id', 'category_id', 'answered_count')
+    }
+
+    missing = [pair for pair in pairs if pair not in counts]
+    if missing:
+        counts.update(_recompute_answered_counts(user, missing))
+
+    return {pair: counts[pair] for pair in pairs}
+
+
+def _recompute_answered_counts(user, pairs):
+    """
+    Пересчитывает отсутствующие и устаревшие записи под блокировкой строк
+    (select_for_update): увеличение счётчика (record_training_answer) и пометка
+    устаревшими ждут окончания пересчёта и применяются к пересчитанному значению.
+
+    Записи, пересчитанные параллельным запросом, пока ждали блокировку,
+    повторно не пересчитываются.
+    """
+    from directory.models import UserCategoryProgress
+
+    pairs = set(pairs)
+    with transaction.atomic():
+        # Недостающие записи создаются устаревшими - их блокирует и заполняет пересчёт ниже
+        UserCategoryProgress.objects.bulk_create(
+            [
+                UserCategoryProgress(user=user, quiz_id=quiz_id, category_id=category_id, is_stale=True)
+                for quiz_id, category_id in pairs
+            ],
+            ignore_conflicts=True
+        )
+        rows = [
+            row for row in UserCategoryProgress.objects.select_for_update().filter(
+                user=user,
+                quiz_id__in={quiz_id for quiz_id, _ in pairs},
+                category_id__in={category_id for _, category_id in pairs}
+            )
+            if (row.quiz_id, row.category_id) in pairs
+        ]
+
+        stale = [row for row in rows if row.is_stale]
+        computed = compute_answered_counts(user, [(row.quiz_id, row.category_id) for row in stale])
+        for row in stale:
+            row.answered_count = computed[(row.quiz_id, row.category_id)]
+            row.is_stale = False
+        UserCategoryProgress.objects.bulk_update(stale, ['answered_count', 'is_stale'])
+
+    return {(row.quiz_id, row.category_id): row.answered_count for row in rows}
+
+
+def record_training_answer(user_id, quiz_id, category_id, question_id, attempt_id):
+    """
+    Учитывает ответ в тренировке: счётчик увеличивается, если на вопрос
+    ещё нет ответа в других тренировках пользователя по разделу.
+
+    Запись без счётчика не создаётся - её заполнит пересчёт при чтении.
+    Вызывается в одной транзакции с сохранением ответа (см. quiz_answer).
+    Запись блокируется в любом состоянии, поэтому пересчёт (get_answered_counts)
+    либо завершается до фиксации ответа и не учитывает его, либо ждёт фиксации
+    и учитывает: увеличение не теряется и не учитывается дважды.
+    """
+    from directory.models import UserCategoryProgress
+
+    if _get_training_answers(user_id, quiz_id, category_id).filter(
+        question_id=question_id
+    ).exclude(attempt_id=attempt_id).exists():
+        return
+
+    with transaction.atomic():
+        progress = UserCategoryProgress.objects.select_for_update().filter(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            category_id=category_id
+        ).values_list('id', 'is_stale').first()
+        if progress is None or progress[1]:
+            return
+
+        UserCategoryProgress.objects.filter(id=progress[0]).update(answered_count=F('answered_count') + 1)
+
+
+def mark_progress_stale(**filters):
+    """Помечает записи прогресса устаревшими (user_id, quiz_id, category_id / category_id__in)"""
+    from directory.models import UserCategoryProgress
+
+    UserCategoryProgress.objects.filter(is_stale=False, **filters).update(is_stale=True)
+
+
+def get_training_progress(user, quizzes):
+    """
+    Прогресс тренировок пользователя по всем разделам экзаменов.
+
+    Returns:
+        list: [{'quiz': Quiz, 'categories': [
+            {'category': QuizCategory, 'answered_count': int, 'total_questions': int}, ...
+        ]}, ...]
+    """
+    quizzes = list(quizzes)
+    quiz_ids = [quiz.id for quiz in quizzes]
+    categories_by_quiz = get_exam_categories_by_quiz(quiz_ids)
+    answered_counts = get_answered_counts(user, [
+        (quiz_id, category.id) for quiz_id, categories in categories_by_quiz.items() for category in categories
+    ])
+    question_counts = get_category_question_counts(
+        category.id for categories in categories_by_quiz.values() for category in categories
+    )
+
+    return [
+        {
+            'quiz': quiz,
+            'categories': [
+                {
+                    'category': category,
+                    'answered_count': answered_counts[(quiz.id, category.id)],
+                    'total_questions': question_counts[category.id],
+                }
+                for category in categories_by_quiz.get(quiz.id, [])
+            ],
+        }
+        for quiz in quizzes
+    ]
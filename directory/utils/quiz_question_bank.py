@@ -0,0 +1,177 @@
+# directory/utils/quiz_question_bank.py
+"""
+📚 Кеш вопросов экзамена (банк вопросов)
+
+Во время экзамена вопросы и варианты ответов не меняются, поэтому каждый
+вопрос сериализуется один раз (текст, пояснение, URL изображения, раздел,
+ответы с ID и признаком правильности) и хранится в Django cache.
+
+Ключ содержит раздел и версию его содержимого. Версия раздела увеличивается
+сигналами (directory/signals.py) при сохранении/удалении вопросов и ответов,
+в т.ч. при импорте вопросов (импорт создаёт и удаляет их через ORM).
+
+Порядок ответов перемешивается детерминированно по попытке и вопросу:
+повторный показ вопроса в той же попытке даёт тот же порядок.
+
+Индекс раздела — кортеж ID активных вопросов под той же версией. По нему
+экзамен выбирает случайные вопросы и считает их количество, не загружая
+вопросы из БД (недостающие индексы — одним запросом на все разделы).
+
+Словари совместимы с шаблоном вопроса: question.id, question.question_text,
+question.category.name, question.image.url, answer.id, answer.answer_text.
+"""
+
+import random
+from collections import defaultdict
+
+from django.core.cache import cache
+
+QUIZ_BANK_PREFIX = 'quiz_bank'
+QUIZ_BANK_TIMEOUT = 60 * 60 * 24
+
+
+def _get_version_key(category_id):
+    return f'{QUIZ_BANK_PREFIX}:version:{category_id}'
+
+
+def _get_question_key(category_id, version, question_id):
+    return f'{QUIZ_BANK_PREFIX}:{category_id}:{version}:{question_id}'
+
+
+def _get_index_key(category_id, version):
+    return f'{QUIZ_BANK_PREFIX}:{category_id}:{version}:index'
+
+
+def invalidate_question_bank(*category_ids):
+    """Сбрасывает кеш вопросов указанных разделов (увеличивает их версию)"""
+    for category_id in {category_id for category_id in category_ids if category_id}:
+        version_key = _get_version_key(category_id)
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 2, None)
+
+
+def serialize_question(question):
+    """Данные вопроса для показа и проверки ответа (answers должны быть загружены)"""
+    return {
+        'id': question.id,
+        'category_id': question.category_id,
+        'category': {'name': question.category.name},
+        'question_text': question.question_text,
+        'explanation': question.explanation,
+        'image': {'url': question.image.url} if question.image else None,
+        'answers': [
+            {'id': answer.id, 'answer_text': answer.answer_text, 'is_correct': answer.is_correct}
+            for answer in question.answers.all()
+        ],
+    }
+
+
+def get_category_question_ids(category_ids):
+    """
+    Индексы разделов: ID активных вопросов (по порядку вопросов).
+
+    Returns:
+        dict: {category_id: (question_id, ...)}
+    """
+    from directory.models import Question
+
+    category_ids = list(dict.fromkeys(category_ids))
+    if not category_ids:
+        return {}
+
+    versions = cache.get_many([_get_version_key(category_id) for category_id in category_ids])
+    keys = {
+        category_id: _get_index_key(category_id, versions.get(_get_version_key(category_id), 1))
+        for category_id in category_ids
+    }
+
+    cached = cache.get_many(list(keys.values()))
+    indexes = {category_id: cached[key] for category_id, key in keys.items() if key in cached}
+
+    missing = [category_id for category_id in category_ids if category_id not in indexes]
+    if missing:
+        loaded = defaultdict(list)
+        for category_id, question_id in Question.objects.filter(
+            category_id__in=missing,
+            is_active=True
+        ).order_by('order', 'id').values_list('category_id', 'id'):
+            loaded[category_id].append(question_id)
+
+        # Пустой кортеж тоже кешируется: «в разделе нет вопросов»
+        loaded = {category_id: tuple(loaded.get(category_id, ())) for category_id in missing}
+        cache.set_many(
+            {keys[category_id]: question_ids for category_id, question_ids in loaded.items()},
+            QUIZ_BANK_TIMEOUT
+        )
+        indexes.update(loaded)
+
+    return indexes
+
+
+def get_category_question_counts(category_ids):
+    """Количество активных вопросов в разделах: {category_id: count}"""
+    return {
+        category_id: len(question_ids)
+        for category_id, question_ids in get_category_question_ids(category_ids).items()
+    }
+
+
+def get_question_payloads(question_ids_by_category):
+    """
+    Данные вопросов из кеша; недостающие загружаются двумя запросами.
+
+    Args:
+        question_ids_by_category: {category_id: [question_id, ...]}
+
+    Returns:
+        dict: {question_id: payload}
+    """
+    from directory.models import Question
+
+    versions = cache.get_many([_get_version_key(category_id) for category_id in question_ids_by_category])
+    keys = {
+        question_id: _get_question_key(
+            category_id, versions.get(_get_version_key(category_id), 1), question_id
+        )
+        for category_id, question_ids in question_ids_by_category.items()
+        for question_id in question_ids
+    }
+
+    cached = cache.get_many(list(keys.values()))
+    payloads = {question_id: cached[key] for question_id, key in keys.items() if key in cached}
+
+    missing = [question_id for question_id in keys if question_id not in payloads]
+    if missing:
+        loaded = {
+            question.id: serialize_question(question)
+            for question in Question.objects.filter(id__in=missing).select_related(
+                'category'
+            ).prefetch_related('answers')
+        }
+        cache.set_many(
+            {keys[question_id]: payload for question_id, payload in loaded.items()},
+            QUIZ_BANK_TIMEOUT
+        )
+        payloads.update(loaded)
+
+    return payloads
+
+
+def get_question_payload(question_id, category_id):
+    """Данные одного вопроса или None, если вопрос удалён"""
+    return get_question_payloads({category_id: [question_id]}).get(question_id)
+
+
+def get_shuffled_answers(payload, attempt_id):
+    """
+    Ответы вопроса в порядке, перемешанном детерминированно для попытки
+    (без признака правильности - для шаблона).
+    """
+    answers = [
+        {'id': answer['id'], 'answer_text': answer['answer_text']}
+        for answer in payload['answers']
+    ]
+    random.Random(f"{attempt_id}:{payload['id']}").shuffle(answers)
+    return answers
@@ -0,0 +1,76 @@
+# directory/utils/zip_stream.py
+"""
+📦 Потоковая отдача ZIP-архивов
+
+Архив не собирается целиком в памяти: каждый файл записывается в ZipFile
+поверх буфера без поддержки seek, и накопленные байты сразу отдаются клиенту.
+В памяти одновременно находится примерно один документ.
+"""
+import logging
+import zipfile
+from urllib.parse import quote
+
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipStreamBuffer:
+    """
+    Буфер только для записи. Нет tell/seek, поэтому ZipFile пишет архив
+    последовательно (с дескрипторами данных после каждого файла).
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_stream(files, compression=zipfile.ZIP_DEFLATED):
+    """
+    Отдаёт ZIP-архив частями.
+
+    Args:
+        files: итерируемый набор (filename, content); content - bytes или str.
+               Элементы со значением None пропускаются.
+
+    Yields:
+        bytes: очередная часть архива
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression) as zip_file:
+        for item in files:
+            if item is None:
+                continue
+            filename, content = item
+            zip_file.writestr(filename, content)
+            logger.info(f"Файл {filename} добавлен в архив")
+            chunk = buffer.pop()
+            if chunk:
+                yield chunk
+    # Центральный каталог архива
+    yield buffer.pop()
+
+
+def streaming_zip_response(files, filename):
+    """
+    StreamingHttpResponse с ZIP-архивом, который формируется по мере отдачи.
+
+    Args:
+        files: итерируемый набор (filename, content), может быть генератором
+        filename: имя архива для Content-Disposition (поддерживается кириллица)
+    """
+    response = StreamingHttpResponse(iter_zip_stream(files), content_type='application/zip')
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
@@ -3,11 +3,9 @@ from django.views.generic import FormView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from django.http import HttpResponse, HttpRequest
+from django.http import HttpRequest
 import os
-import io
 import tempfile
-import zipfile
 import logging
 import datetime
 
@@ -24,6 +22,8 @@ from directory.document_generators.familiarization_generator import generate_fam
 from directory.document_generators.ot_card_generator import generate_personal_ot_card
 from directory.document_generators.journal_example_generator import generate_journal_example
 from directory.document_generators.siz_card_docx_generator import generate_siz_card_docx  # Импорт для DOCX карточки СИЗ
+from directory.document_generators.render_pool import prepare_documents, iter_prepared_documents
+from directory.utils.zip_stream import streaming_zip_response
 # --- --- ---
 
 from django.conf import settings
@@ -167,84 +167,88 @@ class DocumentSelectionView(LoginRequiredMixin, FormView):
             messages.error(self.request, "Не выбран ни один тип документа")
             return self.form_invalid(form)
 
-        # Получаем сотрудника
+        # Получаем сотрудника (все связи, нужные генераторам, - одним запросом)
         try:
-            employee = Employee.objects.get(id=employee_id)
+            employee = Employee.objects.select_related(
+                'position', 'position__department', 'organization', 'subdivision', 'department'
+            ).get(id=employee_id)
         except Employee.DoesNotExist:
             messages.error(self.request, "Сотрудник не найден")
             return self.form_invalid(form)
 
-        # Генерируем все выбранные документы и собираем их для архива
-        files_to_archive = []  # Список кортежей (content, filename)
-
         logger.info(f"Начинается генерация документов для {employee.full_name_nominative}, типы: {document_types}")
 
+        # Данные готовятся сразу (запросы к БД), рендеринг DOCX - в пуле процессов
+        calls = []
+        requested_types = []
         for doc_type in document_types:
-            # Генерируем документ с помощью соответствующего генератора
-            try:
-                result = self._generate_document(doc_type, employee)
-                if result and isinstance(result, dict) and 'content' in result and 'filename' in result:
-                    files_to_archive.append((result['content'], result['filename']))
-                    logger.info(f"Сгенерирован документ: {result['filename']}")
-                elif result:
-                    logger.warning(f"Генератор для {doc_type} вернул неожиданный формат: {type(result)}")
-
-            except Exception as e:
-                logger.error(f"Критическая ошибка при вызове генератора для типа {doc_type}: {str(e)}", exc_info=True)
-                messages.warning(self.request, f"Ошибка при генерации документа типа {doc_type}: {str(e)}")
-                continue
+            call = self._get_generator_call(doc_type, employee)
+            if call:
+                calls.append(call)
+                requested_types.append(doc_type)
+
+        # Данные документов готовятся до ответа: ошибки подготовки попадают в сообщения
+        prepared = prepare_documents(calls)
+        documents = []
+        for doc_type, result in zip(requested_types, prepared):
+            if result:
+                documents.append((doc_type, result))
+            else:
+                messages.warning(self.request, f"Ошибка при генерации документа типа {doc_type}")
 
         # --- Создание и отправка архива ---
-        if not files_to_archive:
+        if not documents:
             messages.error(self.request, "Не удалось сгенерировать ни один документ для добавления в архив")
             return self.form_invalid(form)
 
-        try:
-            # Создаем архив в памяти
-            zip_buffer = io.BytesIO()
-
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for content, filename in files_to_archive:
-                    zipf.writestr(filename, content)
-                    logger.info(f"Файл {filename} добавлен в архив")
+        # Формируем имя архива
+        employee_initials = get_initials_from_name(employee.full_name_nominative)
+        zip_filename = f"Документы_{employee_initials}.zip"
 
-            zip_buffer.seek(0)
+        # Архив отдаётся потоком: документы рендерятся по одному по мере записи в архив,
+        # ошибки рендеринга записываются в файл _summary.txt архива
+        response = streaming_zip_response(self._iter_archive_files(documents), zip_filename)
 
-            # Формируем имя архива
-            employee_initials = get_initials_from_name(employee.full_name_nominative)
-            zip_filename = f"Документы_{employee_initials}.zip"
-
-            # Отправляем архив пользователю
-            response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
-            # Кодируем имя файла для поддержки кириллицы
-            from urllib.parse import quote
-            encoded_filename = quote(zip_filename)
-            response['Content-Disposition'] = f"attachment; filename*=UTF-8''{encoded_filename}"
+        # Записываем в лог факт генерации документов
+        try:
+            DocumentGenerationLog.objects.create(
+                employee=employee,
+                document_types=document_types,
+                created_by=self.request.user if self.request.user.is_authenticated else None
+            )
+            logger.info(f"Записан лог генерации документов для {employee.full_name_nominative}")
+        except Exception as log_error:
+            logger.warning(f"Не удалось записать лог генерации: {str(log_error)}")
+
+        # Сообщение об успехе
+        messages.success(self.request, f"Подготовлено документов: {len(documents)}")
+
+        return response
+
+    def _iter_archive_files(self, documents):
+        """
+        Файлы архива (filename, content): документы рендерятся лениво, по мере
+        записи в архив; в конце при ошибках добавляется _summary.txt.
+
+        Args:
+            documents: [(doc_type, результат prepare_documents), ...]
+        """
+        errors = []
+        rendered = iter_prepared_documents([result for _, result in documents])
+        for (doc_type, _), result in zip(documents, rendered):
+            if result and isinstance(result, dict) and 'content' in result and 'filename' in result:
+                logger.info(f"Сгенерирован документ: {result['filename']}")
+                yield result['filename'], result['content']
+            else:
+                logger.warning(f"Не удалось сформировать документ типа {doc_type}: {type(result)}")
+                errors.append(f"Ошибка при генерации документа типа {doc_type}")
 
-            # Записываем в лог факт генерации документов
-            try:
-                DocumentGenerationLog.objects.create(
-                    employee=employee,
-                    document_types=document_types,
-                    created_by=self.request.user if self.request.user.is_authenticated else None
-                )
-                logger.info(f"Записан лог генерации документов для {employee.full_name_nominative}")
-            except Exception as log_error:
-                logger.warning(f"Не удалось записать лог генерации: {str(log_error)}")
-
-            # Сообщение об успехе
-            messages.success(self.request, f"Успешно сгенерировано документов: {len(files_to_archive)}")
-
-            return response
-
-        except Exception as e:
-            logger.error(f"Ошибка при создании или отправке архива: {str(e)}", exc_info=True)
-            messages.error(self.request, f"Ошибка при создании архива: {str(e)}")
-            return self.form_invalid(form)
+        if errors:
+            summary = f"Дата: {datetime.datetime.now().strftime('%d.%m.%Y %H:%M')}\n\nОшибки:\n" + "\n".join(errors)
+            yield "_summary.txt", summary.encode('utf-8')
 
-    def _generate_document(self, doc_type, employee) -> Optional[dict]:
-        """Вызывает соответствующий генератор для документа типа doc_type.
-        Возвращает словарь с 'content' и 'filename' или None."""
+    def _get_generator_call(self, doc_type, employee) -> Optional[tuple]:
+        """Возвращает (генератор, kwargs) для документа типа doc_type или None."""
         generator_map = {
             'all_orders': generate_all_orders,
             'knowledge_protocol': generate_knowledge_protocol,
@@ -259,9 +263,9 @@ class DocumentSelectionView(LoginRequiredMixin, FormView):
         if generator_func:
             logger.info(f"Вызов генератора {generator_func.__name__} для типа {doc_type}")
             if doc_type == 'doc_familiarization':
-                return generator_func(employee=employee, user=self.request.user, document_list=None)
+                return generator_func, {'employee': employee, 'user': self.request.user, 'document_list': None}
             else:
-                return generator_func(employee=employee, user=self.request.user)
+                return generator_func, {'employee': employee, 'user': self.request.user}
         else:
-            logger.error(f"Генератор для типа документа '{doc_type}' не найден в _generate_document")
-            return None
\ No newline at end of file
+            logger.error(f"Генератор для типа документа '{doc_type}' не найден в _get_generator_call")
+            return None
@@ -4,12 +4,16 @@
 Содержит утилиты и вспомогательные функции для работы с документами.
 """
 import logging
-from directory.utils.declension import get_initials_from_name, decline_full_name, decline_phrase
+from directory.utils.declension import get_initials_from_name, decline_many
 from directory.models import Employee
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Падежи, в которых склоняются имя и должность (родительный, дательный,
+# винительный, творительный, предложный)
+DECLINED_CASES = ('gent', 'datv', 'accs', 'ablt', 'loct')
+
 
 def get_internship_leader(employee):
     """
@@ -406,27 +410,17 @@ def prepare_internship_context(employee, context=None):
         # Получаем инициалы
         leader_name_initials = get_initials_from_name(leader_name)
 
-        # Склоняем имя и должность во всех падежах для гибкости использования
+        # Склоняем имя и должность во всех падежах одним пакетным вызовом
         # Именительный (nomn) - уже есть
-        # Родительный (gent)
-        leader_position_genitive = decline_phrase(leader_position, 'gent') if leader_position else ""
-        leader_name_genitive = decline_full_name(leader_name, 'gent')
-
-        # Дательный (datv)
-        leader_position_dative = decline_phrase(leader_position, 'datv') if leader_position else ""
-        leader_name_dative = decline_full_name(leader_name, 'datv')
-
-        # Винительный (accs)
-        leader_position_accusative = decline_phrase(leader_position, 'accs') if leader_position else ""
-        leader_name_accusative = decline_full_name(leader_name, 'accs')
-
-        # Творительный (ablt)
-        leader_position_instrumental = decline_phrase(leader_position, 'ablt') if leader_position else ""
-        leader_name_instrumental = decline_full_name(leader_name, 'ablt')
-
-        # Предложный (loct)
-        leader_position_prepositional = decline_phrase(leader_position, 'loct') if leader_position else ""
-        leader_name_prepositional = decline_full_name(leader_name, 'loct')
+        (
+            leader_position_genitive, leader_position_dative, leader_position_accusative,
+            leader_position_instrumental, leader_position_prepositional,
+            leader_name_genitive, leader_name_dative, leader_name_accusative,
+            leader_name_instrumental, leader_name_prepositional,
+        ) = decline_many(
+            [(leader_position, case_code, False) for case_code in DECLINED_CASES] +
+            [(leader_name, case_code, True) for case_code in DECLINED_CASES]
+        )
 
         # Добавляем в контекст оригинальные и склоненные варианты
         context.update({
@@ -496,27 +490,17 @@ def prepare_director_context(employee, context=None):
         # Получаем инициалы
         signer_name_initials = get_initials_from_name(signer_name)
 
-        # Склоняем имя и должность во всех падежах
+        # Склоняем имя и должность во всех падежах одним пакетным вызовом
         # Именительный (nomn) - уже есть
-        # Родительный (gent)
-        signer_position_genitive = decline_phrase(signer_position, 'gent') if signer_position else ""
-        signer_name_genitive = decline_full_name(signer_name, 'gent')
-
-        # Дательный (datv)
-        signer_position_dative = decline_phrase(signer_position, 'datv') if signer_position else ""
-        signer_name_dative = decline_full_name(signer_name, 'datv')
-
-        # Винительный (accs)
-        signer_position_accusative = decline_phrase(signer_position, 'accs') if signer_position else ""
-        signer_name_accusative = decline_full_name(signer_name, 'accs')
-
-        # Творительный (ablt)
-        signer_position_instrumental = decline_phrase(signer_position, 'ablt') if signer_position else ""
-        signer_name_instrumental = decline_full_name(signer_name, 'ablt')
-
-        # Предложный (loct)
-        signer_position_prepositional = decline_phrase(signer_position, 'loct') if signer_position else ""
-        signer_name_prepositional = decline_full_name(signer_name, 'loct')
+        (
+            signer_position_genitive, signer_position_dative, signer_position_accusative,
+            signer_position_instrumental, signer_position_prepositional,
+            signer_name_genitive, signer_name_dative, signer_name_accusative,
+            signer_name_instrumental, signer_name_prepositional,
+        ) = decline_many(
+            [(signer_position, case_code, False) for case_code in DECLINED_CASES] +
+            [(signer_name, case_code, True) for case_code in DECLINED_CASES]
+        )
 
         context.update({
             # Именительный падеж
@@ -602,18 +586,17 @@ def get_commission_formatted(employee):
 
             # Склонения
             try:
-                member_info.update({
-                    'position_genitive': decline_phrase(position, 'gent') if position else "",
-                    'name_genitive': decline_full_name(name, 'gent'),
-                    'position_dative': decline_phrase(position, 'datv') if position else "",
-                    'name_dative': decline_full_name(name, 'datv'),
-                    'position_accusative': decline_phrase(position, 'accs') if position else "",
-                    'name_accusative': decline_full_name(name, 'accs'),
-                    'position_instrumental': decline_phrase(position, 'ablt') if position else "",
-                    'name_instrumental': decline_full_name(name, 'ablt'),
-                    'position_prepositional': decline_phrase(position, 'loct') if position else "",
-                    'name_prepositional': decline_full_name(name, 'loct'),
-                })
+                case_suffixes = (
+                    ('gent', 'genitive'), ('datv', 'dative'), ('accs', 'accusative'),
+                    ('ablt', 'instrumental'), ('loct', 'prepositional'),
+                )
+                forms = decline_many(
+                    [(position, case_code, False) for case_code, _ in case_suffixes] +
+                    [(name, case_code, True) for case_code, _ in case_suffixes]
+                )
+                for idx, (_, suffix) in enumerate(case_suffixes):
+                    member_info[f'position_{suffix}'] = forms[idx]
+                    member_info[f'name_{suffix}'] = forms[len(case_suffixes) + idx]
             except Exception as e:
                  logger.error(f"Ошибка склонения для {name}, {position}: {e}")
                  # Можно добавить пустые строки или оставить как есть
@@ -4,8 +4,6 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db.models import Prefetch, Q
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.utils import timezone
-from datetime import timedelta
 
 from directory.models import (
     Organization,
@@ -15,8 +13,7 @@ from directory.models import (
     Position
 )
 from directory.utils.permissions import AccessControlHelper
-from deadline_control.models import Equipment, KeyDeadlineCategory
-from deadline_control.models.medical_norm import EmployeeMedicalExamination
+from deadline_control.utils.deadline_counters import get_deadline_counters
 
 
 class HomePageView(LoginRequiredMixin, TemplateView):
@@ -42,15 +39,10 @@ class HomePageView(LoginRequiredMixin, TemplateView):
         # 🔑 Определяем режим доступа пользователя
         # Если у пользователя доступ ТОЛЬКО к отделам (без organizations/subdivisions),
         # то НЕ показываем сотрудников уровня organization или subdivision
-        user_profile = user.profile if hasattr(user, 'profile') else None
-        dept_only_mode = (
-            user_profile and
-            user_profile.departments.exists() and
-            not user_profile.organizations.exists() and
-            not user_profile.subdivisions.exists()
-        )
+        access_scope = AccessControlHelper.get_access_scope(user, self.request)
+        dept_only_mode = access_scope.is_department_only
         # Получаем список ID подразделений пользователя (для проверки в цикле)
-        user_subdiv_ids = set(user_profile.subdivisions.values_list('id', flat=True)) if user_profile else set()
+        user_subdiv_ids = access_scope.direct_subdivision_ids
 
         # 🔍 Добавляем поддержку поиска сотрудников
         search_query = self.request.GET.get('search', '')
@@ -75,38 +67,20 @@ class HomePageView(LoginRequiredMixin, TemplateView):
         context['show_fired'] = show_fired
 
         # Дашборд «Контроль сроков» по доступным организациям
-        today = timezone.now().date()
-        warning_date = today + timedelta(days=14)
+        # Счётчики считаются в БД одним агрегирующим запросом на вид сроков и кешируются
+        allowed_orgs_list = list(allowed_orgs)
+        counters = get_deadline_counters([org.id for org in allowed_orgs_list], warning_days=14)
         dashboard_per_org = []
 
-        for org in allowed_orgs:
-            eq_qs = Equipment.objects.filter(organization=org)
-            overdue_eq = sum(1 for eq in eq_qs if eq.next_maintenance_date and eq.next_maintenance_date < today)
-            upcoming_eq = sum(1 for eq in eq_qs if eq.next_maintenance_date and today <= eq.next_maintenance_date <= warning_date)
-
-            cat_qs = KeyDeadlineCategory.objects.filter(organization=org, is_active=True).prefetch_related('items')
-            total_deadlines = sum(cat.items.count() for cat in cat_qs)
-            overdue_deadlines = 0
-            upcoming_deadlines = 0
-            for cat in cat_qs:
-                for item in cat.items.all():
-                    if item.next_date:
-                        if item.next_date < today:
-                            overdue_deadlines += 1
-                        elif item.next_date <= warning_date:
-                            upcoming_deadlines += 1
-
-            med_qs = EmployeeMedicalExamination.objects.filter(employee__organization=org)
-            overdue_med = sum(1 for exam in med_qs if exam.next_date and exam.next_date < today)
-            upcoming_med = sum(1 for exam in med_qs if exam.next_date and today <= exam.next_date <= warning_date)
-
+        for org in allowed_orgs_list:
+            org_counters = counters[org.id]
             dashboard_per_org.append({
                 'org': org,
-                'equipment': {'total': eq_qs.count(), 'overdue': overdue_eq, 'upcoming': upcoming_eq},
-                'deadlines': {'total': total_deadlines, 'overdue': overdue_deadlines, 'upcoming': upcoming_deadlines},
-                'medical': {'total': med_qs.count(), 'overdue': overdue_med, 'upcoming': upcoming_med},
-                'overdue_total': overdue_eq + overdue_deadlines + overdue_med,
-                'upcoming_total': upcoming_eq + upcoming_deadlines + upcoming_med,
+                'equipment': org_counters['equipment'],
+                'deadlines': org_counters['deadlines'],
+                'medical': org_counters['medical'],
+                'overdue_total': sum(kind['overdue'] for kind in org_counters.values()),
+                'upcoming_total': sum(kind['upcoming'] for kind in org_counters.values()),
             })
 
         context['deadline_dashboard'] = {
@@ -3,43 +3,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_POST
 from django.urls import reverse
+from django.db import transaction
 from django.db.models import Q
-from typing import Optional
-import random
 from directory.models import (
-    Quiz, QuizCategory, Question, Answer, QuizAttempt, UserAnswer, QuizAccessToken, QuizQuestionOrder
+    Quiz, QuizCategory, Question, QuizAttempt, UserAnswer, QuizAccessToken, QuizQuestionOrder
 )
-
-
-def _get_time_left_seconds(attempt: QuizAttempt) -> Optional[int]:
-    """Возвращает оставшееся время в секундах или None, если лимита нет."""
-    if attempt.time_limit_seconds <= 0:
-        return None
-    elapsed = (timezone.now() - attempt.started_at).total_seconds()
-    return max(0, int(attempt.time_limit_seconds - elapsed))
-
-
-def _find_first_skipped_question(attempt: QuizAttempt) -> Optional[int]:
-    """Найти номер первого пропущенного вопроса (1-indexed) или None, если все отвечены."""
-    # Получаем все вопросы попытки в правильном порядке
-    question_orders = QuizQuestionOrder.objects.filter(attempt=attempt).order_by('order')
-
-    for qo in question_orders:
-        # Проверяем, есть ли ответ на этот вопрос
-        user_answer = UserAnswer.objects.filter(
-            attempt=attempt,
-            question_id=qo.question_id
-        ).first()
-
-        # Если ответа нет вообще, или он пропущен - это пропущенный вопрос
-        if not user_answer or user_answer.is_skipped:
-            # Нашли пропущенный вопрос, возвращаем его номер (order + 1)
-            return qo.order + 1
-
-    return None
+from directory.utils.quiz_attempt_state import get_attempt_state, record_answer
+from directory.utils.quiz_progress import get_answered_counts, get_training_progress, record_training_answer
+from directory.utils.quiz_question_bank import get_question_payload, get_shuffled_answers
 
 
 def _finalize_attempt(attempt: QuizAttempt, request, failure_reason: str = QuizAttempt.FAILURE_NONE):
@@ -71,41 +45,12 @@ def quiz_list(request):
         quiz_filter = (Q(assigned_users__isnull=True) | Q(assigned_users=request.user)) & Q(is_active=True)
 
     # Все доступные квизы (без разделения на типы)
-    all_quizzes = Quiz.objects.filter(quiz_filter).distinct().prefetch_related('categories')
-
-    # Группируем квизы с их категориями
-    quizzes_with_categories = []
-    for quiz in all_quizzes:
-        # Получаем категории для этого квиза с сортировкой
-        quiz_categories = quiz.get_exam_categories()
-
-        # Для каждой категории подсчитываем прогресс пользователя
-        categories_with_progress = []
-        for category in quiz_categories:
-            # Считаем сколько уникальных вопросов из этой категории пользователь ОТВЕТИЛ
-            # (правильно или неправильно, главное - не пропустил)
-            # в завершенных И незавершенных попытках тренировок
-            answered_count = UserAnswer.objects.filter(
-                attempt__user=request.user,
-                attempt__quiz=quiz,
-                attempt__category=category,
-                attempt__status__in=[QuizAttempt.STATUS_COMPLETED, QuizAttempt.STATUS_IN_PROGRESS],
-                question__category=category,
-                is_skipped=False  # Не считаем пропущенные
-            ).values('question_id').distinct().count()
-
-            total_questions = category.get_questions_count()
-
-            categories_with_progress.append({
-                'category': category,
-                'answered_count': answered_count,
-                'total_questions': total_questions,
-            })
+    all_quizzes = Quiz.objects.filter(quiz_filter).distinct()
 
-        quizzes_with_categories.append({
-            'quiz': quiz,
-            'categories': categories_with_progress,
-        })
+    # Разделы и прогресс пользователя по всем квизам считаются пакетно:
+    # сколько уникальных вопросов раздела пользователь ОТВЕТИЛ (не пропустил)
+    # в завершенных И незавершенных попытках тренировок
+    quizzes_with_categories = get_training_progress(request.user, all_quizzes)
 
     # Статистика пользователя
     user_attempts = QuizAttempt.objects.filter(
@@ -201,9 +146,9 @@ def quiz_start(request, quiz_id, category_id=None):
             completed_attempt.delete()
 
         # Создаем новую попытку тренировки
-        questions = quiz.get_questions_for_category(category)
+        question_ids = [question.id for question in quiz.get_questions_for_category(category)]
 
-        if not questions:
+        if not question_ids:
             messages.error(request, f'В разделе "{category.name}" нет вопросов.')
             if token_mode:
                 return redirect('directory:quiz:exam_home')
@@ -213,9 +158,9 @@ def quiz_start(request, quiz_id, category_id=None):
             'quiz': quiz,
             'user': request.user,
             'category': category,  # Указываем раздел для тренировки
-            'total_questions': len(questions),
+            'total_questions': len(question_ids),
             'status': QuizAttempt.STATUS_IN_PROGRESS,
-            'max_questions': len(questions),
+            'max_questions': len(question_ids),
             'time_limit_seconds': 0,  # Без лимита времени для тренировки
             'allowed_incorrect_answers': 0,  # Без лимита ошибок
         }
@@ -241,9 +186,10 @@ def quiz_start(request, quiz_id, category_id=None):
             # Продолжаем создание новой попытки ниже
 
         # Создаем новую попытку экзамена
-        questions = quiz.get_questions_for_exam()
+        # ID вопросов выбираются по кешированным индексам разделов
+        question_ids = quiz.get_question_ids_for_exam()
 
-        if not questions:
+        if not question_ids:
             messages.error(request, 'В этом экзамене нет вопросов.')
             if token_mode:
                 return redirect('directory:quiz:exam_home')
@@ -253,9 +199,9 @@ def quiz_start(request, quiz_id, category_id=None):
             'quiz': quiz,
             'user': request.user,
             'category': None,  # None = итоговый экзамен (не тренировка)
-            'total_questions': len(questions),
+            'total_questions': len(question_ids),
             'status': QuizAttempt.STATUS_IN_PROGRESS,
-            'max_questions': len(questions),
+            'max_questions': len(question_ids),
             'time_limit_seconds': quiz.exam_time_limit * 60,
             'allowed_incorrect_answers': quiz.exam_allowed_incorrect,
         }
@@ -265,12 +211,12 @@ def quiz_start(request, quiz_id, category_id=None):
 
     # Сохраняем порядок вопросов в БД (для возможности возобновления)
     QuizQuestionOrder.objects.bulk_create([
-        QuizQuestionOrder(attempt=attempt, question=q, order=i)
-        for i, q in enumerate(questions)
+        QuizQuestionOrder(attempt=attempt, question_id=question_id, order=i)
+        for i, question_id in enumerate(question_ids)
     ])
 
     # Также сохраняем в сессии для обратной совместимости (legacy)
-    request.session[f'quiz_questions_{attempt.id}'] = [q.id for q in questions]
+    request.session[f'quiz_questions_{attempt.id}'] = question_ids
     request.session.modified = True
 
     # Увеличиваем счетчик попыток
@@ -278,75 +224,74 @@ def quiz_start(request, quiz_id, category_id=None):
     quiz.save(update_fields=['attempts_count'])
 
     if category_id:
-        messages.success(request, f'Тренировка по разделу "{category.name}" начата. Всего вопросов: {len(questions)}')
+        messages.success(request, f'Тренировка по разделу "{category.name}" начата. Всего вопросов: {len(question_ids)}')
     else:
-        messages.success(request, f'Экзамен "{quiz.title}" начат. Всего вопросов: {len(questions)}')
+        messages.success(request, f'Экзамен "{quiz.title}" начат. Всего вопросов: {len(question_ids)}')
 
     return redirect('directory:quiz:quiz_question', attempt_id=attempt.id, question_number=1)
 
 
+def _get_state_or_redirect(request, attempt_id):
+    """
+    Снимок попытки из кеша (см. directory/utils/quiz_attempt_state.py).
+
+    Returns:
+        (AttemptState, None) или (None, HttpResponse) если попытка недоступна
+    """
+    state = get_attempt_state(attempt_id, request.user.id, request.session)
+    if state is not None:
+        return state, None
+
+    attempt = get_object_or_404(QuizAttempt, id=attempt_id, user=request.user)
+    if attempt.status != QuizAttempt.STATUS_IN_PROGRESS:
+        return None, redirect('directory:quiz:quiz_result', attempt_id=attempt.id)
+
+    # Попытка без сохранённого порядка вопросов
+    messages.error(request, 'Не удалось загрузить вопросы. Начните экзамен заново.')
+    # В токен-режиме возвращаем на exam_home
+    if request.session.get('quiz_token_mode', False):
+        return None, redirect('directory:quiz:exam_home')
+    return None, redirect('directory:quiz:quiz_list')
+
+
+def _finalize_attempt_by_id(attempt_id, request, failure_reason: str = QuizAttempt.FAILURE_NONE):
+    """Завершение попытки, для которой в цикле вопросов есть только снимок состояния"""
+    attempt = QuizAttempt.objects.get(id=attempt_id)
+    _finalize_attempt(attempt, request, failure_reason)
+
+
 @login_required
 def quiz_question(request, attempt_id, question_number):
     """Отображение вопроса"""
-    attempt = get_object_or_404(
-        QuizAttempt,
-        id=attempt_id,
-        user=request.user,
-        status=QuizAttempt.STATUS_IN_PROGRESS
-    )
+    # Порядок вопросов, ответы и счётчики берутся из снимка попытки в кеше
+    state, response = _get_state_or_redirect(request, attempt_id)
+    if response is not None:
+        return response
 
-    time_left = _get_time_left_seconds(attempt)
+    time_left = state.get_time_left_seconds()
     if time_left is not None and time_left <= 0:
-        _finalize_attempt(attempt, request, QuizAttempt.FAILURE_TIMEOUT)
+        _finalize_attempt_by_id(state.id, request, QuizAttempt.FAILURE_TIMEOUT)
         messages.error(request, 'Время экзамена истекло.')
-        return redirect('directory:quiz:quiz_result', attempt_id=attempt.id)
-
-    # Получаем порядок вопросов из БД (приоритет) или из сессии (fallback)
-    question_orders = QuizQuestionOrder.objects.filter(attempt=attempt).order_by('order')
-
-    if question_orders.exists():
-        # Загружаем из БД
-        question_ids = [qo.question_id for qo in question_orders]
-    else:
-        # Fallback на сессию (для старых попыток)
-        question_ids = request.session.get(f'quiz_questions_{attempt.id}')
-        if not question_ids:
-            messages.error(request, 'Не удалось загрузить вопросы. Начните экзамен заново.')
-            # В токен-режиме возвращаем на exam_home
-            token_mode = request.session.get('quiz_token_mode', False)
-            if token_mode:
-                return redirect('directory:quiz:exam_home')
-            return redirect('directory:quiz:quiz_list')
+        return redirect('directory:quiz:quiz_result', attempt_id=state.id)
 
     # Проверяем номер вопроса
-    if question_number < 1 or question_number > len(question_ids):
-        return redirect('directory:quiz:quiz_result', attempt_id=attempt.id)
-
-    question_id = question_ids[question_number - 1]
-    question = get_object_or_404(Question, id=question_id)
-
-    # Получаем варианты ответов и перемешиваем их случайным образом
-    answers = list(question.answers.all())
-    random.shuffle(answers)
+    question_id = state.get_question_id(question_number)
+    if question_id is None:
+        return redirect('directory:quiz:quiz_result', attempt_id=state.id)
 
-    # Проверяем, был ли уже дан ответ на этот вопрос
-    user_answer = UserAnswer.objects.filter(
-        attempt=attempt,
-        question=question
-    ).first()
-
-    # Подсчитываем статистику
-    answered_count = UserAnswer.objects.filter(attempt=attempt).count()
-    skipped_count = UserAnswer.objects.filter(attempt=attempt, is_skipped=True).count()
+    # Вопрос и ответы из кеша банка вопросов; порядок ответов стабилен в пределах попытки
+    question = get_question_payload(question_id, state.get_question_category_id(question_number - 1))
+    if question is None:
+        raise Http404('Вопрос не найден')
+    answers = get_shuffled_answers(question, state.id)
 
-    progress_percent = 0
-    if question_ids:
-        progress_percent = int((question_number / len(question_ids)) * 100)
+    total_questions = state.total_questions
+    progress_percent = int((question_number / total_questions) * 100)
 
-    allowed_incorrect = attempt.allowed_incorrect_answers
+    allowed_incorrect = state.allowed_incorrect_answers
     remaining_incorrect = None
     if allowed_incorrect:
-        remaining_incorrect = max(0, allowed_incorrect - attempt.incorrect_answers)
+        remaining_incorrect = max(0, allowed_incorrect - state.incorrect_answers)
 
     time_left_display = None
     if time_left is not None:
@@ -354,24 +299,23 @@ def quiz_question(request, attempt_id, question_number):
         time_left_display = f"{minutes:02d}:{seconds:02d}"
 
     context = {
-        'attempt': attempt,
-        'quiz': attempt.quiz,
+        'attempt': state,
+        'quiz': {'id': state.quiz_id, 'title': state.quiz_title},
         'question': question,
         'answers': answers,
         'question_number': question_number,
-        'total_questions': len(question_ids),
+        'total_questions': total_questions,
         'progress_percent': progress_percent,
-        'answered_count': answered_count,
-        'skipped_count': skipped_count,
-        'user_answer': user_answer,
-        'show_correct_answer': attempt.quiz.show_correct_answer,
-        'allow_skip': attempt.quiz.allow_skip,
+        'answered_count': state.answered_count,
+        'skipped_count': state.skipped_count,
+        'show_correct_answer': state.show_correct_answer,
+        'allow_skip': state.allow_skip,
         'time_left_seconds': time_left,
         'time_left_display': time_left_display,
         'allowed_incorrect': allowed_incorrect,
-        'incorrect_answers': attempt.incorrect_answers,
+        'incorrect_answers': state.incorrect_answers,
         'remaining_incorrect': remaining_incorrect,
-        'result_url': reverse('directory:quiz:quiz_result', kwargs={'attempt_id': attempt.id}),
+        'result_url': reverse('directory:quiz:quiz_result', kwargs={'attempt_id': state.id}),
     }
 
     return render(request, 'directory/quiz/quiz_question.html', context)
@@ -381,18 +325,15 @@ def quiz_question(request, attempt_id, question_number):
 @require_POST
 def quiz_answer(request, attempt_id, question_id):
     """Обработка ответа на вопрос"""
-    attempt = get_object_or_404(
-        QuizAttempt,
-        id=attempt_id,
-        user=request.user,
-        status=QuizAttempt.STATUS_IN_PROGRESS
-    )
+    state = get_attempt_state(attempt_id, request.user.id, request.session)
+    if state is None:
+        raise Http404('Попытка не найдена или уже завершена')
 
-    time_left = _get_time_left_seconds(attempt)
-    result_url = reverse('directory:quiz:quiz_result', kwargs={'attempt_id': attempt.id})
+    result_url = reverse('directory:quiz:quiz_result', kwargs={'attempt_id': state.id})
 
+    time_left = state.get_time_left_seconds()
     if time_left is not None and time_left <= 0:
-        _finalize_attempt(attempt, request, QuizAttempt.FAILURE_TIMEOUT)
+        _finalize_attempt_by_id(state.id, request, QuizAttempt.FAILURE_TIMEOUT)
         return JsonResponse({
             'success': True,
             'finished': True,
@@ -400,83 +341,46 @@ def quiz_answer(request, attempt_id, question_id):
             'redirect': result_url
         })
 
-    question = get_object_or_404(Question, id=question_id)
+    position = state.get_position(question_id)
+    if position is None:
+        raise Http404('Вопрос не входит в попытку')
+
     answer_id = request.POST.get('answer_id')
     skip = request.POST.get('skip') == 'true'
 
-    # Проверяем, не был ли уже дан ответ
-    existing_answer = UserAnswer.objects.filter(
-        attempt=attempt,
-        question=question
-    ).first()
+    def question_url(number):
+        return reverse('directory:quiz:quiz_question', kwargs={'attempt_id': state.id, 'question_number': number})
 
-    if existing_answer:
-        # Уже отвечали на этот вопрос
-        question_ids = request.session.get(f'quiz_questions_{attempt.id}', [])
-        current_index = question_ids.index(question_id)
-        next_question = current_index + 2  # +1 для индекса, +1 для следующего
-
-        if next_question <= len(question_ids):
-            return JsonResponse({
-                'success': True,
-                'already_answered': True,
-                'next_url': reverse('directory:quiz:quiz_question', kwargs={'attempt_id': attempt.id, 'question_number': next_question})
-            })
-        else:
-            return JsonResponse({
-                'success': True,
-                'already_answered': True,
-                'next_url': result_url,
-                'finished': True
-            })
+    def get_next_url():
+        # Следующий вопрос без ответа после текущего, затем - первый пропущенный
+        next_number = state.first_unanswered_number(position + 1) or state.first_unanswered_number()
+        if next_number:
+            return question_url(next_number)
+        # Все вопросы отвечены - завершаем
+        _finalize_attempt_by_id(state.id, request)
+        return result_url
 
     if skip:
-        # Пропуск вопроса - НЕ считается ошибкой
-        user_answer = UserAnswer.objects.create(
-            attempt=attempt,
-            question=question,
-            selected_answer=None,
-            is_correct=False,
-            is_skipped=True
-        )
-        attempt.skipped_questions += 1
-        attempt.save(update_fields=['skipped_questions'])
-
-        # Пропущенные вопросы НЕ проверяются на лимит ошибок
-        limit_reached = False
-
-        if limit_reached:
-            _finalize_attempt(attempt, request, QuizAttempt.FAILURE_INCORRECT)
+        # Пропуск вопроса - НЕ считается ошибкой и не проверяется на лимит ошибок
+        if not record_answer(state, question_id, is_skipped=True):
+            next_url = get_next_url()
             return JsonResponse({
                 'success': True,
-                'skipped': True,
-                'finished': True,
-                'reason': 'incorrect_limit',
-                'redirect': result_url
+                'already_answered': True,
+                'next_url': next_url,
+                'finished': next_url == result_url,
             })
 
-        question_ids = request.session.get(f'quiz_questions_{attempt.id}', [])
-        current_index = question_ids.index(question_id)
-        next_question = current_index + 2
-        if next_question <= len(question_ids):
-            next_url = reverse('directory:quiz:quiz_question', kwargs={'attempt_id': attempt.id, 'question_number': next_question})
-        else:
-            # Дошли до конца - проверяем пропущенные
-            first_skipped = _find_first_skipped_question(attempt)
-            if first_skipped:
-                next_url = reverse('directory:quiz:quiz_question', kwargs={'attempt_id': attempt.id, 'question_number': first_skipped})
-            else:
-                _finalize_attempt(attempt, request)
-                next_url = result_url
+        next_url = get_next_url()
 
         return JsonResponse({
             'success': True,
             'skipped': True,
             'next_url': next_url,
             'finished': next_url == result_url,
-            'incorrect_answers': attempt.incorrect_answers,
-            'allowed_incorrect': attempt.allowed_incorrect_answers,
-            'time_left_seconds': _get_time_left_seconds(attempt),
+            'incorrect_answers': state.incorrect_answers,
+            'allowed_incorrect': state.allowed_incorrect_answers,
+            'time_left_seconds': state.get_time_left_seconds(),
         })
 
     # Обработка ответа
@@ -486,62 +390,56 @@ def quiz_answer(request, attempt_id, question_id):
             'error': 'Выберите ответ'
         }, status=400)
 
-    answer = get_object_or_404(Answer, id=answer_id, question=question)
-    is_correct = answer.is_correct
-
-    # Сохраняем ответ
-    user_answer = UserAnswer.objects.create(
-        attempt=attempt,
-        question=question,
-        selected_answer=answer,
-        is_correct=is_correct,
-        is_skipped=False
-    )
-
-    # Обновляем статистику попытки
-    if is_correct:
-        attempt.correct_answers += 1
-        attempt.save(update_fields=['correct_answers'])
-    else:
-        attempt.incorrect_answers += 1
-        attempt.save(update_fields=['incorrect_answers'])
-
-    # Получаем правильный ответ для отображения
-    correct_answer = question.get_correct_answer()
+    question = get_question_payload(question_id, state.get_question_category_id(position))
+    if question is None:
+        raise Http404('Вопрос не найден')
+    answers = {answer['id']: answer['is_correct'] for answer in question['answers']}
+    try:
+        answer_id = int(answer_id)
+    except ValueError:
+        raise Http404('Ответ не найден')
+    if answer_id not in answers:
+        raise Http404('Ответ не найден')
+    is_correct = answers[answer_id]
+
+    # Сохраняем ответ (UserAnswer и счётчики попытки) и обновляем снимок.
+    # Прогресс тренировки по разделу (UserCategoryProgress) - в той же транзакции,
+    # чтобы параллельный пересчёт прогресса не затёр увеличение счётчика
+    with transaction.atomic():
+        saved = record_answer(state, question_id, answer_id=answer_id, is_correct=is_correct)
+        if saved and not state.is_exam_mode():
+            record_training_answer(state.user_id, state.quiz_id, state.category_id, question_id, state.id)
+
+    if not saved:
+        # Уже отвечали на этот вопрос
+        next_url = get_next_url()
+        return JsonResponse({
+            'success': True,
+            'already_answered': True,
+            'next_url': next_url,
+            'finished': next_url == result_url,
+        })
 
-    # Определяем, есть ли еще вопросы
-    question_ids = request.session.get(f'quiz_questions_{attempt.id}', [])
-    current_index = question_ids.index(question_id)
-    has_next = current_index < len(question_ids) - 1
+    # Правильный ответ для отображения
+    correct_answer_id = next((aid for aid, correct in answers.items() if correct), None)
 
     # НОВАЯ ЛОГИКА: НЕ завершаем экзамен при достижении лимита ошибок
     # Даём пользователю ответить на все вопросы, а в результатах покажем провал
-
-    if not has_next:
-        # Дошли до конца списка вопросов - проверяем, есть ли пропущенные
-        first_skipped = _find_first_skipped_question(attempt)
-        if first_skipped:
-            # Есть пропущенные - отправляем на первый пропущенный
-            next_url = reverse('directory:quiz:quiz_question', kwargs={'attempt_id': attempt.id, 'question_number': first_skipped})
-        else:
-            # Все вопросы отвечены - завершаем
-            _finalize_attempt(attempt, request)
-            next_url = result_url
-    else:
-        next_url = reverse('directory:quiz:quiz_question', kwargs={'attempt_id': attempt.id, 'question_number': current_index + 2})
+    next_url = get_next_url()
+    has_next = next_url != result_url
 
     response_data = {
         'success': True,
         'is_correct': is_correct,
-        'correct_answer_id': correct_answer.id if correct_answer else None,
-        'explanation': question.explanation if question.explanation else None,
+        'correct_answer_id': correct_answer_id,
+        'explanation': question['explanation'] or None,
         'has_next': has_next,
-        'show_correct_answer': attempt.quiz.show_correct_answer,
+        'show_correct_answer': state.show_correct_answer,
         'next_url': next_url,
         'finished': not has_next,
-        'incorrect_answers': attempt.incorrect_answers,
-        'allowed_incorrect': attempt.allowed_incorrect_answers,
-        'time_left_seconds': _get_time_left_seconds(attempt),
+        'incorrect_answers': state.incorrect_answers,
+        'allowed_incorrect': state.allowed_incorrect_answers,
+        'time_left_seconds': state.get_time_left_seconds(),
     }
 
     return JsonResponse(response_data)
@@ -666,11 +564,19 @@ def category_detail(request, category_id):
     # Первый доступный квиз для тренировки
     quiz_for_training = quizzes.first()
 
+    # Прогресс тренировки пользователя по разделу
+    answered_count = None
+    if quiz_for_training:
+        answered_count = get_answered_counts(
+            request.user, [(quiz_for_training.id, category.id)]
+        )[(quiz_for_training.id, category.id)]
+
     context = {
         'category': category,
         'questions': questions,
         'quizzes': quizzes,
         'quiz_for_training': quiz_for_training,
+        'answered_count': answered_count,
     }
 
     return render(request, 'directory/quiz/category_detail.html', context)
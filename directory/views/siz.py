@@ -1,8 +1,8 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse, HttpResponse
-from django.urls import reverse_lazy
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.urls import reverse, reverse_lazy
 from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count, Q, Subquery, OuterRef, IntegerField
@@ -14,10 +14,15 @@ from directory.models.subdivision import StructuralSubdivision
 from directory.forms.siz import SIZForm, SIZNormForm
 from directory.mixins import AccessControlMixin, AccessControlObjectMixin
 from directory.utils.permissions import AccessControlHelper
-import zipfile
-import io
-import re
-from datetime import datetime
+from directory.utils.background_jobs import (
+    JOB_STATUS_DONE,
+    JOB_STATUS_FAILED,
+    create_job,
+    get_job,
+    get_public_job_state,
+    update_job,
+)
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -296,88 +301,85 @@ class SIZMassGenerationView(LoginRequiredMixin, ListView):
 @require_POST
 def generate_siz_cards_bulk(request):
     """
-    📦 Генерация ZIP-архива с карточками СИЗ для выбранных подразделений
+    📦 Запуск фоновой генерации ZIP-архива с карточками СИЗ для выбранных подразделений
+
+    Возвращает идентификатор задачи и ссылки для опроса статуса и скачивания архива.
     """
-    from directory.document_generators.siz_card_docx_generator import generate_siz_card_docx
+    from directory.tasks import SIZ_CARDS_JOB_KIND, generate_siz_cards_archive
+
+    try:
+        requested_ids = {int(pk) for pk in request.POST.getlist('subdivision_ids')}
+    except (TypeError, ValueError):
+        return HttpResponse("Некорректный список подразделений", status=400)
 
-    subdivision_ids = request.POST.getlist('subdivision_ids')
+    # Только подразделения из доступных пользователю организаций
+    accessible_orgs = AccessControlHelper.get_accessible_organizations(request.user, request)
+    subdivision_ids = list(StructuralSubdivision.objects.filter(
+        pk__in=requested_ids,
+        organization__in=accessible_orgs
+    ).order_by('organization__full_name_ru', 'name').values_list('pk', flat=True))
 
     if not subdivision_ids:
         return HttpResponse("Не выбрано ни одного подразделения", status=400)
 
-    # Создаём ZIP-архив в памяти
-    zip_buffer = io.BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        generated_count = 0
-        errors = []
-
-        for subdivision_id in subdivision_ids:
-            try:
-                subdivision = StructuralSubdivision.objects.get(pk=subdivision_id)
+    job = create_job(SIZ_CARDS_JOB_KIND, request.user.pk, total=len(subdivision_ids))
 
-                # Получаем всех сотрудников подразделения, у которых есть нормы СИЗ
-                employees = Employee.objects.filter(
-                    position__department__subdivision=subdivision
-                ).select_related('position', 'position__department')
-
-                for employee in employees:
-                    if not employee.position:
-                        continue
-
-                    # Проверяем, есть ли нормы для должности (прямо или через эталонную)
-                    has_norms = SIZNorm.objects.filter(position=employee.position).exists()
-
-                    if not has_norms:
-                        # Ищем эталонную должность
-                        reference_positions = Position.objects.filter(
-                            position_name=employee.position.position_name
-                        )
-                        has_norms = any(
-                            SIZNorm.objects.filter(position=pos).exists()
-                            for pos in reference_positions
-                        )
-
-                    if not has_norms:
-                        continue
+    try:
+        generate_siz_cards_archive.enqueue(
+            job_id=job['id'],
+            subdivision_ids=subdivision_ids,
+            user_id=request.user.pk,
+        )
+    except Exception as e:
+        logger.error(f"Не удалось поставить в очередь генерацию карточек СИЗ: {e}")
+        update_job(job['id'], status=JOB_STATUS_FAILED, errors=[str(e)])
+        return HttpResponse("Не удалось запустить генерацию карточек СИЗ", status=500)
 
-                    # Генерируем карточку
-                    result = generate_siz_card_docx(employee, request.user)
+    logger.info(f"Запущена фоновая генерация карточек СИЗ: задача {job['id']}, подразделений: {len(subdivision_ids)}")
 
-                    if result and 'content' in result:
-                        # Формируем безопасное имя файла
-                        safe_subdivision = re.sub(r'[<>:"/\\|?*]', '_', subdivision.name)
-                        safe_employee = re.sub(r'[<>:"/\\|?*]', '_', employee.full_name_nominative)
+    return JsonResponse({
+        'job_id': job['id'],
+        'status_url': reverse('directory:siz:mass_generation_status', args=[job['id']]),
+        'download_url': reverse('directory:siz:mass_generation_download', args=[job['id']]),
+    }, status=202)
 
-                        # Добавляем файл в архив
-                        file_path = f"{safe_subdivision}/{safe_employee}_карточка_СИЗ.docx"
-                        zip_file.writestr(file_path, result['content'])
-                        generated_count += 1
 
-                        logger.info(f"Добавлена карточка: {file_path}")
-                    else:
-                        errors.append(f"Ошибка генерации для {employee.full_name_nominative}")
+def _get_user_job_or_404(request, job_id):
+    """Возвращает состояние задачи текущего пользователя"""
+    job = get_job(job_id)
+    if job is None or job.get('user_id') != request.user.pk:
+        raise Http404("Задача не найдена или устарела")
+    return job
 
-            except Exception as e:
-                logger.error(f"Ошибка при обработке подразделения {subdivision_id}: {e}")
-                errors.append(f"Ошибка подразделения ID={subdivision_id}: {str(e)}")
 
-        # Добавляем файл со сводкой
-        summary = f"""Массовая генерация карточек СИЗ
-Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}
-Сгенерировано карточек: {generated_count}
+@login_required
+@require_GET
+def siz_cards_job_status(request, job_id):
+    """
+    ⏳ Статус фоновой генерации карточек СИЗ (для опроса из браузера)
+    """
+    job = _get_user_job_or_404(request, job_id)
+    return JsonResponse(get_public_job_state(job))
 
-"""
-        if errors:
-            summary += "Ошибки:\n" + "\n".join(errors)
 
-        zip_file.writestr("_summary.txt", summary.encode('utf-8'))
+@login_required
+@require_GET
+def siz_cards_job_download(request, job_id):
+    """
+    📥 Скачивание готового архива с карточками СИЗ
+    """
+    job = _get_user_job_or_404(request, job_id)
 
-    # Отправляем архив пользователю
-    zip_buffer.seek(0)
-    response = HttpResponse(zip_buffer.read(), content_type='application/zip')
-    response['Content-Disposition'] = f'attachment; filename="Карточки_СИЗ_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip"'
+    if job['status'] != JOB_STATUS_DONE:
+        return HttpResponse("Архив ещё не готов", status=409)
 
-    logger.info(f"Массовая генерация завершена. Создано файлов: {generated_count}")
+    file_path = job.get('file_path')
+    if not file_path or not os.path.exists(file_path):
+        raise Http404("Файл архива не найден")
 
-    return response
\ No newline at end of file
+    return FileResponse(
+        open(file_path, 'rb'),
+        as_attachment=True,
+        filename=job['filename'],
+        content_type='application/zip',
+    )
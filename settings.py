@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from django.contrib.messages import constants as messages
@@ -44,6 +45,8 @@ THIRD_PARTY_APPS = [
     'crispy_bootstrap4',      # Bootstrap 4 для crispy-forms 🎨
     'import_export',          # Для импорта/экспорта данных
     'nested_admin',           # Для вложенных админ-интерфейсов
+    'django_tasks',           # Фоновые задачи ⏳
+    'django_tasks.backends.database',  # Очередь фоновых задач в БД
 ]
 
 # 🏠 Локальные приложения
@@ -174,6 +177,7 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # 📸 Медиа файлы
 MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
 MEDIA_ROOT = BASE_DIR / 'media' # Директория для загружаемых пользователем файлов
+MEDICAL_REFERRAL_WORKERS = int(os.getenv('MEDICAL_REFERRAL_WORKERS', '4')) # Потоков для пакетного формирования направлений на медосмотр
 
 # 🔑 Тип первичного ключа
 DEFAULT_AUTO_FIELD = os.getenv('DEFAULT_AUTO_FIELD', 'django.db.models.BigAutoField')
@@ -241,6 +245,8 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'webmaster@localhost') # Email отправителя по умолчанию
 SERVER_EMAIL = os.getenv('SERVER_EMAIL', DEFAULT_FROM_EMAIL) # Email для ошибок сервера 500
+EMAIL_DELIVERY_WORKERS = int(os.getenv('EMAIL_DELIVERY_WORKERS', '8')) # Потоков для рассылки уведомлений по организациям
+EMAIL_DELIVERY_TIMEOUT = int(os.getenv('EMAIL_DELIVERY_TIMEOUT', '30')) # Таймаут SMTP-соединения, секунды
 
 # 🔒 Дополнительные настройки безопасности
 SECURE_BROWSER_XSS_FILTER = True
@@ -386,6 +392,28 @@ CACHES = {
     }
 }
 
+# 🔐 Время жизни кешированного AccessScope пользователя (секунды)
+# Кеш дополнительно инвалидируется сигналами при изменении прав и оргструктуры
+ACCESS_SCOPE_CACHE_TIMEOUT = int(os.getenv('ACCESS_SCOPE_CACHE_TIMEOUT', '300'))
+
+# ⏳ Фоновые задачи (django-tasks)
+# По умолчанию задачи выполняются сразу в процессе веб-сервера (ImmediateBackend).
+# Для выполнения в отдельном воркере: TASKS_BACKEND=django_tasks.backends.database.DatabaseBackend
+# и запуск `python manage.py db_worker`
+TASKS = {
+    'default': {
+        'BACKEND': os.getenv('TASKS_BACKEND', 'django_tasks.backends.immediate.ImmediateBackend'),
+    }
+}
+
+# ⚙️ Число процессов для параллельного рендеринга DOCX
+# 1 (по умолчанию) — последовательный рендер в процессе веб-сервера,
+# N > 1 — пул из N процессов на КАЖДЫЙ процесс веб-сервера, 0 — по числу ядер
+DOCUMENT_RENDER_WORKERS = int(os.getenv('DOCUMENT_RENDER_WORKERS', '1'))
+
+# 📦 Папка для готовых архивов массовой генерации (общая для веб-процесса и воркера)
+BULK_EXPORT_DIR = os.getenv('BULK_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'ot_online_exports'))
+
 # Конфигурация для wkhtmltopdf (если используется для генерации PDF)
 # Убедитесь, что путь правильный для вашей операционной системы
 WKHTMLTOPDF_CMD = os.getenv('WKHTMLTOPDF_CMD', 'C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe') # Пример для Windows
@@ -32,3 +32,10 @@ CACHES = {
 
 # Email settings for production
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+# Background tasks run in a separate worker: python manage.py db_worker
+TASKS = {
+    'default': {
+        'BACKEND': os.getenv('TASKS_BACKEND', 'django_tasks.backends.database.DatabaseBackend'),
+    }
+}
@@ -7,3 +7,10 @@ BASE_DIR = Path(__file__).resolve().parent
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 
 application = get_wsgi_application()
+
+# 🧠 Предзагрузка анализатора морфологии.
+# При запуске gunicorn с --preload этот модуль импортируется в мастер-процессе,
+# поэтому словари pymorphy3 загружаются один раз и разделяются воркерами (copy-on-write).
+if os.getenv('PRELOAD_MORPH_ANALYZER', 'False') == 'True':
+    from directory.utils.declension import preload_morph_analyzer
+    preload_morph_analyzer()